@@ -0,0 +1,226 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+from datetime import timedelta
+from obspy import UTCDateTime
+from werkzeug.utils import secure_filename
+from analysis_worker import WarmWorkerPool
+from artifacts import list_previews, precompress_outputs
+from component.paths import event_folder_name, event_paths
+from component.profiling import read_run_report
+from download_handler import download_raspberry_data
+from streaming import get_ingestor
+from job_queue import DEFAULT_MAX_WORKERS as JOB_MAX_WORKERS, JobError
+from metrics import registry
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BASE_UPLOAD_FOLDER = os.path.join(ROOT_DIR, 'assets')
+BASE_OUTPUT_FOLDER = os.path.join(ROOT_DIR, 'Output')
+MAIN_SCRIPT_PATH = os.path.join(ROOT_DIR, 'src', 'main.py')
+STAGE_PREFIX = 'main.py: stage='
+# 'warm' runs process_data on pre-forked workers; 'subprocess' starts a fresh src/main.py per job
+ANALYSIS_MODE = os.environ.get('ANALYSIS_MODE', 'warm')
+# Download windows at least this long (minutes, both sides of the event together) are analysed in streaming mode
+STREAMING_MIN_WINDOW = float(os.environ.get('STREAMING_MIN_WINDOW', 30))
+# Processes each analysis may use for reading and rendering; 0 shares the CPUs among the jobs that run at once
+ANALYSIS_INNER_WORKERS = int(os.environ.get('ANALYSIS_INNER_WORKERS', 0))
+
+_warm_pool = None
+_warm_pool_lock = threading.Lock()
+
+def get_warm_pool():
+    """Returns the process-wide warm worker pool, creating it on first use."""
+    global _warm_pool
+    with _warm_pool_lock:
+        if _warm_pool is None:
+            _warm_pool = WarmWorkerPool()
+        return _warm_pool
+
+def inner_workers(concurrent_jobs):
+    """Returns the read and render pool size of one analysis, so concurrent jobs do not oversubscribe the CPUs (as in batch.py)."""
+    if ANALYSIS_INNER_WORKERS > 0:
+        return ANALYSIS_INNER_WORKERS
+    return max(1, (os.cpu_count() or 1) // max(1, concurrent_jobs))
+
+def list_outputs(subfolder):
+    """Lists the files produced for an event together with their download URLs (precompressed copies are served under the same URL)."""
+    output_folder = os.path.join(BASE_OUTPUT_FOLDER, subfolder)
+    if not os.path.isdir(output_folder):
+        return []
+    return [
+        {"name": name, "url": f"/download/{subfolder}/{name}", "bytes": os.path.getsize(os.path.join(output_folder, name))}
+        for name in sorted(os.listdir(output_folder))
+        if os.path.isfile(os.path.join(output_folder, name)) and not name.endswith(('.gz', '.tmp'))
+    ]
+
+def run_analysis_job(job_id, progress, earthquake_name, magnitude, latitude=None, longitude=None, origin_time=None, streaming=False,
+                     max_radius_km=None, max_stations=None):
+    """Runs the analysis for one event in the configured ANALYSIS_MODE and records its run report in the metrics."""
+    runner = run_analysis_subprocess if ANALYSIS_MODE == 'subprocess' else run_analysis_warm
+    report_path = event_paths(secure_filename(earthquake_name), magnitude)["run_report"]
+    subfolder = event_folder_name(secure_filename(earthquake_name), magnitude)
+    # A report left by an earlier run must not be mistaken for this run's
+    previous_mtime = os.path.getmtime(report_path) if os.path.exists(report_path) else None
+
+    def forward(stage, data=None):
+        # Page events name their preview file; listeners get the URL it is served from
+        if stage == 'page' and data and data.get('preview'):
+            data = {**data, "preview_url": f"/results/{subfolder}/pages/{data['preview']}"}
+            webp = os.path.splitext(data['preview'])[0] + '.webp'
+            if os.path.exists(os.path.join(event_paths(secure_filename(earthquake_name), magnitude)["page_previews"], webp)):
+                data["preview_webp_url"] = f"/results/{subfolder}/pages/{webp}"
+        progress(stage, data)
+
+    try:
+        result = runner(job_id, forward, earthquake_name, magnitude, latitude, longitude, origin_time, streaming,
+                        max_radius_km, max_stations)
+    except Exception as e:
+        report = record_run_report(report_path, previous_mtime)
+        if isinstance(e, JobError):
+            e.result["run_report"] = report
+        raise
+    result["run_report"] = record_run_report(report_path, previous_mtime)
+    # Compressed once here rather than on every download
+    output_dir = os.path.join(BASE_OUTPUT_FOLDER, subfolder)
+    if os.path.isdir(output_dir):
+        precompress_outputs(output_dir)
+    result["previews"] = list_previews(event_paths(secure_filename(earthquake_name), magnitude)["page_previews"], subfolder)
+    return result
+
+def record_run_report(report_path, previous_mtime):
+    """Adds the run report written by the analysis to the metrics and returns it (None if none was written)."""
+    if not os.path.exists(report_path) or os.path.getmtime(report_path) == previous_mtime:
+        return None
+    report = read_run_report(report_path)
+    registry.observe_run(report, kind=ANALYSIS_MODE)
+    return report
+
+def run_analysis_warm(job_id, progress, earthquake_name, magnitude, latitude=None, longitude=None, origin_time=None, streaming=False,
+                      max_radius_km=None, max_stations=None):
+    """Runs process_data for one event on a warm worker process."""
+    sanitized_earthquake_name = secure_filename(earthquake_name)
+    paths = event_paths(sanitized_earthquake_name, magnitude)
+    subfolder = event_folder_name(sanitized_earthquake_name, magnitude)
+    if not os.path.exists(paths["folder_path"]):
+        raise JobError(f"Input folder '{paths['folder_path']}' does not exist. Ensure files are uploaded correctly.",
+                       {"subfolder": subfolder, "outputs": []})
+    os.makedirs(paths["output_dir"], exist_ok=True)
+    kwargs = {
+        "folder_path": paths["folder_path"],
+        "output_csv": paths["output_csv"],
+        "output_pdf": paths["output_pdf"],
+        "map_pdf": paths["map_pdf"],
+        "record_section_pdf": paths["record_section_pdf"],
+        "peaks_csv": paths["peaks_csv"],
+        "spectra_pdf": paths["spectra_pdf"],
+        "spectra_npz": paths["spectra_npz"],
+        "page_previews": paths["page_previews"],
+        "waveform_tiles": paths["waveform_tiles"],
+        "epi_mag": float(magnitude),
+    }
+    pool = get_warm_pool()
+    # At most one job per warm worker runs at a time
+    kwargs["max_workers"] = inner_workers(min(JOB_MAX_WORKERS, pool.max_workers))
+    # Leave process_data's default epicenter in place when none is given
+    if latitude is not None:
+        kwargs["epi_lat"] = float(latitude)
+    if longitude is not None:
+        kwargs["epi_lon"] = float(longitude)
+    if origin_time is not None:
+        kwargs["origin_time"] = str(origin_time)
+    if streaming:
+        kwargs["streaming"] = True
+    if max_radius_km is not None:
+        kwargs["max_radius_km"] = float(max_radius_km)
+    if max_stations is not None:
+        kwargs["max_stations"] = int(max_stations)
+    worker = pool.run(job_id, progress, **kwargs)
+    return {"subfolder": subfolder, "outputs": list_outputs(subfolder), "worker": worker}
+
+def run_analysis_subprocess(job_id, progress, earthquake_name, magnitude, latitude=None, longitude=None, origin_time=None, streaming=False,
+                            max_radius_km=None, max_stations=None):
+    """Runs src/main.py for one event, forwarding its stage markers to the job's progress."""
+    sanitized_earthquake_name = secure_filename(earthquake_name)
+    sanitized_magnitude = secure_filename(str(magnitude))
+    cmd = [sys.executable, MAIN_SCRIPT_PATH, '--earthquake_name', sanitized_earthquake_name, '--magnitude', sanitized_magnitude,
+           '--max_workers', str(inner_workers(JOB_MAX_WORKERS))]
+    if latitude is not None:
+        cmd.extend(['--latitude', str(latitude)])
+    if longitude is not None:
+        cmd.extend(['--longitude', str(longitude)])
+    if origin_time is not None:
+        cmd.extend(['--origin_time', str(origin_time)])
+    if streaming:
+        cmd.append('--streaming')
+    if max_radius_km is not None:
+        cmd.extend(['--max_radius_km', str(float(max_radius_km))])
+    if max_stations is not None:
+        cmd.extend(['--max_stations', str(int(max_stations))])
+
+    stdout_lines = []
+    stderr_chunks = []
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True) as proc:
+        # stderr is drained on its own thread; otherwise a child filling the stderr pipe blocks while stdout is read
+        stderr_reader = threading.Thread(target=lambda: stderr_chunks.extend(iter(lambda: proc.stderr.read(65536), '')),
+                                         name=f'analysis-stderr-{job_id}', daemon=True)
+        stderr_reader.start()
+        for line in proc.stdout:
+            stdout_lines.append(line)
+            if line.startswith(STAGE_PREFIX):
+                stage, _, data = line[len(STAGE_PREFIX):].strip().partition(' ')
+                progress(stage, json.loads(data) if data else None)
+        stderr_reader.join()
+        returncode = proc.wait()
+    stdout = ''.join(stdout_lines)
+    stderr = ''.join(stderr_chunks)
+    print(f"Job {job_id} analysis stdout:", stdout)
+    if stderr:
+        print(f"Job {job_id} analysis stderr:", stderr)
+
+    subfolder = event_folder_name(sanitized_earthquake_name, magnitude)
+    result = {"subfolder": subfolder, "outputs": list_outputs(subfolder), "stdout": stdout, "stderr": stderr}
+    if returncode != 0:
+        raise JobError(f"Analysis script exited with status {returncode}", result)
+    return result
+
+def run_download_job(job_id, progress, event_name, event_time, delta_time, latitude, longitude, magnitude,
+                     max_radius_km=None, max_stations=None):
+    """Downloads Raspberry Shake data from the stations around an event and then analyses it."""
+    progress('download')
+    folder_path = event_paths(secure_filename(event_name), magnitude)["folder_path"]
+    download_summary = download_raspberry_data(event_name, event_time, delta_time, latitude, longitude, BASE_UPLOAD_FOLDER,
+                                               folder=folder_path, max_radius_km=max_radius_km, max_stations=max_stations,
+                                               progress_callback=progress)
+    return analyse_downloaded(job_id, progress, download_summary, event_name, event_time, latitude, longitude, magnitude,
+                              streaming=2 * delta_time >= STREAMING_MIN_WINDOW, max_radius_km=max_radius_km, max_stations=max_stations)
+
+def run_stream_job(job_id, progress, event_name, event_time, delta_time, latitude, longitude, magnitude,
+                   max_radius_km=None, max_stations=None):
+    """Writes an event window from the streaming buffers and then analyses it, without downloading anything."""
+    progress('download')
+    ingestor = get_ingestor()
+    if ingestor is None:
+        raise JobError("Streaming is not running. Start it with POST /stream/start.", {})
+    sanitized_event_name = secure_filename(event_name)
+    folder_path = event_paths(sanitized_event_name, magnitude)["folder_path"]
+    delta = timedelta(minutes=delta_time)
+    snapshot_summary = ingestor.snapshot(UTCDateTime(event_time - delta), UTCDateTime(event_time + delta), folder_path, sanitized_event_name)
+    return analyse_downloaded(job_id, progress, snapshot_summary, event_name, event_time, latitude, longitude, magnitude,
+                              streaming=2 * delta_time >= STREAMING_MIN_WINDOW, max_radius_km=max_radius_km, max_stations=max_stations)
+
+def analyse_downloaded(job_id, progress, download_summary, event_name, event_time, latitude, longitude, magnitude, streaming=False,
+                       max_radius_km=None, max_stations=None):
+    """Analyses the files gathered by a download or stream snapshot, attaching its summary to the job result."""
+    folder_path = download_summary["folder"]
+    if not (os.path.exists(folder_path) and any(f.endswith('.mseed') for f in os.listdir(folder_path))):
+        raise JobError("No .mseed files found after download.", {"download": download_summary})
+    try:
+        result = run_analysis_job(job_id, progress, event_name, magnitude, latitude, longitude, origin_time=event_time.isoformat(),
+                                  streaming=streaming, max_radius_km=max_radius_km, max_stations=max_stations)
+    except JobError as e:
+        e.result["download"] = download_summary
+        raise
+    result["download"] = download_summary
+    return result
@@ -0,0 +1,124 @@
+import multiprocessing as mp
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+DEFAULT_WORKERS = int(os.environ.get('ANALYSIS_WARM_WORKERS', 2))
+
+# Set inside each worker process by _init_worker
+_progress_queue = None
+_current_job_id = None
+
+def _init_worker(progress_queue):
+    """Imports the heavy modules once per worker process and renders the base maps of BASEMAP_WARM_EPICENTERS."""
+    global _progress_queue
+    _progress_queue = progress_queue
+    started = time.perf_counter()
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot  # noqa: F401
+    import obspy  # noqa: F401
+    import pandas  # noqa: F401
+    import cartopy.crs  # noqa: F401
+    from component import main_visualization  # noqa: F401
+    from component.inventory import load_inventory
+    from component.map_creation import prepare_base_maps, warm_epicenters
+    load_inventory()
+    prepare_base_maps(warm_epicenters())
+    print(f"Warm worker {os.getpid()} ready in {time.perf_counter() - started:.1f}s")
+
+def _report(stage, data=None):
+    _progress_queue.put((_current_job_id, stage, data))
+
+def _ping():
+    return os.getpid()
+
+def _run_process_data(job_id, kwargs):
+    """Runs process_data inside a warm worker, forwarding progress to the parent through the shared queue."""
+    global _current_job_id
+    from component.main_visualization import process_data
+    _current_job_id = job_id
+    started = time.perf_counter()
+    try:
+        process_data(progress_callback=_report, **kwargs)
+    finally:
+        _current_job_id = None
+    return {"pid": os.getpid(), "elapsed_s": time.perf_counter() - started}
+
+class WarmWorkerPool:
+    """
+    Pool of pre-forked, long-lived worker processes that run process_data in-process.
+
+    Workers import obspy, pandas, matplotlib and cartopy once at start-up and keep them loaded
+    between jobs, so a job only pays for the analysis itself. If a worker dies (e.g. killed for running
+    out of memory), the jobs it broke fail and the pool is replaced by a freshly pre-forked one.
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS):
+        self.max_workers = max_workers
+        self._context = mp.get_context('fork' if 'fork' in mp.get_all_start_methods() else 'spawn')
+        self._progress_queue = self._context.Queue()
+        self._callbacks = {}
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+        self._dispatcher = threading.Thread(target=self._dispatch_progress, name='warm-worker-progress', daemon=True)
+        self._dispatcher.start()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self._context, initializer=_init_worker,
+                                   initargs=(self._progress_queue,))
+
+    def _replace_broken(self, executor):
+        """Replaces a broken executor (unless another job already did) and warms up its successor."""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = self._new_executor()
+        executor.shutdown(wait=False)
+        print("A warm analysis worker died; restarting the worker pool.")
+        try:
+            print(f"Warm analysis workers restarted: {self.prefork()}")
+        except BrokenProcessPool as e:
+            print(f"Warm analysis workers could not be restarted: {e}")
+
+    def prefork(self):
+        """Starts every worker process now rather than on the first job and waits until they are warm."""
+        futures = [self._executor.submit(_ping) for _ in range(self.max_workers)]
+        return sorted({future.result() for future in futures})
+
+    def run(self, job_id, progress, **kwargs):
+        """Runs process_data(**kwargs) on a warm worker and blocks until it finishes."""
+        with self._lock:
+            self._callbacks[job_id] = progress
+            executor = self._executor
+        try:
+            return executor.submit(_run_process_data, job_id, kwargs).result()
+        except BrokenProcessPool as e:
+            self._replace_broken(executor)
+            raise RuntimeError(f"The analysis worker process died (possibly out of memory): {e}") from e
+        finally:
+            with self._lock:
+                self._callbacks.pop(job_id, None)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+        self._progress_queue.put(None)
+
+    def _dispatch_progress(self):
+        while True:
+            message = self._progress_queue.get()
+            if message is None:
+                return
+            job_id, stage, data = message
+            with self._lock:
+                callback = self._callbacks.get(job_id)
+            if callback is not None:
+                callback(stage, data)
@@ -1,10 +1,25 @@
-from flask import Flask, request, send_from_directory, jsonify, send_file
+from flask import Flask, Response, request, jsonify
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import NotFound
 from flask_cors import CORS
 import os
-import subprocess
-from download_handler import download_raspberry_data
+import json
+import threading
+from collections import OrderedDict
 from datetime import datetime
+import numpy as np
+from obspy import UTCDateTime
+from analysis_runner import ANALYSIS_MODE, get_warm_pool, run_analysis_job, run_download_job, run_stream_job
+from artifacts import STATIC_MAX_AGE, list_previews, send_artifact
+from job_queue import JobQueue, QueueFullError
+from upload_handler import ChunkedUploads, UploadError
+from streaming import get_ingestor, start_ingestor, stop_ingestor
+from metrics import registry
+from component import result_cache
+from component.detection import read_station_peaks
+from component.spectral import read_spectra
+from component import waveform_tiles as tiles
+from component.paths import event_folder_name
 
 app = Flask(__name__, static_folder=os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 CORS(app)
@@ -16,6 +31,15 @@ os.makedirs(BASE_UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(BASE_OUTPUT_FOLDER, exist_ok=True)
 
 ALLOWED_EXTENSIONS = {'mseed'}
+# Seconds between keep-alive comments on an idle event stream, so proxies do not close it
+SSE_KEEPALIVE = float(os.environ.get('SSE_KEEPALIVE', 15))
+# Tile stores kept open (memory-mapped) for the waveform viewer
+MAX_OPEN_TILE_STORES = 16
+_tile_stores = OrderedDict()
+_tile_stores_lock = threading.Lock()
+
+job_queue = JobQueue()
+chunked_uploads = ChunkedUploads(BASE_UPLOAD_FOLDER)
 
 def allowed_file(filename):
     """Checks if the uploaded file has an allowed extension."""
@@ -23,13 +47,13 @@ def allowed_file(filename):
 
 @app.route('/')
 def serve_index():
-    """Serves the index.html file from the root directory."""
-    return send_file(os.path.join(app.static_folder, 'index.html'))
+    """Serves the index.html file from the root directory, revalidated on every load."""
+    return send_artifact(app.static_folder, 'index.html', max_age=0)
 
 @app.route('/<path:filename>')
 def serve_static(filename):
-    """Serves other static files from the root directory."""
-    return send_from_directory(app.static_folder, filename)
+    """Serves other static files from the root directory, cached for STATIC_MAX_AGE seconds."""
+    return send_artifact(app.static_folder, filename, max_age=STATIC_MAX_AGE)
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
@@ -52,89 +76,343 @@ def upload_file():
         return jsonify({"success": True, "message": f"{len(saved_files)} files uploaded successfully.", "files": saved_files}), 200
     return jsonify({"success": False, "message": "No valid .mseed files were uploaded."}), 400
 
+@app.route('/uploads', methods=['POST'])
+def create_upload():
+    """Starts (or resumes) a chunked upload of one .mseed file and reports how many bytes the server already has."""
+    data = request.get_json()
+    earthquake_name = secure_filename(data.get('earthquake_name', 'default_earthquake'))
+    try:
+        size = int(data.get('size', 0))
+        event_folder = event_folder_name(earthquake_name, data.get('magnitude', 5.3))
+        state = chunked_uploads.create(event_folder, data.get('filename', ''), size, data.get('last_modified'))
+    except UploadError as e:
+        return jsonify({"success": False, "message": str(e)}), e.status
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": f"Invalid upload request: {e}"}), 400
+    return jsonify({**state, "chunk_url": f"/uploads/{state['upload_id']}"}), 200
+
+@app.route('/uploads/<upload_id>', methods=['GET', 'HEAD'])
+def upload_status(upload_id):
+    """Reports the number of bytes received so far, for resuming an interrupted upload."""
+    try:
+        state = chunked_uploads.status(upload_id)
+    except UploadError as e:
+        return jsonify({"success": False, "message": str(e)}), e.status
+    return jsonify(state), 200, {"Upload-Offset": str(state['offset'])}
+
+@app.route('/uploads/<upload_id>', methods=['PATCH'])
+def upload_chunk(upload_id):
+    """Appends the raw request body at the Upload-Offset header, streaming it straight to disk."""
+    try:
+        offset = int(request.headers.get('Upload-Offset', -1))
+        state = chunked_uploads.append(upload_id, offset, request.stream)
+    except UploadError as e:
+        headers = {"Upload-Offset": str(e.offset)} if e.offset is not None else {}
+        return jsonify({"success": False, "message": str(e), "offset": e.offset}), e.status, headers
+    except ValueError:
+        return jsonify({"success": False, "message": "Upload-Offset header must be an integer."}), 400
+    return jsonify(state), 200, {"Upload-Offset": str(state['offset'])}
+
+def parse_event_time(event_time_str):
+    """Parses an event time given as 'YYYY-MM-DDTHH:MM:SS' or as a Unix timestamp."""
+    if isinstance(event_time_str, str):
+        return datetime.strptime(event_time_str, '%Y-%m-%dT%H:%M:%S')
+    return datetime.fromtimestamp(float(event_time_str))
+
+def parse_station_selection(data):
+    """Returns the optional max_radius_km and max_stations of a request body; absent values use the configured defaults."""
+    selection = {}
+    if data.get('max_radius_km') not in (None, ''):
+        selection['max_radius_km'] = float(data['max_radius_km'])
+    if data.get('max_stations') not in (None, ''):
+        selection['max_stations'] = int(data['max_stations'])
+    return selection
+
 @app.route('/download_raspberry', methods=['POST'])
 def download_raspberry():
-    """Triggers download of seismic data from Raspberry Shake FDSN Dataselect and runs analysis."""
+    """Queues a download of seismic data from Raspberry Shake FDSN Dataselect followed by analysis."""
     data = request.get_json()
     event_name = data.get('event_name')
-    event_time_str = data.get('event_time')
-    if isinstance(event_time_str, str):
-        event_time = datetime.strptime(event_time_str, '%Y-%m-%dT%H:%M:%S')
-    else:
-        event_time = datetime.fromtimestamp(float(event_time_str))
+    event_time = parse_event_time(data.get('event_time'))
     delta_time = float(data.get('delta_time', 2))
     latitude = data.get('latitude')
     longitude = data.get('longitude')
     if not all([event_name, latitude, longitude]):
         return jsonify({"error": "Event name, latitude, and longitude are required."}), 400
-    
-    # Download the data
-    result = download_raspberry_data(event_name, event_time, delta_time, latitude, longitude, BASE_UPLOAD_FOLDER)
-    folder_path = result["folder"]
-    
-    # Run analysis if download succeeded
-    if os.path.exists(folder_path) and any(f.endswith('.mseed') for f in os.listdir(folder_path)):
-        sanitized_event_name = secure_filename(event_name)
-        main_script_path = os.path.join(ROOT_DIR, 'src', 'main.py')
-        cmd = [
-            'python', main_script_path,
-            '--earthquake_name', sanitized_event_name,
-            '--latitude', str(latitude),
-            '--longitude', str(longitude),
-            '--magnitude', str(data.get('magnitude', 5.3))
-        ]
-        try:
-            result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-            print("Analysis stdout:", result.stdout)
-            if result.stderr:
-                print("Analysis stderr:", result.stderr)
-            return jsonify({"message": "Data downloaded and analysis completed successfully.", "folder": folder_path}), 200
-        except subprocess.CalledProcessError as e:
-            print(f"Analysis failed: {e}")
-            return jsonify({"message": "Data downloaded, but analysis failed.", "folder": folder_path, "error": str(e), "stdout": e.stdout, "stderr": e.stderr}), 500
-    else:
-        return jsonify({"error": "No .mseed files found after download.", "folder": folder_path}), 500
+    return submit_job('download', run_download_job, event_name=event_name, event_time=event_time, delta_time=delta_time,
+                      latitude=latitude, longitude=longitude, magnitude=data.get('magnitude', 5.3), **parse_station_selection(data))
 
-@app.route('/run_analysis', methods=['POST'])
-def run_analysis():
-    """Triggers the seismic data analysis script."""
+@app.route('/stream/start', methods=['POST'])
+def stream_start():
+    """Starts streaming the stations around a point (or a given station list) from SeedLink into in-memory ring buffers."""
+    data = request.get_json(silent=True) or {}
+    options = {key: data[key] for key in ('server', 'stations', 'channel') if data.get(key)}
+    for key in ('buffer_minutes', 'latitude', 'longitude'):
+        if data.get(key) not in (None, ''):
+            options[key] = float(data[key])
+    options.update(parse_station_selection(data))
+    return jsonify(start_ingestor(**options).status()), 200
+
+@app.route('/stream/stop', methods=['POST'])
+def stream_stop():
+    """Stops streaming and releases the buffers."""
+    stop_ingestor()
+    return jsonify({"running": False}), 200
+
+@app.route('/stream/status', methods=['GET'])
+def stream_status():
+    """Reports the stream connection, per-station buffer lag and dropped/gap sample counts."""
+    ingestor = get_ingestor()
+    if ingestor is None:
+        return jsonify({"running": False}), 200
+    return jsonify(ingestor.status()), 200
+
+@app.route('/stream/analyze', methods=['POST'])
+def stream_analyze():
+    """Queues an analysis of an event window taken from the streaming buffers instead of downloading it."""
+    if get_ingestor() is None:
+        return jsonify({"error": "Streaming is not running. Start it with POST /stream/start."}), 409
     data = request.get_json()
-    earthquake_name = data.get('earthquake_name', 'Lamjung_Earthquake')
+    event_name = data.get('event_name')
     latitude = data.get('latitude')
     longitude = data.get('longitude')
-    magnitude = data.get('magnitude')
-    sanitized_earthquake_name = secure_filename(earthquake_name)
-    sanitized_magnitude = secure_filename(str(magnitude))
-    main_script_path = os.path.join(ROOT_DIR, 'src', 'main.py')
-    cmd = ['python', main_script_path, '--earthquake_name', sanitized_earthquake_name, '--magnitude', sanitized_magnitude]
-    if latitude is not None:
-        cmd.extend(['--latitude', str(latitude)])
-    if longitude is not None:
-        cmd.extend(['--longitude', str(longitude)])
+    if not all([event_name, latitude, longitude, data.get('event_time')]):
+        return jsonify({"error": "Event name, event time, latitude, and longitude are required."}), 400
+    return submit_job('stream', run_stream_job, event_name=event_name, event_time=parse_event_time(data.get('event_time')),
+                      delta_time=float(data.get('delta_time', 2)), latitude=latitude, longitude=longitude,
+                      magnitude=data.get('magnitude', 5.3), **parse_station_selection(data))
+
+@app.route('/run_analysis', methods=['POST'])
+def run_analysis():
+    """Queues the seismic data analysis script and returns the job id immediately."""
+    data = request.get_json()
+    return submit_job('analysis', run_analysis_job, earthquake_name=data.get('earthquake_name', 'Lamjung_Earthquake'),
+                      magnitude=data.get('magnitude', 5.3), latitude=data.get('latitude'), longitude=data.get('longitude'),
+                      origin_time=data.get('origin_time'), streaming=bool(data.get('streaming', False)),
+                      **parse_station_selection(data))
+
+def submit_job(kind, runner, **params):
+    """Submits a job to the queue and returns the 202 response pointing at its status URL."""
+    try:
+        job_id = job_queue.submit(kind, runner, **params)
+    except QueueFullError as e:
+        return jsonify({"error": "Too many pending jobs", "details": str(e)}), 503
+    status_url = f"/jobs/{job_id}"
+    return jsonify({"message": f"{kind.capitalize()} job queued.", "job_id": job_id, "status_url": status_url}), 202, {"Location": status_url}
+
+def job_to_json(job):
+    """Converts a job snapshot to its JSON representation."""
+    params = {key: (value.isoformat() if isinstance(value, datetime) else value) for key, value in job['params'].items()}
+    return {**job, "params": params}
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """Lists all known analysis jobs, newest first."""
+    return jsonify({"jobs": [job_to_json(job) for job in job_queue.list()]}), 200
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Reports a job's status, current stage and, once finished, links to its outputs."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job_to_json(job)), 200
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    Streams a job's events as Server-Sent Events until it finishes.
+
+    Events are 'status', 'stage', 'station' (one per downloaded station), 'trace' (picks and peaks, nearest
+    station first) and 'page' (a rendered velocity page and its preview image). A reconnecting client
+    resumes after the Last-Event-ID header (or the ?after= parameter) instead of receiving everything again.
+    """
+    if job_queue.get(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+    try:
+        after = int(request.headers.get('Last-Event-ID') or request.args.get('after', 0))
+    except ValueError:
+        return jsonify({"error": "Last-Event-ID must be an integer."}), 400
+
+    def stream(after):
+        yield "retry: 2000\n\n"
+        while True:
+            events, done = job_queue.wait_events(job_id, after, timeout=SSE_KEEPALIVE)
+            if events is None:
+                return
+            for event in events:
+                after = event['id']
+                yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+            if done:
+                return
+            if not events:
+                yield ": keep-alive\n\n"
+
+    return Response(stream(after), mimetype='text/event-stream', headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/results/<subfolder>/pages/<filename>', methods=['GET'])
+def page_preview(subfolder, filename):
+    """Serves a page preview image (PNG or WebP) written during the analysis."""
+    pages_dir = os.path.join(BASE_OUTPUT_FOLDER, secure_filename(subfolder), 'pages')
     try:
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-        print("Analysis stdout:", result.stdout)
-        if result.stderr:
-            print("Analysis stderr:", result.stderr)
-        return jsonify({"message": "Analysis script ran successfully.", "stdout": result.stdout, "stderr": result.stderr}), 200
-    except subprocess.CalledProcessError as e:
-        print(f"Script execution failed: {e}")
-        print(f"Full stdout: {e.stdout}")
-        print(f"Full stderr: {e.stderr}")
-        return jsonify({"error": "Script execution failed", "details": str(e), "stdout": e.stdout, "stderr": e.stderr}), 500
+        return send_artifact(pages_dir, secure_filename(filename))
+    except NotFound:
+        return jsonify({"error": "File not found", "details": "The requested page preview does not exist."}), 404
+
+@app.route('/results/<subfolder>/previews', methods=['GET'])
+def page_previews(subfolder):
+    """Lists the page previews of an analysed event by product (velocity, map, section, spectra)."""
+    pages_dir = os.path.join(BASE_OUTPUT_FOLDER, secure_filename(subfolder), 'pages')
+    if not os.path.isdir(pages_dir):
+        return jsonify({"error": "Previews not found", "details": "Run the analysis for this event first."}), 404
+    return jsonify({"subfolder": subfolder, "previews": list_previews(pages_dir, secure_filename(subfolder))}), 200
+
+def open_tile_store(subfolder):
+    """Returns the WaveformTiles of an analysed event, reopening it when a new analysis replaced it; None if absent."""
+    tiles_dir = os.path.join(BASE_OUTPUT_FOLDER, secure_filename(subfolder), 'tiles')
+    index_path = os.path.join(tiles_dir, tiles.INDEX_FILE)
+    if not os.path.exists(index_path):
+        return None
+    mtime = os.path.getmtime(index_path)
+    with _tile_stores_lock:
+        cached = _tile_stores.get(tiles_dir)
+        if cached is not None and cached[0] == mtime:
+            _tile_stores.move_to_end(tiles_dir)
+            return cached[1]
+    store = tiles.WaveformTiles(tiles_dir)
+    with _tile_stores_lock:
+        _tile_stores[tiles_dir] = (mtime, store)
+        _tile_stores.move_to_end(tiles_dir)
+        while len(_tile_stores) > MAX_OPEN_TILE_STORES:
+            _tile_stores.popitem(last=False)
+    return store
+
+def parse_tile_time(value):
+    """Parses a tile range bound given as Unix seconds or an ISO 8601 time; None when absent."""
+    if value in (None, ''):
+        return None
+    try:
+        return UTCDateTime(float(value))
+    except ValueError:
+        return UTCDateTime(value)
+
+@app.route('/results/<subfolder>/tiles', methods=['GET'])
+def waveform_tile_index(subfolder):
+    """Lists the traces of an event's waveform tiles (nearest first) with their time spans and levels."""
+    store = open_tile_store(subfolder)
+    if store is None:
+        return jsonify({"error": "Waveform tiles not found", "details": "Run the analysis for this event first."}), 404
+    traces = [
+        {"trace_id": trace_id, "station_code": store.station_codes[i], "dist_km": float(store.dist_km[i]),
+         "starttime": store.starttimes[i].timestamp, "sampling_rate": float(store.sampling_rates[i]), "npts": int(store.npts[i]),
+         "levels": [{"level": level, "bins": count, "bin_seconds": store.bin_seconds(i, level)}
+                    for level, count in enumerate(store.level_bins(i))]}
+        for i, trace_id in enumerate(store.ids)
+    ]
+    return jsonify({"subfolder": subfolder, "units": store.units, "level_factor": store.level_factor,
+                    "max_tile_bins": tiles.MAX_TILE_BINS, "traces": traces}), 200
+
+@app.route('/results/<subfolder>/tiles/<trace_id>', methods=['GET'])
+def waveform_tile(subfolder, trace_id):
+    """
+    Returns the min/max bins of one trace between ?start= and ?end= (Unix seconds or ISO 8601).
+
+    ?level= picks the pyramid level; ?width= (pixels) instead picks the coarsest level with at least one
+    bin per pixel. ?format=binary answers with little-endian float32 values (samples at level 0,
+    interleaved min/max pairs above) and the tile layout in X-Tile-* headers; the default is JSON.
+    """
+    store = open_tile_store(subfolder)
+    if store is None:
+        return jsonify({"error": "Waveform tiles not found", "details": "Run the analysis for this event first."}), 404
+    try:
+        i = store.position(trace_id)
+        starttime = parse_tile_time(request.args.get('start'))
+        endtime = parse_tile_time(request.args.get('end'))
+        if request.args.get('level') not in (None, ''):
+            level = int(request.args['level'])
+        else:
+            width = int(request.args.get('width', 1000))
+            level = store.level_for(i, starttime or store.starttimes[i],
+                                    endtime or store.starttimes[i] + store.npts[i] / store.sampling_rates[i], width)
+        first_time, mins, maxs = store.tile(i, level, starttime, endtime)
+    except KeyError as e:
+        return jsonify({"error": "Trace not found", "details": str(e)}), 404
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": "Invalid tile request", "details": str(e)}), 400
+
+    bin_seconds = store.bin_seconds(i, level)
+    if request.args.get('format') == 'binary':
+        values = mins if level == 0 else np.column_stack((mins, maxs))
+        headers = {"X-Tile-Level": str(level), "X-Tile-Start": repr(first_time.timestamp), "X-Tile-Bin-Seconds": repr(bin_seconds),
+                   "X-Tile-Bins": str(len(mins)),
+                   "Access-Control-Expose-Headers": "X-Tile-Level, X-Tile-Start, X-Tile-Bin-Seconds, X-Tile-Bins"}
+        return Response(np.ascontiguousarray(values, dtype='<f4').tobytes(), mimetype='application/octet-stream', headers=headers)
+    return jsonify({"trace_id": trace_id, "level": level, "start": first_time.timestamp, "bin_seconds": bin_seconds,
+                    "bins": len(mins), "units": store.units, "min": mins.tolist(), "max": maxs.tolist()}), 200
+
+@app.route('/results/<subfolder>/peaks', methods=['GET'])
+def station_peaks(subfolder):
+    """Returns the P picks and peak ground velocity/acceleration of every station of an analysed event."""
+    peaks_csv = os.path.join(BASE_OUTPUT_FOLDER, secure_filename(subfolder), 'station_peaks.csv')
+    if not os.path.exists(peaks_csv):
+        return jsonify({"error": "Peaks not found", "details": "Run the analysis for this event first."}), 404
+    return jsonify({"subfolder": subfolder, "units": {"pgv": "µm/s", "pga": "µm/s²"}, "stations": read_station_peaks(peaks_csv)}), 200
+
+@app.route('/results/<subfolder>/spectra', methods=['GET'])
+def station_spectra(subfolder):
+    """Returns the Welch PSD of every trace of an analysed event (the spectrograms stay in spectra.npz)."""
+    spectra_npz = os.path.join(BASE_OUTPUT_FOLDER, secure_filename(subfolder), 'spectra.npz')
+    if not os.path.exists(spectra_npz):
+        return jsonify({"error": "Spectra not found", "details": "Run the analysis for this event first."}), 404
+    spectra = read_spectra(spectra_npz)
+    psd_db = spectra["psd_db"].astype(float)
+    traces = [
+        {"trace_id": str(trace_id), "station_code": str(station_code), "dist_km": float(dist_km),
+         # NaN is not valid JSON; traces shorter than one Welch segment have no PSD
+         "psd_db": [round(value, 2) if np.isfinite(value) else None for value in row]}
+        for trace_id, station_code, dist_km, row in zip(spectra["trace_ids"], spectra["station_codes"], spectra["dist_km"], psd_db)
+    ]
+    return jsonify({"subfolder": subfolder, "units": str(spectra["units"]), "sampling_rate": float(spectra["sampling_rate"]),
+                    "freqs": spectra["psd_freqs"].tolist(), "traces": traces}), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Exposes run, stage, job queue, result cache and stream metrics in the Prometheus text format."""
+    gauges = []
+    jobs = job_queue.list()
+    for status in ('queued', 'running', 'finished', 'failed'):
+        gauges.append(('jobs', sum(job['status'] == status for job in jobs), {"status": status}, 'Known jobs by status.'))
+    cache = result_cache.cache_stats()
+    gauges.append(('result_cache_entries', cache['entries'], {}, 'Entries held by the result cache.'))
+    gauges.append(('result_cache_bytes', cache['bytes'], {}, 'Bytes held by the result cache.'))
+    ingestor = get_ingestor()
+    stream = ingestor.status() if ingestor is not None else {"running": False}
+    gauges.append(('stream_running', int(bool(stream['running'])), {}, 'Whether the SeedLink ingestor is running.'))
+    gauges.append(('stream_max_lag_seconds', stream.get('max_lag_s'), {}, 'Largest delay of a station buffer behind real time.'))
+    gauges.append(('stream_dropped_samples', stream.get('dropped_samples'), {}, 'Overlapping samples dropped by the stream buffers.'))
+    gauges.append(('stream_gap_samples', stream.get('gap_samples'), {}, 'Samples missing from the stream buffers.'))
+    return Response(registry.render(gauges), mimetype='text/plain; version=0.0.4')
 
 @app.route('/download/<subfolder>/<filename>', methods=['GET'])
 def download_file(subfolder, filename):
-    """Allows downloading of processed output files."""
+    """Allows downloading of processed output files; ?inline=1 opens them in the browser instead."""
     sanitized_subfolder = secure_filename(subfolder)
     sanitized_filename = secure_filename(filename)
     target_output_folder = os.path.join(BASE_OUTPUT_FOLDER, sanitized_subfolder)
     try:
-        return send_from_directory(target_output_folder, sanitized_filename, as_attachment=True)
-    except FileNotFoundError:
+        return send_artifact(target_output_folder, sanitized_filename, as_attachment=request.args.get('inline') != '1')
+    except NotFound:
         return jsonify({"error": "File not found", "details": "The requested file does not exist."}), 404
     except Exception as e:
         return jsonify({"error": "Error serving file", "details": str(e)}), 500
 
 if __name__ == '__main__':
+    # The debug reloader runs this block in a watcher process and again in the serving child; only the child
+    # (WERKZEUG_RUN_MAIN=true) serves requests, so only it starts the workers and the stream
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        if ANALYSIS_MODE == 'warm':
+            # Start the warm workers before serving so the first request does not pay their start-up cost
+            print(f"Warm analysis workers started: {get_warm_pool().prefork()}")
+        if os.environ.get('STREAM_AUTOSTART') == '1':
+            start_ingestor()
     app.run(debug=True, port=5000)
\ No newline at end of file
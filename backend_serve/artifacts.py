@@ -0,0 +1,108 @@
+import gzip
+import mimetypes
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from flask import request, send_file
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+from component.result_cache import hash_file
+
+# Seconds browsers may reuse an output file without asking again; 0 revalidates every time (a 304 costs no body)
+ARTIFACT_MAX_AGE = int(os.environ.get('ARTIFACT_MAX_AGE', 0))
+# Seconds browsers may reuse the page's static files (scripts, images); index.html is always revalidated
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 300))
+# Text-like outputs worth a gzip copy; PDF streams are mostly deflated already but their headers and fonts are not
+COMPRESSIBLE_EXTENSIONS = {'.csv', '.json', '.pdf', '.txt', '.svg', '.html', '.js', '.css'}
+# A gzip copy is only kept when it is at least this much smaller than the original
+MIN_GZIP_SAVING = 0.1
+PREVIEW_PATTERN = re.compile(r'^(?P<product>[a-z_]+)_(?P<page>\d+)\.png$')
+
+def strong_etag(path):
+    """Returns a strong ETag for a file's content, so a rewritten but identical file still matches."""
+    return hash_file(path)[:32]
+
+def precompress(path, level=9):
+    """
+    Writes path.gz next to a file when that saves at least MIN_GZIP_SAVING, and removes a stale copy
+    otherwise. Returns the .gz path, or None when no copy is kept.
+    """
+    gz_path = path + '.gz'
+    tmp_path = f"{gz_path}.{os.getpid()}.tmp"
+    with open(path, 'rb') as src, open(tmp_path, 'wb') as raw:
+        # mtime=0 makes the copy depend on the content only
+        with gzip.GzipFile(filename='', mode='wb', compresslevel=level, fileobj=raw, mtime=0) as dst:
+            for chunk in iter(lambda: src.read(1024 * 1024), b''):
+                dst.write(chunk)
+    if os.path.getsize(tmp_path) > (1 - MIN_GZIP_SAVING) * os.path.getsize(path):
+        os.remove(tmp_path)
+        if os.path.exists(gz_path):
+            os.remove(gz_path)
+        return None
+    os.replace(tmp_path, gz_path)
+    return gz_path
+
+def precompress_outputs(output_dir, max_workers=None):
+    """Precompresses the compressible files of an event's output folder in parallel; returns {name: saved bytes}."""
+    names = [name for name in sorted(os.listdir(output_dir))
+             if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS and os.path.isfile(os.path.join(output_dir, name))]
+    if not names:
+        return {}
+    # zlib releases the GIL, so threads compress in parallel
+    with ThreadPoolExecutor(max_workers=max_workers or min(len(names), os.cpu_count() or 1)) as executor:
+        gz_paths = list(executor.map(precompress, [os.path.join(output_dir, name) for name in names]))
+    return {name: os.path.getsize(os.path.join(output_dir, name)) - os.path.getsize(gz_path)
+            for name, gz_path in zip(names, gz_paths) if gz_path}
+
+def fresh_gzip(path):
+    """Returns the path of a precompressed copy written after the file itself, or None."""
+    gz_path = path + '.gz'
+    try:
+        if os.path.getmtime(gz_path) >= os.path.getmtime(path):
+            return gz_path
+    except OSError:
+        pass
+    return None
+
+def send_artifact(directory, filename, as_attachment=False, max_age=ARTIFACT_MAX_AGE):
+    """
+    Sends a file with a strong content ETag, conditional GET (304) and Range support.
+
+    Clients accepting gzip get the precompressed copy when there is one, under its own ETag. Range
+    requests always get the original bytes, so ranges stay valid for PDF viewers that load them
+    piecewise. Raises NotFound for a missing file or a path outside directory.
+    """
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+    etag = strong_etag(path)
+    gz_path = fresh_gzip(path)
+    send_path = path
+    if gz_path and request.accept_encodings['gzip'] and 'Range' not in request.headers:
+        send_path, etag = gz_path, etag + '-gzip'
+    response = send_file(send_path, mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream',
+                         as_attachment=as_attachment, download_name=os.path.basename(path), conditional=True,
+                         etag=etag, max_age=max_age)
+    if send_path != path:
+        response.headers['Content-Encoding'] = 'gzip'
+    if gz_path:
+        response.vary.add('Accept-Encoding')
+    response.headers['Access-Control-Expose-Headers'] = 'ETag, Content-Range, Content-Length, Content-Encoding'
+    return response
+
+def list_previews(pages_dir, subfolder):
+    """Returns {product: [{page, png, webp}]} with the URLs of an event's page previews, in page order."""
+    if not os.path.isdir(pages_dir):
+        return {}
+    previews = {}
+    for name in sorted(os.listdir(pages_dir)):
+        match = PREVIEW_PATTERN.match(name)
+        if not match:
+            continue
+        webp = name[:-len('.png')] + '.webp'
+        previews.setdefault(match['product'], []).append({
+            "page": int(match['page']),
+            "png": f"/results/{subfolder}/pages/{name}",
+            "webp": f"/results/{subfolder}/pages/{webp}" if os.path.exists(os.path.join(pages_dir, webp)) else None,
+        })
+    return previews
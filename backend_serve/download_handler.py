@@ -1,52 +1,219 @@
 import os
+import sys
+import time
 import requests
-import csv
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+from obspy import UTCDateTime
+from requests.adapters import HTTPAdapter
 from werkzeug.utils import secure_filename
 
-def get_nepal_stations():
-    """Reads station codes from assets/stations/nepal_stations.csv."""
-    stations_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'assets', 'stations', 'nepal_stations.csv')
-    nepal_stations = []
-    if not os.path.exists(stations_file):
-        print(f"Warning: Station file not found at {stations_file}. Using fallback station R038D.")
-        return ['R038D']  # Fallback if file is missing
-    try:
-        with open(stations_file, 'r', newline='') as csvfile:
-            reader = csv.reader(csvfile)
-            next(reader, None)  # Skip header row
-            for row in reader:
-                if row and len(row) > 0:  # Ensure row is not empty
-                    station_code = row[0].replace('AM.', '', 1).split('.')[0] if 'AM.' in row[0] else row[0]
-                    if station_code:  # Only add non-empty station codes
-                        nepal_stations.append(station_code)
-    except Exception as e:
-        print(f"Error reading station file: {e}. Using fallback station R038D.")
-        return ['R038D']
-    return nepal_stations if nepal_stations else ['R038D']  # Fallback if no valid stations found
-
-def download_raspberry_data(event_name, event_time, delta_time, latitude, longitude, base_upload_folder):
-    """Downloads seismic data for all Nepal stations from FDSN Dataselect."""
-    sanitized_event_name = secure_filename(event_name)
-    current_upload_folder = os.path.join(base_upload_folder, f"{sanitized_event_name}")
-    os.makedirs(current_upload_folder, exist_ok=True)
-    
-    # Convert delta_time to timedelta
-    delta = timedelta(minutes=delta_time)
-    start_time = (event_time - delta).strftime('%Y-%m-%dT%H:%M:%S')
-    end_time = (event_time + delta).strftime('%Y-%m-%dT%H:%M:%S')
-    
-    nepal_stations = get_nepal_stations()
-    for station in nepal_stations:
-        url = f"https://data.raspberryshake.org/fdsnws/dataselect/1/query?starttime={start_time}&endtime={end_time}&network=AM&station={station}"
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from component.metadata import nearby_station_codes
+from download_index import get_download_index
+
+# Base URL of the FDSN Dataselect service. Point it at a local stand-in server for testing.
+FDSN_DATASELECT_URL = os.environ.get('FDSN_DATASELECT_URL', 'https://data.raspberryshake.org/fdsnws/dataselect/1/query')
+DEFAULT_MAX_WORKERS = int(os.environ.get('DOWNLOAD_MAX_WORKERS', 16))
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5  # Seconds; doubled after every failed attempt
+REQUEST_TIMEOUT = 10
+# HTTP status codes that are worth retrying (rate limiting and transient server errors)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+def create_session(max_workers=DEFAULT_MAX_WORKERS):
+    """Creates a requests session whose connection pool is shared by all download workers."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def download_station(session, station, start_time, end_time, file_path, base_url=FDSN_DATASELECT_URL,
+                     retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, timeout=REQUEST_TIMEOUT):
+    """
+    Downloads one station's waveform window to file_path, retrying transient failures with exponential backoff.
+
+    Returns:
+        dict: Per-station result with 'station', 'status' ('ok', 'no_data' or 'failed'),
+              'attempts', 'bytes', 'elapsed_s' and 'error' (None on success).
+    """
+    params = {'starttime': start_time, 'endtime': end_time, 'network': 'AM', 'station': station}
+    started = time.monotonic()
+    error = None
+    attempt = 0
+    for attempt in range(1, retries + 2):
         try:
-            response = requests.get(url, timeout=10)
+            response = session.get(base_url, params=params, timeout=timeout)
+            # FDSN services answer 204 (or 404 with nodata=404) when the station has no data in the window
+            if response.status_code in (204, 404):
+                return {"station": station, "status": "no_data", "attempts": attempt, "bytes": 0,
+                        "elapsed_s": time.monotonic() - started, "error": f"HTTP {response.status_code}: no data"}
+            if response.status_code in RETRY_STATUS_CODES:
+                raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
             response.raise_for_status()
-            file_path = os.path.join(current_upload_folder, f"{station}_{event_name}.mseed")
+            if not response.content:
+                return {"station": station, "status": "no_data", "attempts": attempt, "bytes": 0,
+                        "elapsed_s": time.monotonic() - started, "error": "Empty response"}
             with open(file_path, 'wb') as f:
                 f.write(response.content)
-            print(f"Downloaded {station} data to {file_path}")
+            return {"station": station, "status": "ok", "attempts": attempt, "bytes": len(response.content),
+                    "elapsed_s": time.monotonic() - started, "error": None}
         except requests.RequestException as e:
-            print(f"Failed to download data for {station}: {e}")
-            continue
-    return {"message": "Data downloaded successfully.", "folder": current_upload_folder}
\ No newline at end of file
+            error = str(e)
+            status_code = getattr(e.response, 'status_code', None) if isinstance(e, requests.HTTPError) else None
+            # Client errors other than rate limiting will not succeed on retry
+            if status_code is not None and status_code not in RETRY_STATUS_CODES:
+                break
+            if attempt <= retries:
+                time.sleep(backoff * (2 ** (attempt - 1)))
+    return {"station": station, "status": "failed", "attempts": attempt, "bytes": 0,
+            "elapsed_s": time.monotonic() - started, "error": error}
+
+def download_station_window(session, index, station, start, end, file_path, base_url=FDSN_DATASELECT_URL,
+                            retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, timeout=REQUEST_TIMEOUT):
+    """
+    Writes one station's window to file_path, requesting only the parts that are not in the local archive.
+
+    Every missing sub-range is fetched into its own archive chunk and listed in the index; the window is
+    then assembled from the overlapping chunks, merged and trimmed to start and end. Sub-ranges the service
+    has no data for are listed as such and skipped until the entry expires.
+
+    Returns:
+        dict: download_station's result for the whole window, with 'bytes' counting the downloaded bytes
+              only, plus 'requests' (sub-ranges fetched) and 'cached_s' (seconds served from the archive).
+    """
+    started = time.monotonic()
+    missing = index.missing(station, start, end)
+    known_no_data_s = index.no_data_seconds(station, start, end)
+    result = {"station": station, "status": "ok", "attempts": 0, "bytes": 0, "requests": len(missing),
+              "cached_s": (end - start) - sum(e - s for s, e in missing) - known_no_data_s, "error": None}
+    for fetch_start, fetch_end in missing:
+        chunk_path = index.chunk_path(station, fetch_start, fetch_end)
+        os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+        fetched = download_station(session, station, fetch_start.strftime('%Y-%m-%dT%H:%M:%S.%f'),
+                                   fetch_end.strftime('%Y-%m-%dT%H:%M:%S.%f'), chunk_path, base_url, retries, backoff, timeout)
+        result["attempts"] += fetched["attempts"]
+        result["bytes"] += fetched["bytes"]
+        if fetched["status"] == "ok":
+            try:
+                index.add(station, chunk_path)
+            except Exception as e:
+                os.remove(chunk_path)
+                fetched["status"], fetched["error"] = "failed", f"Unreadable MiniSEED response: {e}"
+        if fetched["status"] == "failed":
+            result["status"], result["error"] = "failed", fetched["error"]
+        elif fetched["status"] == "no_data":
+            # Not requested again until the entry expires (see DownloadIndex.add_no_data)
+            index.add_no_data(station, fetch_start, fetch_end)
+            if result["error"] is None:
+                result["error"] = fetched["error"]
+    if result["status"] == "ok":
+        stream = index.read_window(station, start, end)
+        if stream:
+            stream.write(file_path, format="MSEED")
+            result["error"] = None
+        else:
+            result["status"] = "no_data"
+            result["error"] = result["error"] or "No data in the window"
+    result["elapsed_s"] = time.monotonic() - started
+    return result
+
+def download_raspberry_data(event_name, event_time, delta_time, latitude, longitude, base_upload_folder,
+                            stations=None, max_workers=DEFAULT_MAX_WORKERS, base_url=FDSN_DATASELECT_URL,
+                            retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, timeout=REQUEST_TIMEOUT,
+                            folder=None, index=None, max_radius_km=None, max_stations=None, progress_callback=None):
+    """
+    Downloads seismic data for the stations around the epicenter from FDSN Dataselect concurrently.
+
+    Stations are fetched by a bounded pool of worker threads sharing one HTTP connection pool,
+    so the total time is governed by the slowest station rather than the sum over all stations.
+    Only the parts of each station's window missing from the local archive are requested (see
+    download_station_window), so repeating or widening a window downloads just the new data.
+
+    Args:
+        event_name (str): Name of the event; used for the upload folder and file names.
+        event_time (datetime): Origin time of the event (UTC).
+        delta_time (float): Half-width of the download window in minutes.
+        latitude (float): Epicenter latitude.
+        longitude (float): Epicenter longitude.
+        base_upload_folder (str): Folder under which the event folder is created.
+        stations (list): Station codes to download. Defaults to the inventory stations the analysis selects
+            for the epicenter (see component.metadata.fetch_station_metadata).
+        max_workers (int): Maximum number of concurrent downloads.
+        base_url (str): FDSN Dataselect query URL.
+        retries (int): Number of retries per station after the first attempt.
+        backoff (float): Initial backoff delay in seconds, doubled after every retry.
+        timeout (float): Per-request timeout in seconds.
+        folder (str): Event folder to write to. Defaults to base_upload_folder/<event_name>.
+        index (DownloadIndex): Archive index to use. Defaults to the shared one under assets/cache/waveforms.
+        max_radius_km (float): Station selection radius when stations is not given (see fetch_station_metadata).
+        max_stations (int): Station count limit when stations is not given (see fetch_station_metadata).
+        progress_callback (callable): Optional `progress_callback('station', result)` called as each station
+            finishes, with its per-station result.
+
+    Returns:
+        dict: Summary with 'message', 'folder', 'succeeded', 'no_data', 'failed', 'stations', 'elapsed_s',
+              'bytes_downloaded' and 'cached_s' (station-seconds served from the archive).
+    """
+    sanitized_event_name = secure_filename(event_name)
+    current_upload_folder = folder or os.path.join(base_upload_folder, f"{sanitized_event_name}")
+    os.makedirs(current_upload_folder, exist_ok=True)
+    index = index or get_download_index()
+
+    # Convert delta_time to timedelta
+    delta = timedelta(minutes=delta_time)
+    start_time = UTCDateTime(event_time - delta)
+    end_time = UTCDateTime(event_time + delta)
+
+    if stations is None:
+        stations = [code.split('.', 1)[1] for code in nearby_station_codes(latitude, longitude, max_radius_km, max_stations)
+                    if code.startswith('AM.')]
+    max_workers = max(1, min(max_workers, len(stations) or 1))
+    started = time.monotonic()
+    results = []
+    with create_session(max_workers) as session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(download_station_window, session, index, station, start_time, end_time,
+                            os.path.join(current_upload_folder, f"{station}_{sanitized_event_name}.mseed"),
+                            base_url, retries, backoff, timeout): station
+            for station in stations
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if result["status"] == "ok":
+                print(f"Downloaded {result['station']} data ({result['bytes']} bytes in {result['requests']} request(s), "
+                      f"{result['cached_s']:.0f}s from the archive)")
+            else:
+                print(f"Failed to download data for {result['station']}: {result['error']}")
+            if progress_callback is not None:
+                progress_callback('station', result)
+    elapsed = time.monotonic() - started
+    index.evict()
+
+    results.sort(key=lambda r: r["station"])
+    succeeded = [r["station"] for r in results if r["status"] == "ok"]
+    no_data = [r["station"] for r in results if r["status"] == "no_data"]
+    failed = {r["station"]: r["error"] for r in results if r["status"] == "failed"}
+    bytes_downloaded = sum(r["bytes"] for r in results)
+    cached_s = sum(r["cached_s"] for r in results)
+    message = (f"Downloaded {len(succeeded)} of {len(stations)} stations in {elapsed:.1f}s "
+               f"({len(no_data)} without data, {len(failed)} failed; {bytes_downloaded / 1e6:.1f} MB fetched, "
+               f"{cached_s / 60:.0f} station-minutes from the archive).")
+    print(message)
+    return {
+        "message": message,
+        "folder": current_upload_folder,
+        "succeeded": succeeded,
+        "no_data": no_data,
+        "failed": failed,
+        "stations": results,
+        "elapsed_s": elapsed,
+        "bytes_downloaded": bytes_downloaded,
+        "cached_s": cached_s,
+    }
@@ -0,0 +1,260 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from obspy import Stream, UTCDateTime, read
+
+try:
+    import fcntl
+except ImportError:  # Windows: the index is only shared between the threads of one process
+    fcntl = None
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+ARCHIVE_DIR = os.path.join(ROOT_DIR, 'assets', 'cache', 'waveforms')
+INDEX_FILE = 'index.json'
+LOCK_FILE = 'index.lock'
+INDEX_VERSION = 1
+ARCHIVE_MAX_BYTES = int(float(os.environ.get('DOWNLOAD_ARCHIVE_MAX_BYTES', 5e9)))
+# Seconds a range the service had no data for is not requested again; stations upload late, so it expires
+NO_DATA_TTL = float(os.environ.get('DOWNLOAD_NO_DATA_TTL', 3600))
+# Missing pieces shorter than this (seconds) are not worth a request, e.g. the last sample interval of a window
+MIN_FETCH_S = 1.0
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def _subtract(span, covered):
+    """Returns the parts of span = (start, end) not covered by the sorted, non-overlapping covered spans."""
+    start, end = span
+    missing = []
+    for covered_start, covered_end in covered:
+        if covered_end <= start:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > start:
+            missing.append((start, covered_start))
+        start = max(start, covered_end)
+    if start < end:
+        missing.append((start, end))
+    return missing
+
+def _union(spans, tolerance=0.0):
+    """Merges spans that overlap or are at most tolerance seconds apart."""
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1] + tolerance:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(span) for span in merged]
+
+def _intersection(a, b):
+    result = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start, end = max(a[i][0], b[j][0]), min(a[i][1], b[j][1])
+        if start < end:
+            result.append((start, end))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+class DownloadIndex:
+    """
+    Records which (station, channel, time range) spans of downloaded data are held in the local archive.
+
+    Every FDSN response is kept as one chunk file under archive_dir/<station>/ and listed in index.json
+    with the span each of its channels covers (first sample to one interval past the last). A station's
+    coverage is the time covered by all of its channels, so a window is only re-requested where some
+    channel is missing. Ranges the service answered without data are listed too, until NO_DATA_TTL
+    seconds have passed.
+
+    Instances are shared per archive directory (see get_download_index). Several processes may download
+    into the same archive, so every change takes a file lock, re-reads index.json, applies the change to
+    what is on disk and replaces the file atomically; no process overwrites another's entries.
+    """
+
+    def __init__(self, archive_dir=ARCHIVE_DIR, max_bytes=ARCHIVE_MAX_BYTES, no_data_ttl=NO_DATA_TTL):
+        self.archive_dir = archive_dir
+        self.path = os.path.join(archive_dir, INDEX_FILE)
+        self.max_bytes = max_bytes
+        self.no_data_ttl = no_data_ttl
+        self._lock = threading.Lock()
+        self._loaded_stat = None
+        self.stations = {}
+        self.no_data = {}
+        with self._lock:
+            self._reload()
+
+    @contextmanager
+    def _locked(self):
+        """Holds the thread lock and, where supported, an exclusive lock on the archive's lock file."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self.archive_dir, exist_ok=True)
+            with open(os.path.join(self.archive_dir, LOCK_FILE), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _reload(self):
+        """Re-reads index.json when another process has replaced it since it was last read. Call under _lock."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if key == self._loaded_stat:
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                self.stations = data["stations"]
+                self.no_data = data.get("no_data", {})
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Download index unreadable ({e}); starting a new one.")
+        self._loaded_stat = key
+
+    def _chunks(self, station):
+        """Returns the station's chunks whose files still exist, dropping entries for deleted files."""
+        chunks = self.stations.get(station, [])
+        kept = [chunk for chunk in chunks if os.path.exists(os.path.join(self.archive_dir, chunk["file"]))]
+        if len(kept) != len(chunks):
+            self.stations[station] = kept
+        return kept
+
+    def _no_data_spans(self, station):
+        """Returns the station's unexpired no-data spans, merged and sorted."""
+        now = time.time()
+        return _union([(start, end) for start, end, expires_at in self.no_data.get(station, []) if expires_at > now])
+
+    def coverage(self, station):
+        """Returns the sorted spans (POSIX seconds) in which every known channel of the station is held."""
+        with self._lock:
+            self._reload()
+            chunks = self._chunks(station)
+        per_channel = {}
+        for chunk in chunks:
+            for channel, spans in chunk["channels"].items():
+                per_channel.setdefault(channel, []).extend(tuple(span) for span in spans)
+        covered = None
+        for spans in per_channel.values():
+            spans = _union(spans)
+            covered = spans if covered is None else _intersection(covered, spans)
+        return covered or []
+
+    def missing(self, station, start, end):
+        """
+        Returns the (start, end) UTCDateTime ranges of the window that are not held yet, leaving out
+        ranges recently found to have no data.
+        """
+        with self._lock:
+            self._reload()
+            no_data = self._no_data_spans(station)
+        known = _union(self.coverage(station) + no_data)
+        return [(UTCDateTime(s), UTCDateTime(e)) for s, e in _subtract((start.timestamp, end.timestamp), known)
+                if e - s >= MIN_FETCH_S]
+
+    def no_data_seconds(self, station, start, end):
+        """Returns the seconds of the window that are known to have no data and are not held either."""
+        with self._lock:
+            self._reload()
+            no_data = self._no_data_spans(station)
+        window = _subtract((start.timestamp, end.timestamp), self.coverage(station))
+        return sum(e - s for s, e in _intersection(window, no_data))
+
+    def chunk_path(self, station, start, end):
+        """Returns a unique archive path for a new chunk of the station covering start to end."""
+        name = f"{start.strftime('%Y%m%dT%H%M%S')}_{end.strftime('%Y%m%dT%H%M%S')}_{uuid.uuid4().hex}.mseed"
+        return os.path.join(self.archive_dir, station, name)
+
+    def add(self, station, path):
+        """Lists a downloaded chunk file under the station with the spans of its channels."""
+        spans = {}
+        for tr in read(path, format="MSEED", headonly=True):
+            spans.setdefault(tr.stats.channel, []).append(
+                (tr.stats.starttime.timestamp, tr.stats.endtime.timestamp + tr.stats.delta))
+        chunk = {
+            "file": os.path.relpath(path, self.archive_dir),
+            "channels": {channel: [list(span) for span in _union(channel_spans, tolerance=1e-3)] for channel, channel_spans in spans.items()},
+            "bytes": os.path.getsize(path),
+            "fetched_at": time.time(),
+        }
+        with self._locked():
+            self._reload()
+            self.stations.setdefault(station, []).append(chunk)
+            self._save()
+
+    def add_no_data(self, station, start, end):
+        """Records that the service had no data for the station between start and end, for no_data_ttl seconds."""
+        with self._locked():
+            self._reload()
+            self.no_data.setdefault(station, []).append([start.timestamp, end.timestamp, time.time() + self.no_data_ttl])
+            self._save()
+
+    def read_window(self, station, start, end):
+        """Returns the station's archived data between start and end as one merged, trimmed Stream."""
+        with self._lock:
+            self._reload()
+            chunks = self._chunks(station)
+        stream = Stream()
+        for chunk in chunks:
+            chunk_spans = [span for spans in chunk["channels"].values() for span in spans]
+            if not any(s < end.timestamp and e > start.timestamp for s, e in chunk_spans):
+                continue
+            stream += read(os.path.join(self.archive_dir, chunk["file"]), format="MSEED", starttime=start, endtime=end)
+        if not stream:
+            return stream
+        # Overlapping chunks hold identical samples, so merging only removes the duplicates
+        stream.merge(method=1)
+        stream.trim(start, end)
+        return Stream([tr for tr in stream.split() if tr.stats.npts > 0])
+
+    def evict(self):
+        """Deletes the oldest chunks until the archive fits within max_bytes."""
+        with self._locked():
+            self._reload()
+            chunks = [(chunk["fetched_at"], station, chunk) for station in list(self.stations) for chunk in self._chunks(station)]
+            total = sum(chunk["bytes"] for _, _, chunk in chunks)
+            if total <= self.max_bytes:
+                return
+            for _, station, chunk in sorted(chunks, key=lambda item: item[0]):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.archive_dir, chunk["file"]))
+                except OSError:
+                    pass
+                self.stations[station].remove(chunk)
+                total -= chunk["bytes"]
+            self._save()
+        print(f"Evicted old downloads; the archive now holds {total / 1e6:.1f} MB")
+
+    def _save(self):
+        """Replaces index.json atomically, dropping expired no-data ranges. Call under _locked after _reload."""
+        now = time.time()
+        no_data = {station: [span for span in spans if span[2] > now] for station, spans in self.no_data.items()}
+        self.no_data = {station: spans for station, spans in no_data.items() if spans}
+        os.makedirs(self.archive_dir, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"version": INDEX_VERSION, "stations": self.stations, "no_data": self.no_data}, f)
+        os.replace(tmp_path, self.path)
+        stat = os.stat(self.path)
+        self._loaded_stat = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+def get_download_index(archive_dir=ARCHIVE_DIR):
+    """Returns the process-wide index of the archive directory, loading it on first use."""
+    with _indexes_lock:
+        if archive_dir not in _indexes:
+            _indexes[archive_dir] = DownloadIndex(archive_dir)
+        return _indexes[archive_dir]
@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Progress stages reported by a job, in pipeline order; other progress events leave the stage unchanged
+JOB_STAGES = ('download', 'metadata', 'read', 'preprocess', 'detect', 'map', 'plot', 'spectra')
+DEFAULT_MAX_WORKERS = int(os.environ.get('ANALYSIS_MAX_WORKERS', 2))
+DEFAULT_MAX_PENDING = int(os.environ.get('ANALYSIS_MAX_PENDING', 50))
+# Finished jobs are kept this long (seconds) so clients can still poll their status
+JOB_RETENTION = 24 * 3600
+# Events kept per job for clients that connect late or reconnect; older ones are dropped first
+MAX_JOB_EVENTS = int(os.environ.get('JOB_MAX_EVENTS', 5000))
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue already holds its maximum number of pending jobs."""
+
+class JobQueue:
+    """
+    Bounded pool of background workers that run analysis jobs outside the Flask request.
+
+    Each job is a plain dict (see `snapshot`) updated under a lock by the worker that runs it.
+    A runner is a callable `runner(job_id, progress, **params)` returning a JSON-serialisable result;
+    it reports its stage through `progress(stage, data=None)`. Every progress call, stage or not (such as
+    'station', 'trace' or 'page' results), is also appended to the job's numbered event log, which
+    `wait_events` hands to listeners as it grows.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, max_pending=DEFAULT_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis-job')
+        self._jobs = {}
+        self._events = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def submit(self, kind, runner, **params):
+        """Queues a job and returns its id immediately."""
+        with self._lock:
+            self._expire_old_jobs()
+            pending = sum(1 for job in self._jobs.values() if job['status'] in ('queued', 'running'))
+            if pending >= self.max_pending:
+                raise QueueFullError(f"{pending} jobs are already pending; try again later.")
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'id': job_id,
+                'kind': kind,
+                'status': 'queued',
+                'stage': None,
+                'params': params,
+                'result': None,
+                'error': None,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'last_event_id': 0,
+            }
+            self._events[job_id] = deque(maxlen=MAX_JOB_EVENTS)
+            self._publish(job_id, 'status', {'status': 'queued'})
+        self._executor.submit(self._run, job_id, runner, params)
+        return job_id
+
+    def get(self, job_id):
+        """Returns a copy of the job, or None if it is unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self.snapshot(job) if job else None
+
+    def list(self):
+        """Returns copies of all known jobs, newest first."""
+        with self._lock:
+            jobs = [self.snapshot(job) for job in self._jobs.values()]
+        return sorted(jobs, key=lambda job: job['created_at'], reverse=True)
+
+    def wait_events(self, job_id, after=0, timeout=15.0):
+        """
+        Returns (events, done) for the job's events numbered above `after`, waiting up to timeout seconds for one.
+
+        events is None for an unknown job; done is True once the job has finished or failed, after which
+        no further events are published.
+        """
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return None, True
+                events = [event for event in self._events[job_id] if event['id'] > after]
+                done = job['status'] in ('finished', 'failed')
+                remaining = deadline - time.monotonic()
+                if events or done or remaining <= 0:
+                    return events, done
+                self._changed.wait(remaining)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    @staticmethod
+    def snapshot(job):
+        snapshot = dict(job)
+        snapshot['params'] = dict(job['params'])
+        return snapshot
+
+    def _update(self, job_id, event=None, data=None, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+            if event is not None:
+                self._publish(job_id, event, data)
+
+    def _publish(self, job_id, event, data):
+        """Appends an event to the job's log and wakes its listeners; the caller holds the lock."""
+        job = self._jobs[job_id]
+        job['last_event_id'] += 1
+        self._events[job_id].append({'id': job['last_event_id'], 'event': event, 'data': data, 'time': time.time()})
+        self._changed.notify_all()
+
+    def _run(self, job_id, runner, params):
+        self._update(job_id, 'status', {'status': 'running'}, status='running', started_at=time.time())
+
+        def progress(stage, data=None):
+            if stage in JOB_STAGES:
+                self._update(job_id, 'stage', {'stage': stage, **(data or {})}, stage=stage)
+            else:
+                self._update(job_id, stage, data)
+
+        try:
+            result = runner(job_id, progress, **params)
+            self._update(job_id, 'status', {'status': 'finished'}, status='finished', stage='done', result=result,
+                         finished_at=time.time())
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            self._update(job_id, 'status', {'status': 'failed', 'error': str(e)}, status='failed', error=str(e),
+                         result=getattr(e, 'result', None), finished_at=time.time())
+
+    def _expire_old_jobs(self):
+        cutoff = time.time() - JOB_RETENTION
+        expired = [job_id for job_id, job in self._jobs.items() if job['finished_at'] and job['finished_at'] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+            del self._events[job_id]
+
+class JobError(Exception):
+    """Raised by a runner to fail a job while still attaching a partial result (e.g. captured output)."""
+
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
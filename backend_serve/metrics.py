@@ -0,0 +1,107 @@
+import threading
+
+# Upper bounds (seconds) of the stage duration histogram buckets
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+METRIC_PREFIX = 'seismic_'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+class MetricsRegistry:
+    """
+    In-process counters and histograms rendered in the Prometheus text exposition format.
+
+    Analysis runs feed it their run reports (see component.profiling); gauges that describe current state,
+    such as queue depth or stream lag, are passed to render() when /metrics is scraped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+
+    def inc(self, name, value=1, help_text=None, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            if help_text:
+                self._help[name] = help_text
+
+    def observe(self, name, value, buckets=STAGE_BUCKETS, help_text=None, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.setdefault(key, {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+            if help_text:
+                self._help[name] = help_text
+
+    def observe_run(self, report, kind='analysis'):
+        """Records one run report: its status, per-stage wall and CPU time, data volumes and peak RSS."""
+        if not report:
+            return
+        self.inc('runs_total', help_text='Analysis runs by status.', kind=kind, status=report['status'])
+        self.inc('run_wall_seconds_total', report['wall_s'], help_text='Wall time spent in analysis runs.', kind=kind)
+        self.inc('run_cpu_seconds_total', report['cpu_s'], help_text='CPU time of analysis runs, including their pools.', kind=kind)
+        for stage in report['stages']:
+            self.observe('stage_wall_seconds', stage['wall_s'], help_text='Wall time of each pipeline stage.', stage=stage['stage'])
+            self.inc('stage_cpu_seconds_total', stage['cpu_s'], help_text='CPU time of each pipeline stage.', stage=stage['stage'])
+        for name, value in report['counters'].items():
+            self.inc(f'{name}_total', value, help_text=f'{name.replace("_", " ").capitalize()} processed by analysis runs.')
+        # Only reports measured over the run itself; a process's lifetime peak says nothing about this run
+        if report.get('peak_rss_scope') == 'run':
+            self.observe('run_peak_rss_bytes', report['peak_rss_bytes'], buckets=tuple(2 ** n * 1024 ** 2 for n in range(5, 14)),
+                         help_text='Peak resident memory of the analysis process during each run.')
+
+    def render(self, gauges=()):
+        """
+        Returns the metrics as Prometheus exposition text.
+
+        Args:
+            gauges (iterable): Extra (name, value, labels dict, help text) tuples describing current state.
+        """
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+            help_texts = dict(self._help)
+
+        def header(name, metric_type, help_text=None):
+            if help_text:
+                lines.append(f'# HELP {METRIC_PREFIX}{name} {help_text}')
+            lines.append(f'# TYPE {METRIC_PREFIX}{name} {metric_type}')
+
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                header(name, 'counter', help_texts.get(name))
+                seen.add(name)
+            lines.append(f'{METRIC_PREFIX}{name}{_labels(labels)} {value}')
+        for (name, labels), histogram in histograms:
+            if name not in seen:
+                header(name, 'histogram', help_texts.get(name))
+                seen.add(name)
+            for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                lines.append(f'{METRIC_PREFIX}{name}_bucket{_labels(labels + (("le", bound),))} {count}')
+            lines.append(f'{METRIC_PREFIX}{name}_bucket{_labels(labels + (("le", "+Inf"),))} {histogram["count"]}')
+            lines.append(f'{METRIC_PREFIX}{name}_sum{_labels(labels)} {histogram["sum"]}')
+            lines.append(f'{METRIC_PREFIX}{name}_count{_labels(labels)} {histogram["count"]}')
+        for name, value, labels, help_text in gauges:
+            if value is None:
+                continue
+            if name not in seen:
+                header(name, 'gauge', help_text)
+                seen.add(name)
+            lines.append(f'{METRIC_PREFIX}{name}{_labels(tuple(labels.items()))} {value}')
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
@@ -0,0 +1,339 @@
+import os
+import threading
+import time
+import numpy as np
+from obspy import Stream, Trace, UTCDateTime
+from obspy.clients.seedlink.client.seedlinkconnection import SeedLinkConnection
+from obspy.clients.seedlink.slpacket import SLPacket
+from download_handler import nearby_station_codes
+
+# SeedLink server to stream from. Point it at a local stand-in (benchmarks/seedlink_stub.py) for testing.
+SEEDLINK_SERVER = os.environ.get('SEEDLINK_SERVER', 'rtserve.raspberryshake.org:18000')
+STREAM_BUFFER_MINUTES = float(os.environ.get('STREAM_BUFFER_MINUTES', 10))
+STREAM_NETWORK = 'AM'
+STREAM_CHANNEL = 'EHZ'
+# Stations are selected around this point like an event's (STATION_MAX_RADIUS_KM, STATION_MAX_COUNT) unless listed explicitly
+STREAM_LATITUDE = float(os.environ.get('STREAM_LATITUDE', 28.2292))
+STREAM_LONGITUDE = float(os.environ.get('STREAM_LONGITUDE', 84.3985))
+# How long a snapshot waits for the buffers to reach the end of the requested window
+STREAM_WAIT_TIMEOUT = float(os.environ.get('STREAM_WAIT_TIMEOUT', 30))
+RECONNECT_DELAY = 5  # Seconds between reconnection attempts after the server drops the connection
+
+class StationBuffer:
+    """
+    Fixed-size ring buffer holding the most recent capacity_s seconds of one channel.
+
+    Samples are written in place with wrap-around, so memory stays constant however long the stream runs.
+    Packets that overlap data already held are trimmed (and counted as dropped samples); gaps are recorded
+    in a validity mask so a window spanning a gap comes back as a masked trace.
+    """
+
+    def __init__(self, trace_id, sampling_rate, capacity_s, dtype=np.int32):
+        self.trace_id = trace_id
+        self.capacity_s = capacity_s
+        self._allocate(sampling_rate, dtype)
+        self.packets = 0
+        self.samples = 0
+        self.dropped_samples = 0
+        self.gap_samples = 0
+        self.resets = 0
+        self.last_packet_at = None
+
+    def _allocate(self, sampling_rate, dtype):
+        self.sampling_rate = float(sampling_rate)
+        self.capacity = max(1, int(round(self.capacity_s * self.sampling_rate)))
+        self.data = np.zeros(self.capacity, dtype=dtype)
+        self.valid = np.zeros(self.capacity, dtype=bool)
+        self.head = 0  # Next write position
+        self.filled = 0  # Samples held, up to capacity
+        self.end_time = None  # Time of the sample after the newest one
+
+    @property
+    def start_time(self):
+        return None if self.end_time is None else self.end_time - self.filled / self.sampling_rate
+
+    def _reset(self, starttime):
+        self.head = 0
+        self.filled = 0
+        self.valid[:] = False
+        self.end_time = starttime
+
+    def _write(self, values, valid):
+        n = len(values)
+        if n >= self.capacity:
+            values, valid, n = values[-self.capacity:], valid[-self.capacity:], self.capacity
+        first = min(n, self.capacity - self.head)
+        self.data[self.head:self.head + first] = values[:first]
+        self.valid[self.head:self.head + first] = valid[:first]
+        self.data[:n - first] = values[first:]
+        self.valid[:n - first] = valid[first:]
+        self.head = (self.head + n) % self.capacity
+        self.filled = min(self.capacity, self.filled + n)
+
+    def append(self, tr):
+        """Appends a packet's samples, trimming overlaps and marking gaps since the previous packet."""
+        self.packets += 1
+        self.last_packet_at = time.time()
+        data = tr.data
+        if tr.stats.sampling_rate != self.sampling_rate:
+            # A changed sampling rate starts the buffer afresh at the new rate
+            self._allocate(tr.stats.sampling_rate, self.data.dtype)
+            self.resets += 1
+        if self.end_time is None:
+            self._reset(tr.stats.starttime)
+        shift = int(round((tr.stats.starttime - self.end_time) * self.sampling_rate))
+        if shift < 0:
+            overlap = min(-shift, len(data))
+            self.dropped_samples += overlap
+            data = data[overlap:]
+            if len(data) == 0:
+                return
+        elif shift > 0:
+            self.gap_samples += shift
+            if shift >= self.capacity:
+                self._reset(tr.stats.starttime)
+            else:
+                self._write(np.zeros(shift, dtype=self.data.dtype), np.zeros(shift, dtype=bool))
+                self.end_time += shift / self.sampling_rate
+        self._write(data.astype(self.data.dtype, copy=False), np.ones(len(data), dtype=bool))
+        self.end_time += len(data) / self.sampling_rate
+        self.samples += len(data)
+
+    def window(self, starttime, endtime):
+        """Returns the samples between starttime and endtime as a Trace (masked over gaps), or None."""
+        if self.end_time is None or self.filled == 0:
+            return None
+        first = max(0, int(np.ceil((starttime - self.start_time) * self.sampling_rate)))
+        last = min(self.filled, int(np.floor((endtime - self.start_time) * self.sampling_rate)) + 1)
+        if last <= first:
+            return None
+        positions = (self.head - self.filled + np.arange(first, last)) % self.capacity
+        data = self.data[positions]
+        valid = self.valid[positions]
+        if not valid.any():
+            return None
+        if not valid.all():
+            data = np.ma.masked_array(data, mask=~valid)
+        network, station, location, channel = self.trace_id.split('.')
+        header = {'network': network, 'station': station, 'location': location, 'channel': channel,
+                  'sampling_rate': self.sampling_rate, 'starttime': self.start_time + first / self.sampling_rate}
+        return Trace(data=data, header=header)
+
+    def metrics(self, now=None):
+        now = now if now is not None else UTCDateTime()
+        return {
+            "id": self.trace_id,
+            "sampling_rate": self.sampling_rate,
+            "buffered_s": self.filled / self.sampling_rate,
+            "start_time": str(self.start_time) if self.end_time is not None else None,
+            "end_time": str(self.end_time) if self.end_time is not None else None,
+            "lag_s": (now - self.end_time) if self.end_time is not None else None,
+            "packets": self.packets,
+            "samples": self.samples,
+            "dropped_samples": self.dropped_samples,
+            "gap_samples": self.gap_samples,
+            "resets": self.resets,
+        }
+
+class StreamingIngestor:
+    """
+    Long-running SeedLink client that keeps the last buffer_minutes of every selected station in memory.
+
+    The connection runs on a daemon thread; each received packet is appended to its station's
+    StationBuffer. snapshot() writes an event window straight from the buffers, so an analysis can
+    start as soon as the data has arrived instead of downloading it again.
+    """
+
+    def __init__(self, server=SEEDLINK_SERVER, stations=None, network=STREAM_NETWORK, channel=STREAM_CHANNEL,
+                 buffer_minutes=STREAM_BUFFER_MINUTES, latitude=STREAM_LATITUDE, longitude=STREAM_LONGITUDE,
+                 max_radius_km=None, max_stations=None):
+        self.server = server
+        if stations is None:
+            stations = [code.split('.', 1)[1] for code in nearby_station_codes(latitude, longitude, max_radius_km, max_stations)
+                        if code.startswith(network + '.')]
+        self.stations = stations
+        self.network = network
+        self.channel = channel
+        self.capacity_s = buffer_minutes * 60.0
+        self.buffers = {}
+        self.errors = 0
+        self.started_at = None
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._connection = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def settings(self):
+        """Returns what is streamed and how, for telling whether a start request asks for something else."""
+        return {"server": self.server, "stations": sorted(self.stations), "network": self.network,
+                "channel": self.channel, "buffer_minutes": self.capacity_s / 60.0}
+
+    def start(self):
+        """Connects and starts streaming on a background thread."""
+        if self.running:
+            return
+        self._stopped.clear()
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name='seedlink-ingestor', daemon=True)
+        self._thread.start()
+        print(f"Streaming {len(self.stations)} stations from {self.server} ({self.capacity_s / 60:g} min buffers)")
+
+    def stop(self, timeout=10):
+        """Terminates the connection and waits for the streaming thread to finish."""
+        self._stopped.set()
+        if self._connection is not None:
+            self._connection.terminate()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _connect(self):
+        connection = SeedLinkConnection(timeout=30)
+        connection.set_sl_address(self.server)
+        connection.set_net_delay(RECONNECT_DELAY)
+        connection.set_net_timeout(60)
+        for station in self.stations:
+            connection.add_stream(self.network, station, self.channel, seqnum=-1, timestamp=None)
+        return connection
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self._connection = self._connect()
+                while not self._stopped.is_set():
+                    packet = self._connection.collect()
+                    if packet == SLPacket.SLTERMINATE:
+                        break
+                    if packet == SLPacket.SLERROR:
+                        self.errors += 1
+                        continue
+                    if packet.get_type() in (SLPacket.TYPE_SLINF, SLPacket.TYPE_SLINFT):
+                        continue
+                    self.on_trace(packet.get_trace())
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                print(f"SeedLink stream from {self.server} failed: {e}. Reconnecting in {RECONNECT_DELAY}s.")
+            finally:
+                if self._connection is not None:
+                    self._connection.disconnect()
+            self._stopped.wait(RECONNECT_DELAY)
+
+    def on_trace(self, tr):
+        """Appends one received packet to its station buffer."""
+        with self._lock:
+            buffer = self.buffers.get(tr.id)
+            if buffer is None:
+                buffer = StationBuffer(tr.id, tr.stats.sampling_rate, self.capacity_s, tr.data.dtype)
+                self.buffers[tr.id] = buffer
+            buffer.append(tr)
+
+    def wait_for(self, endtime, timeout=STREAM_WAIT_TIMEOUT):
+        """Waits until every buffer that is receiving data has reached endtime, or until timeout."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                ends = [buffer.end_time for buffer in self.buffers.values() if buffer.end_time is not None]
+            if ends and min(ends) >= endtime:
+                return True
+            time.sleep(0.2)
+        return False
+
+    def snapshot(self, starttime, endtime, folder, event_name, wait_timeout=STREAM_WAIT_TIMEOUT):
+        """
+        Writes every station's samples between starttime and endtime to <folder>/<station>_<event_name>.mseed.
+
+        Returns:
+            dict: Summary with 'message', 'folder', 'succeeded', 'no_data', 'failed', 'stations' and 'elapsed_s',
+                  in the same form as download_raspberry_data.
+        """
+        started = time.monotonic()
+        complete = self.wait_for(endtime, wait_timeout)
+        os.makedirs(folder, exist_ok=True)
+        with self._lock:
+            windows = {buffer.trace_id: buffer.window(starttime, endtime) for buffer in self.buffers.values()}
+        results = []
+        for station in self.stations:
+            traces = [tr for trace_id, tr in windows.items() if tr is not None and trace_id.split('.')[1] == station]
+            if not traces:
+                results.append({"station": station, "status": "no_data", "bytes": 0, "error": None})
+                continue
+            file_path = os.path.join(folder, f"{station}_{event_name}.mseed")
+            try:
+                Stream(traces).split().write(file_path, format='MSEED')
+                results.append({"station": station, "status": "ok", "bytes": os.path.getsize(file_path), "error": None})
+            except Exception as e:
+                results.append({"station": station, "status": "failed", "bytes": 0, "error": str(e)})
+        elapsed = time.monotonic() - started
+
+        succeeded = [r["station"] for r in results if r["status"] == "ok"]
+        no_data = [r["station"] for r in results if r["status"] == "no_data"]
+        failed = {r["station"]: r["error"] for r in results if r["status"] == "failed"}
+        message = (f"Wrote {len(succeeded)} of {len(self.stations)} stations from the stream buffers in {elapsed:.1f}s "
+                   f"({len(no_data)} without data, {len(failed)} failed"
+                   f"{'' if complete else ', window end not yet reached by every station'}).")
+        print(message)
+        return {"message": message, "folder": folder, "succeeded": succeeded, "no_data": no_data,
+                "failed": failed, "stations": results, "elapsed_s": elapsed}
+
+    def status(self):
+        """Returns connection state, totals and per-buffer lag and drop counts."""
+        now = UTCDateTime()
+        with self._lock:
+            buffers = [buffer.metrics(now) for buffer in self.buffers.values()]
+        lags = [b["lag_s"] for b in buffers if b["lag_s"] is not None]
+        return {
+            "running": self.running,
+            "server": self.server,
+            "stations": len(self.stations),
+            "channel": self.channel,
+            "buffer_minutes": self.capacity_s / 60.0,
+            "started_at": self.started_at,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "receiving": len(buffers),
+            "max_lag_s": max(lags) if lags else None,
+            "median_lag_s": float(np.median(lags)) if lags else None,
+            "dropped_samples": sum(b["dropped_samples"] for b in buffers),
+            "gap_samples": sum(b["gap_samples"] for b in buffers),
+            "buffers": sorted(buffers, key=lambda b: b["id"]),
+        }
+
+_ingestor = None
+_ingestor_lock = threading.Lock()
+
+def get_ingestor():
+    """Returns the process-wide streaming ingestor, or None if streaming has not been started."""
+    return _ingestor
+
+def start_ingestor(**kwargs):
+    """
+    Starts the process-wide streaming ingestor and returns it.
+
+    A running ingestor with the same settings (after station selection) is returned as it is. One with
+    other stations, server, channel or buffer length is stopped and replaced, so a new selection always
+    takes effect; the old buffers are discarded.
+    """
+    global _ingestor
+    with _ingestor_lock:
+        ingestor = StreamingIngestor(**kwargs)
+        if _ingestor is not None and _ingestor.running:
+            if _ingestor.settings() == ingestor.settings():
+                return _ingestor
+            print("Streaming settings changed; restarting the SeedLink stream.")
+            _ingestor.stop()
+        _ingestor = ingestor
+        _ingestor.start()
+        return _ingestor
+
+def stop_ingestor():
+    """Stops the process-wide streaming ingestor, if any."""
+    global _ingestor
+    with _ingestor_lock:
+        if _ingestor is not None:
+            _ingestor.stop()
+        _ingestor = None
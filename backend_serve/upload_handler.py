@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from werkzeug.utils import secure_filename
+
+MSEED_HEADER_SIZE = 48
+MSEED_QUALITY_CODES = b'DRQM'
+BLOCKETTE_1000 = 1000
+READ_SIZE = 1024 * 1024  # Bytes read from the request stream at a time
+UPLOAD_STATE_DIR = '.uploads'  # Per-event folder holding partial uploads and their state
+
+_locks = {}  # upload_id -> [lock, number of requests using it]
+_locks_guard = threading.Lock()
+
+class UploadError(Exception):
+    """Raised for an upload request that cannot be applied; carries the HTTP status to answer with."""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+@contextmanager
+def upload_lock(upload_id):
+    """
+    Holds the lock serialising writes to one upload; different uploads proceed in parallel.
+
+    An entry is dropped when the last request using it is done, so the table only holds uploads in progress.
+    """
+    with _locks_guard:
+        entry = _locks.setdefault(upload_id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _locks[upload_id]
+
+def parse_record_header(header):
+    """
+    Validates a 48-byte MiniSEED 2 fixed header.
+
+    Returns:
+        tuple: (struct byte-order prefix, offset of the first blockette).
+
+    Raises:
+        UploadError: If the bytes are not a MiniSEED data record header.
+    """
+    if not (header[0:6].replace(b' ', b'0').isdigit() and header[6] in MSEED_QUALITY_CODES):
+        raise UploadError("Not a MiniSEED data record header", 422)
+    # Byte order is not flagged in the header; the one giving a plausible BTIME year is used
+    for endian in ('>', '<'):
+        year, day = struct.unpack(endian + 'HH', header[20:24])
+        if 1900 <= year <= 2100 and 1 <= day <= 366:
+            break
+    else:
+        raise UploadError("MiniSEED header has an invalid start time", 422)
+    first_blockette = struct.unpack(endian + 'H', header[46:48])[0]
+    return endian, first_blockette
+
+def validate_chunk(state, part_path, chunk, chunk_offset):
+    """
+    Validates every record header that is complete once chunk (written at chunk_offset) has arrived.
+
+    A header straddling the previous chunk boundary is completed from the bytes already on disk.
+    Record lengths come from each record's blockette 1000; state['next_record'] is advanced in place.
+    """
+    chunk_end = chunk_offset + len(chunk)
+    while state['next_record'] is not None and state['next_record'] + 64 <= chunk_end:
+        start = state['next_record']
+        if start >= chunk_offset:
+            record_start = chunk[start - chunk_offset:start - chunk_offset + 64]
+        else:
+            with open(part_path, 'rb') as f:
+                f.seek(start)
+                record_start = f.read(chunk_offset - start) + chunk[:64 - (chunk_offset - start)]
+        endian, first_blockette = parse_record_header(record_start[:MSEED_HEADER_SIZE])
+        if first_blockette != MSEED_HEADER_SIZE:
+            # Without a blockette 1000 right after the header the record length is unknown; stop checking
+            state['next_record'] = None
+            break
+        blockette_type = struct.unpack(endian + 'H', record_start[48:50])[0]
+        if blockette_type != BLOCKETTE_1000:
+            state['next_record'] = None
+            break
+        record_length = 2 ** record_start[54]
+        if not 128 <= record_length <= 1 << 20:
+            raise UploadError("MiniSEED blockette 1000 has an invalid record length", 422)
+        state['next_record'] = start + record_length
+
+class ChunkedUploads:
+    """
+    Resumable uploads streamed straight into the event folders under base_folder.
+
+    Each upload is identified by a stable id derived from its event folder, filename, size and the client's
+    modification time of the file, so a client that lost its connection can ask for the current offset and
+    continue from there, while an edited file with the same name and size starts a new upload. Partial data and
+    state live in <event folder>/.uploads/ until the last byte arrives, when the file is moved into place.
+    """
+
+    def __init__(self, base_folder):
+        self.base_folder = base_folder
+
+    def _paths(self, upload_id):
+        upload_id = secure_filename(upload_id)
+        for folder_name in os.listdir(self.base_folder):
+            state_path = os.path.join(self.base_folder, folder_name, UPLOAD_STATE_DIR, f"{upload_id}.json")
+            if os.path.exists(state_path):
+                return state_path, state_path[:-len('.json')] + '.part'
+        raise UploadError("Upload not found", 404)
+
+    @staticmethod
+    def _save_state(state_path, state):
+        tmp_path = f"{state_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    def _new_state(self, state_path, upload_id, event_folder, filename, size):
+        state = {"upload_id": upload_id, "folder": event_folder, "filename": filename, "size": size,
+                 "offset": 0, "next_record": 0, "complete": False}
+        open(state_path[:-len('.json')] + '.part', 'wb').close()
+        self._save_state(state_path, state)
+        return state
+
+    def _still_in_place(self, state):
+        """True if the file moved into place by a completed upload is still there, unchanged since."""
+        destination = os.path.join(self.base_folder, state['folder'], state['filename'])
+        try:
+            stat = os.stat(destination)
+        except OSError:
+            return False
+        return stat.st_size == state['size'] and stat.st_mtime_ns == state.get('mtime_ns')
+
+    def create(self, event_folder, filename, size, last_modified=None):
+        """
+        Registers an upload (or returns the existing one for the same file) and reports its offset.
+
+        last_modified is the client's modification time of the file (any number, e.g. milliseconds). A
+        completed upload whose file was since deleted or replaced is started again from the beginning.
+        """
+        filename = secure_filename(filename)
+        if not filename.lower().endswith('.mseed'):
+            raise UploadError("Only .mseed files can be uploaded.")
+        if size <= 0:
+            raise UploadError("File size must be positive.")
+        event_folder = secure_filename(event_folder)
+        upload_id = hashlib.sha256(f"{event_folder}/{filename}/{size}/{last_modified or ''}".encode()).hexdigest()[:32]
+        state_dir = os.path.join(self.base_folder, event_folder, UPLOAD_STATE_DIR)
+        os.makedirs(state_dir, exist_ok=True)
+        state_path = os.path.join(state_dir, f"{upload_id}.json")
+        with upload_lock(upload_id):
+            if os.path.exists(state_path):
+                with open(state_path) as f:
+                    state = json.load(f)
+                if not state['complete'] or self._still_in_place(state):
+                    return state
+                print(f"Upload {upload_id} was complete but its file is gone or changed; starting it again")
+            return self._new_state(state_path, upload_id, event_folder, filename, size)
+
+    def status(self, upload_id):
+        state_path, _ = self._paths(upload_id)
+        with open(state_path) as f:
+            return json.load(f)
+
+    def append(self, upload_id, offset, stream):
+        """
+        Streams the request body into the upload at offset, validating MiniSEED headers as bytes arrive.
+
+        Raises:
+            UploadError: 409 if offset does not match the bytes already received, 422 for invalid MiniSEED.
+        """
+        state_path, part_path = self._paths(upload_id)
+        with upload_lock(upload_id):
+            with open(state_path) as f:
+                state = json.load(f)
+            if state['complete']:
+                raise UploadError("Upload already complete", 409, state['offset'])
+            if offset != state['offset']:
+                raise UploadError("Offset does not match the received data", 409, state['offset'])
+            try:
+                with open(part_path, 'r+b') as part:
+                    part.seek(offset)
+                    while state['offset'] < state['size']:
+                        data = stream.read(min(READ_SIZE, state['size'] - state['offset']))
+                        if not data:
+                            break
+                        validate_chunk(state, part_path, data, state['offset'])
+                        part.write(data)
+                        # Flushed so a header straddling the next read can be completed from disk
+                        part.flush()
+                        state['offset'] += len(data)
+                    part.truncate(state['offset'])
+            except UploadError:
+                # Drop the partial upload so a corrected file can be sent from the start
+                os.remove(part_path)
+                os.remove(state_path)
+                raise
+            finally:
+                if os.path.exists(state_path):
+                    self._save_state(state_path, state)
+
+            if state['offset'] >= state['size']:
+                destination = os.path.join(self.base_folder, state['folder'], state['filename'])
+                os.replace(part_path, destination)
+                state['complete'] = True
+                state['mtime_ns'] = os.stat(destination).st_mtime_ns
+                self._save_state(state_path, state)
+                print(f"Upload {upload_id} complete: {destination}")
+            return state
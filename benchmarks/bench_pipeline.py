@@ -0,0 +1,209 @@
+# benchmarks/bench_pipeline.py
+"""
+Times the pipeline stages and the end-to-end analysis on synthetic events of growing station counts.
+
+Usage:
+    python benchmarks/bench_pipeline.py --stations 10 100 1000 --runs 3
+    python benchmarks/bench_pipeline.py --stations 10 100 --compare benchmarks/results/pipeline_<commit>_<time>.json
+
+Everything runs offline: the MiniSEED files and the station inventory come from benchmarks/synthetic.py,
+and both the stage-level and the end-to-end map are drawn with --features (none by default) so no Natural
+Earth download is needed.
+
+end_to_end runs process_data with the products an analysis from the web app writes: the station CSV, the
+velocity plots, the map, the record section, the peaks table, the spectra (PDF and NPZ), the page previews
+and the waveform tiles. The stage timings cover only the first three, so end_to_end is more than their sum.
+Results are saved as JSON under benchmarks/results/, named after the current commit, so runs on two
+commits can be compared with --compare.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULTS_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'results')
+RESULTS_VERSION = 1
+GAIN = 1e9
+# The velocity plot layout used by process_data
+PLOTS_PER_PAGE, NROWS, NCOLS, FIGSIZE = 6, 6, 1, (8.27, 11.69)
+STAGES = ('metadata', 'read', 'preprocess', 'map', 'plot', 'end_to_end')
+REGRESSION_THRESHOLD = 1.10
+
+def git_commit():
+    """Returns (commit hash, whether the work tree has uncommitted changes), or (None, None) outside git."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT_DIR,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+def host_info():
+    import matplotlib
+    import numpy
+    import obspy
+    return {"platform": platform.platform(), "python": platform.python_version(), "cpu_count": os.cpu_count(),
+            "numpy": numpy.__version__, "obspy": obspy.__version__, "matplotlib": matplotlib.__version__}
+
+def timed(timings, fn):
+    started = time.perf_counter()
+    result = fn()
+    timings.append(time.perf_counter() - started)
+    return result
+
+@contextlib.contextmanager
+def quiet(verbose):
+    """Silences the pipeline's per-trace progress output unless verbose."""
+    if verbose:
+        yield
+        return
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+def summarize(timings):
+    return {"median_s": statistics.median(timings), "min_s": min(timings), "max_s": max(timings), "runs": timings}
+
+# The optional process_data outputs the web app's analysis runner writes (see backend_serve/analysis_runner.py)
+PRODUCTION_PRODUCTS = ('record_section_pdf', 'peaks_csv', 'spectra_pdf', 'spectra_npz', 'page_previews', 'waveform_tiles')
+
+def production_products(output_dir):
+    """Returns PRODUCTION_PRODUCTS as process_data keyword arguments, with the paths an event gets under output_dir."""
+    from component.paths import event_paths
+    paths = event_paths('bench', 0.0, output_dir)
+    return {product: paths[product] for product in PRODUCTION_PRODUCTS}
+
+def bench_size(n_stations, stations, args, work_dir):
+    """Generates an event with the first n_stations stations and times every stage args.runs times."""
+    from component.main_visualization import process_data
+    from component.map_creation import create_map
+    from component.metadata import fetch_station_metadata
+    from component.data_processing import process_seismic_data
+    from component.plot_creation import create_velocity_plots
+    from component.preprocessing import preprocess_traces
+    from component.profiling import read_run_report
+    from synthetic import write_event
+
+    folder = os.path.join(work_dir, f"event_{n_stations}")
+    output_dir = os.path.join(work_dir, f"output_{n_stations}")
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.perf_counter()
+    generated = write_event(folder, stations[:n_stations], args.latitude, args.longitude, args.magnitude,
+                            sampling_rate=args.sampling_rate, window_s=args.window_s, channels=args.channels, seed=args.seed)
+    print(f"\n{n_stations} stations: generated {generated['files']} files ({generated['bytes'] / 1e6:.1f} MB) "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    timings = {stage: [] for stage in STAGES}
+    run_report = os.path.join(output_dir, 'run_report.json')
+    for run in range(args.runs):
+        with quiet(args.verbose):
+            station_metadata = timed(timings['metadata'], lambda: fetch_station_metadata(args.latitude, args.longitude))
+            traces_with_dist, used_stations = timed(timings['read'], lambda: process_seismic_data(folder, station_metadata, args.max_workers))
+            batch = timed(timings['preprocess'], lambda: preprocess_traces(traces_with_dist, GAIN))
+            timed(timings['map'], lambda: create_map(used_stations, args.latitude, args.longitude, args.magnitude,
+                                                     os.path.join(output_dir, 'map.pdf'), features=tuple(args.features)))
+            timed(timings['plot'], lambda: create_velocity_plots(batch.traces_with_dist, station_metadata, os.path.join(output_dir, 'velocity.pdf'),
+                                                                 GAIN, PLOTS_PER_PAGE, NROWS, NCOLS, FIGSIZE, args.magnitude,
+                                                                 preprocessed=True, render_workers=args.max_workers))
+            del traces_with_dist, batch
+            timed(timings['end_to_end'], lambda: process_data(folder, os.path.join(output_dir, 'stations.csv'), os.path.join(output_dir, 'velocity.pdf'),
+                                                              os.path.join(output_dir, 'map.pdf'), args.latitude, args.longitude, args.magnitude,
+                                                              use_cache=False, max_workers=args.max_workers, run_report=run_report,
+                                                              map_features=tuple(args.features), **production_products(output_dir)))
+        print(f"  run {run + 1}/{args.runs}: " + ", ".join(f"{stage} {timings[stage][-1]:.2f}s" for stage in STAGES))
+    report = read_run_report(run_report)
+
+    return {
+        "stations": n_stations,
+        "generated": generated,
+        "stages": {stage: summarize(timings[stage]) for stage in STAGES},
+        # Breakdown of the last end-to-end run as process_data itself measured it
+        "end_to_end_report": report,
+    }
+
+def compare(results, baseline):
+    """Prints the median time of every stage relative to a saved baseline, flagging regressions."""
+    print(f"\nCompared with {(baseline.get('commit') or 'unknown')[:10]} ({time.strftime('%Y-%m-%d %H:%M', time.localtime(baseline['created_at']))}):")
+    previous = {size["stations"]: size for size in baseline["sizes"]}
+    for size in results["sizes"]:
+        old = previous.get(size["stations"])
+        if old is None:
+            print(f"  {size['stations']} stations: not in the baseline")
+            continue
+        cells = []
+        for stage in STAGES:
+            if stage not in old["stages"]:
+                continue
+            ratio = size["stages"][stage]["median_s"] / old["stages"][stage]["median_s"]
+            cells.append(f"{stage} {ratio:.2f}x{' !' if ratio > REGRESSION_THRESHOLD else ''}")
+        print(f"  {size['stations']:>5} stations: " + ", ".join(cells))
+    print(f"  (time now / time then; '!' marks stages more than {REGRESSION_THRESHOLD - 1:.0%} slower)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic events of several sizes.")
+    parser.add_argument('--stations', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--sampling_rate', type=float, default=100.0)
+    parser.add_argument('--window_s', type=float, default=240.0)
+    parser.add_argument('--channels', type=int, default=1, choices=(1, 2, 3))
+    parser.add_argument('--magnitude', type=float, default=5.0)
+    parser.add_argument('--latitude', type=float, default=28.2292)
+    parser.add_argument('--longitude', type=float, default=84.3985)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max_workers', type=int, default=None,
+                        help='Processes for reading and rendering. Defaults to the CPU count.')
+    parser.add_argument('--features', type=str, nargs='*', default=[],
+                        help='Base map layers for the map stage and end_to_end (land, coastline, borders, rivers). None keeps them offline.')
+    parser.add_argument('--verbose', action='store_true',
+                        help="Show the pipeline's own progress output.")
+    parser.add_argument('--output', type=str, default=None,
+                        help='Results file. Defaults to benchmarks/results/pipeline_<commit>_<time>.json.')
+    parser.add_argument('--compare', type=str, default=None,
+                        help='Earlier results file to compare with.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench_pipeline_') as work_dir:
+        # The synthetic inventory must be in place before the component modules read their configuration
+        os.environ['STATION_INVENTORY_CACHE'] = os.path.join(work_dir, 'station_inventory.json')
+        os.environ['STATION_INVENTORY_REFRESH'] = 'never'
+        import matplotlib
+        matplotlib.use('Agg')
+        sys.path.insert(0, os.path.join(ROOT_DIR, 'src'))
+        sys.path.insert(0, os.path.join(ROOT_DIR, 'benchmarks'))
+        from synthetic import synthetic_network, write_inventory
+
+        # One network for all sizes: smaller events use a subset, as a real event uses part of the inventory
+        stations = synthetic_network(max(args.stations), args.latitude, args.longitude, seed=args.seed)
+        write_inventory(stations, os.environ['STATION_INVENTORY_CACHE'])
+        commit, dirty = git_commit()
+        results = {
+            "version": RESULTS_VERSION,
+            "commit": commit,
+            "dirty": dirty,
+            "created_at": time.time(),
+            "host": host_info(),
+            "params": {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+            "inventory_stations": len(stations),
+            "sizes": [bench_size(n_stations, stations, args, work_dir) for n_stations in sorted(args.stations)],
+        }
+
+    print(f"\n{'stations':>8} " + " ".join(f"{stage:>11}" for stage in STAGES))
+    for size in results["sizes"]:
+        print(f"{size['stations']:>8} " + " ".join(f"{size['stages'][stage]['median_s']:>10.2f}s" for stage in STAGES))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"pipeline_{(commit or 'nogit')[:10]}{'-dirty' if dirty else ''}_{time.strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
@@ -0,0 +1,87 @@
+# benchmarks/bench_warm_worker.py
+"""
+Compares the latency of a cold `python src/main.py` subprocess with a job on a warm worker.
+
+Usage:
+    python benchmarks/bench_warm_worker.py --earthquake_name Lamjung_Earthquake --magnitude 5.3 --runs 3
+
+The event's MiniSEED files must be in assets/<earthquake_name>_<magnitude>. Outputs are written
+to a temporary directory so the files under Output/ are left untouched.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'backend_serve'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src'))
+
+from analysis_worker import WarmWorkerPool
+from component.paths import event_paths
+
+MAIN_SCRIPT_PATH = os.path.join(ROOT_DIR, 'src', 'main.py')
+
+def time_cold_runs(args, output_dir):
+    timings = []
+    cmd = [sys.executable, MAIN_SCRIPT_PATH, '--earthquake_name', args.earthquake_name, '--magnitude', str(args.magnitude),
+           '--latitude', str(args.latitude), '--longitude', str(args.longitude), '--output_dir', output_dir]
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+def time_warm_runs(args, output_dir):
+    paths = event_paths(args.earthquake_name, args.magnitude, output_dir)
+    kwargs = {
+        "folder_path": paths["folder_path"],
+        "output_csv": paths["output_csv"],
+        "output_pdf": paths["output_pdf"],
+        "map_pdf": paths["map_pdf"],
+        "epi_lat": args.latitude,
+        "epi_lon": args.longitude,
+        "epi_mag": args.magnitude,
+    }
+    pool = WarmWorkerPool(max_workers=1)
+    started = time.perf_counter()
+    pool.prefork()
+    startup = time.perf_counter() - started
+    timings = []
+    try:
+        for run in range(args.runs):
+            started = time.perf_counter()
+            pool.run(f"bench-{run}", lambda stage, data=None: None, **kwargs)
+            timings.append(time.perf_counter() - started)
+    finally:
+        pool.shutdown()
+    return startup, timings
+
+def summarize(label, timings):
+    print(f"{label:<22} median {statistics.median(timings):7.2f}s   min {min(timings):7.2f}s   max {max(timings):7.2f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark cold subprocess analysis against a warm worker.")
+    parser.add_argument('--earthquake_name', type=str, default='Lamjung_Earthquake')
+    parser.add_argument('--magnitude', type=float, default=5.3)
+    parser.add_argument('--latitude', type=float, default=28.2292)
+    parser.add_argument('--longitude', type=float, default=84.3985)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    folder_path = event_paths(args.earthquake_name, args.magnitude)["folder_path"]
+    if not os.path.isdir(folder_path):
+        sys.exit(f"Error: Input folder '{folder_path}' does not exist.")
+
+    with tempfile.TemporaryDirectory() as cold_dir, tempfile.TemporaryDirectory() as warm_dir:
+        cold = time_cold_runs(args, cold_dir)
+        startup, warm = time_warm_runs(args, warm_dir)
+
+    print(f"\n{args.runs} run(s) of {args.earthquake_name} M{args.magnitude}")
+    summarize("cold subprocess", cold)
+    summarize("warm worker", warm)
+    print(f"{'warm pool start-up':<22} {startup:7.2f}s (paid once per server start)")
+    print(f"Speed-up (median): {statistics.median(cold) / statistics.median(warm):.1f}x")
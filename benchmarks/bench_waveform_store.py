@@ -0,0 +1,92 @@
+# benchmarks/bench_waveform_store.py
+"""
+Compares loading preprocessed traces from the waveform store with re-reading and preprocessing the MiniSEED.
+
+Usage:
+    python benchmarks/bench_waveform_store.py --earthquake_name Lamjung_Earthquake --magnitude 5.3 --runs 5
+
+The event's MiniSEED files must be in assets/<earthquake_name>_<magnitude>. The store is written to a
+temporary directory so the files under Output/ are left untouched.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src'))
+
+from component.data_processing import process_seismic_data
+from component.metadata import fetch_station_metadata
+from component.paths import event_paths
+from component.preprocessing import preprocess_traces
+from component.waveform_store import WaveformStore, write_waveform_store
+
+GAIN = 1e9
+
+def time_runs(runs, fn):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+def load_from_mseed(folder_path, station_metadata):
+    traces_with_dist, _ = process_seismic_data(folder_path, station_metadata)
+    batch = preprocess_traces(traces_with_dist, GAIN)
+    # Touch every sample, as a product reading the traces would
+    return float(np.abs(batch.data).max())
+
+def load_from_store(store_dir):
+    store = WaveformStore(store_dir)
+    return max(float(np.abs(tr.data).max()) for tr, _ in store.traces_with_dist())
+
+def window_from_store(store_dir):
+    store = WaveformStore(store_dir)
+    # A 10 s window of every trace, as a zoomed plot or an API slice would request
+    for i in range(len(store)):
+        start = store.starttimes[i] + 30
+        _, samples = store.window(i, start, start + 10)
+        samples.sum()
+
+def summarize(label, timings):
+    print(f"{label:<26} median {statistics.median(timings):7.3f}s   min {min(timings):7.3f}s   max {max(timings):7.3f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the waveform store against re-reading MiniSEED.")
+    parser.add_argument('--earthquake_name', type=str, default='Lamjung_Earthquake')
+    parser.add_argument('--magnitude', type=float, default=5.3)
+    parser.add_argument('--latitude', type=float, default=28.2292)
+    parser.add_argument('--longitude', type=float, default=84.3985)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    folder_path = event_paths(args.earthquake_name, args.magnitude)["folder_path"]
+    if not os.path.isdir(folder_path):
+        sys.exit(f"Error: Input folder '{folder_path}' does not exist.")
+    station_metadata = fetch_station_metadata(args.latitude, args.longitude)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store_dir = os.path.join(tmp_dir, 'waveforms')
+        traces_with_dist, _ = process_seismic_data(folder_path, station_metadata)
+        batch = preprocess_traces(traces_with_dist, GAIN)
+        started = time.perf_counter()
+        write_waveform_store(batch, store_dir, GAIN)
+        write_s = time.perf_counter() - started
+        store_bytes = sum(os.path.getsize(os.path.join(store_dir, name)) for name in os.listdir(store_dir))
+        mseed_bytes = sum(os.path.getsize(os.path.join(folder_path, name)) for name in os.listdir(folder_path) if name.lower().endswith('.mseed'))
+
+        mseed = time_runs(args.runs, lambda: load_from_mseed(folder_path, station_metadata))
+        store = time_runs(args.runs, lambda: load_from_store(store_dir))
+        window = time_runs(args.runs, lambda: window_from_store(store_dir))
+
+    print(f"\n{args.runs} run(s) of {args.earthquake_name} M{args.magnitude}: {len(batch)} traces, {int(batch.npts.sum()):,} samples")
+    print(f"MiniSEED {mseed_bytes / 1e6:.1f} MB, waveform store {store_bytes / 1e6:.1f} MB (written in {write_s:.3f}s)")
+    summarize("read + preprocess MiniSEED", mseed)
+    summarize("waveform store, all", store)
+    summarize("waveform store, 10 s", window)
+    print(f"Speed-up (median, all traces): {statistics.median(mseed) / statistics.median(store):.1f}x")
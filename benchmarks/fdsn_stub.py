@@ -0,0 +1,116 @@
+# benchmarks/fdsn_stub.py
+"""
+Minimal local stand-in for an FDSN Dataselect service, answering with synthetic three-component data.
+
+Usage:
+    python benchmarks/fdsn_stub.py --port 18080
+    FDSN_DATASELECT_URL=http://localhost:18080/fdsnws/dataselect/1/query python backend_serve/app.py
+
+Every station has data at every time, except those given with --no_data, which are answered with 204.
+Samples are a fixed function of the station and the absolute sample time, so overlapping requests
+return identical samples, as a real archive would. --fail STATION=N answers the station's first N
+requests with 503, to exercise the client's retries. Each request is logged with the seconds of data
+it asked for, which shows what an incremental download skipped.
+"""
+import argparse
+import io
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+from obspy import Stream, Trace, UTCDateTime
+
+RECORD_LENGTH = 512
+CHANNELS = ("EHZ", "EHN", "EHE")
+
+def synthetic_samples(station, channel, first_sample, n_samples):
+    """Returns deterministic int32 noise for samples first_sample .. first_sample + n_samples (counted from the epoch)."""
+    seed = zlib.crc32(f"{station}.{channel}".encode())
+    k = np.arange(first_sample, first_sample + n_samples, dtype=np.uint64) + np.uint64(seed)
+    hashed = (k * np.uint64(2654435761)) % np.uint64(2 ** 32)
+    return (hashed >> np.uint64(20)).astype(np.int32) - 2048
+
+def make_response(network, station, starttime, endtime, sampling_rate):
+    """Returns MiniSEED bytes with every channel's samples from starttime to endtime, or b'' for an empty window."""
+    first_sample = int(np.ceil(starttime.timestamp * sampling_rate))
+    n_samples = int(np.floor(endtime.timestamp * sampling_rate)) - first_sample + 1
+    if n_samples <= 0:
+        return b""
+    stream = Stream()
+    for channel in CHANNELS:
+        stream += Trace(data=synthetic_samples(station, channel, first_sample, n_samples),
+                        header={"network": network, "station": station, "location": "00", "channel": channel,
+                                "sampling_rate": sampling_rate, "starttime": UTCDateTime(first_sample / sampling_rate)})
+    buffer = io.BytesIO()
+    stream.write(buffer, format="MSEED", reclen=RECORD_LENGTH, encoding="STEIM2")
+    return buffer.getvalue()
+
+class DataselectHandler(BaseHTTPRequestHandler):
+    sampling_rate = 100.0
+    no_data_stations = set()
+    # Station -> number of requests still to be answered with 503
+    failures = {}
+    # Station -> number of requests received
+    requests = {}
+    _counts_lock = threading.Lock()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        station = params.get("station")
+        with self._counts_lock:
+            self.requests[station] = self.requests.get(station, 0) + 1
+            failing = self.failures.get(station, 0) > 0
+            if failing:
+                self.failures[station] -= 1
+        if failing:
+            self.send_error(503, "Simulated overload")
+            return
+        if station in self.no_data_stations:
+            self.send_response(204)
+            self.end_headers()
+            return
+        try:
+            starttime, endtime = UTCDateTime(params["starttime"]), UTCDateTime(params["endtime"])
+            body = make_response(params.get("network", "AM"), params["station"], starttime, endtime, self.sampling_rate)
+        except (KeyError, ValueError, TypeError) as e:
+            self.send_error(400, str(e))
+            return
+        print(f"{params['station']}: {starttime} - {endtime} ({endtime - starttime:.0f}s, {len(body)} bytes)")
+        if not body:
+            self.send_response(204)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.fdsn.mseed")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Local FDSN Dataselect stand-in serving synthetic data.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--sampling_rate", type=float, default=100.0)
+    parser.add_argument("--no_data", nargs="*", default=[], help="Stations answered with 204 (no data).")
+    parser.add_argument("--fail", nargs="*", default=[], metavar="STATION=N",
+                        help="Answer a station's first N requests with 503.")
+    args = parser.parse_args()
+    DataselectHandler.sampling_rate = args.sampling_rate
+    DataselectHandler.no_data_stations = set(args.no_data)
+    DataselectHandler.failures = {station: int(count) for station, count in (item.split("=", 1) for item in args.fail)}
+    server = ThreadingHTTPServer((args.host, args.port), DataselectHandler)
+    print(f"FDSN Dataselect stub on http://{args.host}:{args.port}/fdsnws/dataselect/1/query")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
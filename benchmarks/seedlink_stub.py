@@ -0,0 +1,117 @@
+# benchmarks/seedlink_stub.py
+"""
+Minimal local stand-in for a SeedLink server, streaming synthetic Z-channel data in real time.
+
+Usage:
+    python benchmarks/seedlink_stub.py --port 18000 --packet_s 1
+    SEEDLINK_SERVER=localhost:18000 python backend_serve/app.py
+
+Only the commands the ObsPy SeedLink client sends in multi-station mode are implemented
+(HELLO, STATION, SELECT, DATA, END, BYE). Every selected station gets one packet of 512-byte
+MiniSEED records per packet_s seconds of noise, stamped with the current time.
+"""
+import argparse
+import io
+import socketserver
+import threading
+import time
+import numpy as np
+from obspy import Trace, UTCDateTime
+
+RECORD_LENGTH = 512
+
+def make_records(network, station, channel, starttime, n_samples, sampling_rate, rng):
+    """Returns a list of 512-byte MiniSEED records holding n_samples of noise starting at starttime."""
+    data = (rng.standard_normal(n_samples) * 2000).astype(np.int32)
+    tr = Trace(data=data, header={"network": network, "station": station, "location": "00", "channel": channel,
+                                  "sampling_rate": sampling_rate, "starttime": starttime})
+    buffer = io.BytesIO()
+    tr.write(buffer, format="MSEED", reclen=RECORD_LENGTH, encoding="STEIM2")
+    raw = buffer.getvalue()
+    return [raw[i:i + RECORD_LENGTH] for i in range(0, len(raw), RECORD_LENGTH)]
+
+class SeedLinkHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        selected = []
+        current = None
+        while True:
+            line = self._read_command()
+            if line is None:
+                return
+            command = line.split()
+            verb = command[0].upper() if command else ""
+            if verb == "HELLO":
+                self.wfile.write(b"SeedLink v3.1 (stub) :: SLPROTO:3.1\r\nseedlink stub\r\n")
+            elif verb == "STATION":
+                current = (command[2], command[1])
+                self.wfile.write(b"OK\r\n")
+            elif verb in ("SELECT", "DATA", "FETCH", "TIME"):
+                if verb != "SELECT" and current is not None:
+                    selected.append(current)
+                    current = None
+                self.wfile.write(b"OK\r\n")
+            elif verb == "END":
+                self._stream(selected)
+                return
+            elif verb == "BYE":
+                return
+            else:
+                self.wfile.write(b"ERROR\r\n")
+
+    def _read_command(self):
+        chars = bytearray()
+        while True:
+            char = self.rfile.read(1)
+            if not char:
+                return None
+            if char in b"\r\n":
+                if chars:
+                    return chars.decode("ascii", "replace")
+                continue
+            chars += char
+
+    def _stream(self, selected):
+        options = self.server.options
+        rng = np.random.default_rng()
+        sequence = 0
+        next_start = UTCDateTime() - options.packet_s
+        n_samples = int(options.packet_s * options.sampling_rate)
+        try:
+            while True:
+                for network, station in selected:
+                    for record in make_records(network, station, options.channel, next_start, n_samples, options.sampling_rate, rng):
+                        self.wfile.write(b"SL%06X" % (sequence % 0xFFFFFF) + record)
+                        sequence += 1
+                self.wfile.flush()
+                next_start += options.packet_s
+                # Packets are released once their last sample has "happened"
+                time.sleep(max(0.0, (next_start + options.packet_s) - UTCDateTime()))
+        except (BrokenPipeError, ConnectionResetError):
+            return  # Client disconnected
+
+class ThreadingServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+def serve(options):
+    server = ThreadingServer((options.host, options.port), SeedLinkHandler)
+    server.options = options
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve synthetic real-time data over a minimal SeedLink protocol.")
+    parser.add_argument('--host', type=str, default='localhost')
+    parser.add_argument('--port', type=int, default=18000)
+    parser.add_argument('--channel', type=str, default='EHZ')
+    parser.add_argument('--sampling_rate', type=float, default=100.0)
+    parser.add_argument('--packet_s', type=float, default=1.0)
+    args = parser.parse_args()
+    serve(args)
+    print(f"SeedLink stub listening on {args.host}:{args.port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
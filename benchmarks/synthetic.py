@@ -0,0 +1,149 @@
+# benchmarks/synthetic.py
+"""
+Generates synthetic MiniSEED event folders and a matching station inventory, without network access.
+
+Usage:
+    python benchmarks/synthetic.py --stations 100 --earthquake_name Synth_Event --magnitude 5.0
+    STATION_INVENTORY_CACHE=assets/cache/synthetic_station_inventory.json STATION_INVENTORY_REFRESH=never \\
+        python src/main.py --earthquake_name Synth_Event --magnitude 5.0 --latitude 28.2292 --longitude 84.3985
+
+Stations are scattered around the epicenter and named AM.S0000, AM.S0001, ... Each gets one file of
+512-byte STEIM2 records, as Raspberry Shake data is delivered, holding noise plus P and S arrivals
+whose times and amplitudes follow the station distance. The same seed always gives the same files.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import numpy as np
+from obspy import Stream, Trace, UTCDateTime
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src'))
+
+from component.inventory import CACHE_DIR, WGS84, StationInventory
+from component.paths import event_paths
+
+CHANNELS = ('EHZ', 'EHN', 'EHE')
+RECORD_LENGTH = 512
+VP_KM_S = 6.0
+VS_KM_S = 3.5
+DEFAULT_ORIGIN_TIME = '2025-01-01T00:00:00'
+DEFAULT_INVENTORY = os.path.join(CACHE_DIR, 'synthetic_station_inventory.json')
+
+def synthetic_network(n_stations, epi_lat, epi_lon, max_radius_km=250.0, seed=0):
+    """Returns n_stations station records spread uniformly over a disc of max_radius_km around the epicenter."""
+    rng = np.random.default_rng(seed)
+    azimuth = rng.uniform(0, 360, n_stations)
+    # sqrt keeps the station density uniform over the disc instead of crowding the center
+    dist_m = max_radius_km * 1000 * np.sqrt(rng.uniform(0.0004, 1, n_stations))
+    lon, lat, _ = WGS84.fwd(np.full(n_stations, float(epi_lon)), np.full(n_stations, float(epi_lat)), azimuth, dist_m)
+    elev = rng.uniform(300, 2500, n_stations).round()
+    return [
+        {"station_code": f"AM.S{i:04d}", "lat": float(lat[i]), "lon": float(lon[i]), "elev": float(elev[i])}
+        for i in range(n_stations)
+    ]
+
+def write_inventory(stations, path=DEFAULT_INVENTORY):
+    """Saves the stations as a station inventory cache that load_inventory() can read (see STATION_INVENTORY_CACHE)."""
+    StationInventory(stations, fetched_at=time.time(), source='synthetic').save(path)
+    return path
+
+def write_station_csv(stations, path):
+    """Saves the stations in the seed CSV format of assets/stations/nepal_stations.csv."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=["station_code", "lat", "lon", "elev"])
+        writer.writeheader()
+        writer.writerows(stations)
+
+def synthetic_counts(n_samples, sampling_rate, t_p, t_s, dist_km, magnitude, rng):
+    """Returns int32 counts of background noise with P and S wave packets arriving t_p and t_s seconds in."""
+    t = np.arange(n_samples) / sampling_rate
+    data = rng.normal(0.0, 200.0, n_samples)
+    amplitude = 10 ** (magnitude + 1.5) / max(dist_km, 1.0)
+    for onset, scale, frequency in ((t_p, 0.3, 6.0), (t_s, 1.0, 2.5)):
+        after = t >= onset
+        tau = t[after] - onset
+        data[after] += scale * amplitude * np.exp(-tau / 8.0) * np.sin(2 * np.pi * frequency * tau)
+    return np.clip(data, -2 ** 30, 2 ** 30).astype(np.int32)
+
+def write_event(folder, stations, epi_lat, epi_lon, magnitude, origin_time=DEFAULT_ORIGIN_TIME,
+                sampling_rate=100.0, window_s=240.0, channels=1, seed=0):
+    """
+    Writes one MiniSEED file per station for an event into folder.
+
+    Args:
+        folder (str): Event folder, e.g. assets/<name>_<magnitude>.
+        stations (list): Station records from synthetic_network().
+        epi_lat (float): Latitude of the epicenter.
+        epi_lon (float): Longitude of the epicenter.
+        magnitude (float): Magnitude; scales the arrivals.
+        origin_time (str): Origin time (UTC); the window is centered on it, as downloads are.
+        sampling_rate (float): Samples per second.
+        window_s (float): Length of every trace in seconds.
+        channels (int): 1 for EHZ only, 3 for EHZ, EHN and EHE.
+        seed (int): Random seed of the noise.
+
+    Returns:
+        dict: 'files', 'bytes', 'traces' and 'samples' written.
+    """
+    os.makedirs(folder, exist_ok=True)
+    origin_time = UTCDateTime(origin_time)
+    starttime = origin_time - window_s / 2
+    n_samples = int(window_s * sampling_rate)
+    lons = np.array([s["lon"] for s in stations])
+    lats = np.array([s["lat"] for s in stations])
+    _, _, dist_m = WGS84.inv(np.full(len(stations), float(epi_lon)), np.full(len(stations), float(epi_lat)), lons, lats)
+    summary = {"files": 0, "bytes": 0, "traces": 0, "samples": 0}
+    for i, station in enumerate(stations):
+        rng = np.random.default_rng([seed, i])
+        dist_km = dist_m[i] / 1000
+        t_p = window_s / 2 + dist_km / VP_KM_S
+        t_s = window_s / 2 + dist_km / VS_KM_S
+        network, code = station["station_code"].split(".")
+        stream = Stream([
+            Trace(data=synthetic_counts(n_samples, sampling_rate, t_p, t_s, dist_km, magnitude, rng),
+                  header={"network": network, "station": code, "location": "00", "channel": channel,
+                          "sampling_rate": sampling_rate, "starttime": starttime})
+            for channel in CHANNELS[:channels]
+        ])
+        path = os.path.join(folder, f"{code}.mseed")
+        stream.write(path, format="MSEED", reclen=RECORD_LENGTH, encoding="STEIM2")
+        summary["files"] += 1
+        summary["bytes"] += os.path.getsize(path)
+        summary["traces"] += len(stream)
+        summary["samples"] += n_samples * len(stream)
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic MiniSEED event and a matching station inventory.")
+    parser.add_argument('--stations', type=int, default=100)
+    parser.add_argument('--sampling_rate', type=float, default=100.0)
+    parser.add_argument('--window_s', type=float, default=240.0,
+                        help='Trace length in seconds, centered on the origin time.')
+    parser.add_argument('--channels', type=int, default=1, choices=(1, 2, 3))
+    parser.add_argument('--earthquake_name', type=str, default='Synth_Event')
+    parser.add_argument('--magnitude', type=float, default=5.0)
+    parser.add_argument('--latitude', type=float, default=28.2292)
+    parser.add_argument('--longitude', type=float, default=84.3985)
+    parser.add_argument('--origin_time', type=str, default=DEFAULT_ORIGIN_TIME)
+    parser.add_argument('--max_radius_km', type=float, default=250.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--folder', type=str, default=None,
+                        help='Output folder for the MiniSEED files. Defaults to assets/<earthquake_name>_<magnitude>.')
+    parser.add_argument('--inventory', type=str, default=DEFAULT_INVENTORY,
+                        help='Path of the station inventory cache to write.')
+    args = parser.parse_args()
+
+    folder = args.folder or event_paths(args.earthquake_name, args.magnitude)["folder_path"]
+    stations = synthetic_network(args.stations, args.latitude, args.longitude, args.max_radius_km, args.seed)
+    started = time.perf_counter()
+    summary = write_event(folder, stations, args.latitude, args.longitude, args.magnitude, args.origin_time,
+                          args.sampling_rate, args.window_s, args.channels, args.seed)
+    write_inventory(stations, args.inventory)
+    write_station_csv(stations, os.path.splitext(args.inventory)[0] + '.csv')
+    print(json.dumps(summary))
+    print(f"Wrote {summary['files']} files ({summary['bytes'] / 1e6:.1f} MB) to {folder} in {time.perf_counter() - started:.1f}s")
+    print(f"Station inventory saved to {args.inventory}; set STATION_INVENTORY_CACHE to use it")
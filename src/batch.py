@@ -0,0 +1,234 @@
+# src/batch.py
+"""
+Processes every event of a catalog, several events at a time.
+
+Usage:
+    python src/batch.py --catalog aftershocks.csv --workers 4
+    python src/batch.py --catalog events.xml --workers 4 --manifest Output/aftershocks_manifest.json
+
+A CSV catalog has one row per event with the columns earthquake_name, magnitude, latitude and longitude,
+and optionally origin_time (ISO 8601, UTC) and folder (input folder; defaults to assets/<name>_<magnitude>).
+A QuakeML catalog (.xml, .qml, .quakeml) uses each event's preferred origin and magnitude; the event name
+is its first description, or Event_<origin time> without one.
+"""
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import os
+import re
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from component.paths import OUTPUT_DIR, event_paths
+from component.profiling import read_run_report
+
+QUAKEML_EXTENSIONS = ('.xml', '.qml', '.quakeml')
+
+def _safe_name(name):
+    """Reduces an event name to the characters allowed in folder names, as the upload route does."""
+    name = re.sub(r'[^A-Za-z0-9_.-]', '', '_'.join(name.split())).strip('._')
+    return name or "Event"
+
+def read_csv_catalog(path):
+    events = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            events.append({
+                "earthquake_name": _safe_name(row.get("earthquake_name") or row.get("name") or ""),
+                "magnitude": float(row["magnitude"]),
+                "latitude": float(row["latitude"]),
+                "longitude": float(row["longitude"]),
+                "origin_time": row.get("origin_time") or None,
+                "folder": row.get("folder") or None,
+            })
+    return events
+
+def read_quakeml_catalog(path):
+    from obspy import read_events
+    events = []
+    for event in read_events(path):
+        origin = event.preferred_origin() or (event.origins[0] if event.origins else None)
+        magnitude = event.preferred_magnitude() or (event.magnitudes[0] if event.magnitudes else None)
+        if origin is None or magnitude is None:
+            print(f"Skipping catalog event {event.resource_id}: no origin or magnitude")
+            continue
+        if event.event_descriptions:
+            name = event.event_descriptions[0].text
+        else:
+            name = f"Event_{origin.time.strftime('%Y%m%dT%H%M%S')}"
+        events.append({
+            "earthquake_name": _safe_name(name),
+            "magnitude": float(magnitude.mag),
+            "latitude": float(origin.latitude),
+            "longitude": float(origin.longitude),
+            "origin_time": str(origin.time),
+            "folder": None,
+        })
+    return events
+
+def read_catalog(path):
+    """Reads a CSV or QuakeML event catalog into a list of event dicts."""
+    if path.lower().endswith(QUAKEML_EXTENSIONS):
+        return read_quakeml_catalog(path)
+    return read_csv_catalog(path)
+
+def _init_batch_worker():
+    """Loads the heavy modules and the station inventory once per worker process; the base maps are already cached."""
+    import matplotlib
+    matplotlib.use('Agg')
+    from component import main_visualization  # noqa: F401
+    from component.inventory import load_inventory
+    load_inventory()
+
+def run_event(event, output_root, inner_workers, use_cache, streaming=False, max_radius_km=None, max_stations=None):
+    """Runs process_data for one catalog event and returns its manifest entry."""
+    from component.main_visualization import process_data
+    paths = event_paths(event["earthquake_name"], event["magnitude"],
+                        os.path.join(output_root, f"{event['earthquake_name']}_{float(event['magnitude'])}") if output_root else None)
+    folder_path = event["folder"] or paths["folder_path"]
+    entry = {**event, "folder": folder_path, "output_dir": paths["output_dir"], "pid": os.getpid(),
+             "status": "failed", "error": None, "elapsed_s": 0.0, "stages": {}}
+    if not os.path.isdir(folder_path):
+        entry.update(status="skipped", error=f"Input folder '{folder_path}' does not exist.")
+        return entry
+
+    os.makedirs(paths["output_dir"], exist_ok=True)
+    started = time.perf_counter()
+    try:
+        status = process_data(
+            folder_path=folder_path,
+            output_csv=paths["output_csv"],
+            output_pdf=paths["output_pdf"],
+            map_pdf=paths["map_pdf"],
+            epi_lat=event["latitude"],
+            epi_lon=event["longitude"],
+            epi_mag=event["magnitude"],
+            use_cache=use_cache,
+            record_section_pdf=paths["record_section_pdf"],
+            origin_time=event["origin_time"],
+            peaks_csv=paths["peaks_csv"],
+            spectra_pdf=paths["spectra_pdf"],
+            spectra_npz=paths["spectra_npz"],
+            max_workers=inner_workers,
+            run_report=paths["run_report"],
+            streaming=streaming,
+            max_radius_km=max_radius_km,
+            max_stations=max_stations,
+        )
+        if status in ("ok", "cached"):
+            entry["status"] = status
+        else:
+            entry["error"] = f"Analysis stopped early: {status}"
+    except Exception as e:
+        entry["error"] = f"{type(e).__name__}: {e}"
+        entry["traceback"] = traceback.format_exc()
+    entry["elapsed_s"] = time.perf_counter() - started
+    report = read_run_report(paths["run_report"])
+    if report is not None:
+        entry["stages"] = {stage["stage"]: stage["wall_s"] for stage in report["stages"]}
+        entry["counters"] = report["counters"]
+        entry["peak_rss_bytes"] = report["peak_rss_bytes"]
+    return entry
+
+def run_batch(events, workers, output_root=None, inner_workers=None, use_cache=True, streaming=False, max_radius_km=None,
+              max_stations=None):
+    """
+    Processes events on a pool of `workers` processes and returns the manifest.
+
+    The parent loads the station inventory and renders the base map of every distinct event extent before
+    the pool starts, so workers reuse the cached inventory and background images instead of building their own.
+    """
+    from component.inventory import load_inventory
+    from component.map_creation import prepare_base_maps
+    load_inventory()
+    prepare_base_maps([(event["latitude"], event["longitude"]) for event in events], max_radius_km, max_stations)
+
+    workers = max(1, min(workers, len(events) or 1))
+    if inner_workers is None:
+        # Split the cores between events instead of letting every event start a full-size pool
+        inner_workers = max(1, (os.cpu_count() or 1) // workers)
+    context = mp.get_context('fork' if 'fork' in mp.get_all_start_methods() else 'spawn')
+    started_at = time.time()
+    started = time.perf_counter()
+    entries = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_batch_worker) as executor:
+        futures = {executor.submit(run_event, event, output_root, inner_workers, use_cache, streaming,
+                                   max_radius_km, max_stations): event for event in events}
+        for future in as_completed(futures):
+            event = futures[future]
+            try:
+                entry = future.result()
+            except Exception as e:  # The worker process itself died
+                entry = {**event, "status": "failed", "error": f"{type(e).__name__}: {e}", "elapsed_s": None}
+            entries.append(entry)
+            line = f"[{len(entries)}/{len(events)}] {entry['earthquake_name']} M{entry['magnitude']}: {entry['status']}"
+            if entry["elapsed_s"] is not None:
+                line += f" in {entry['elapsed_s']:.1f}s"
+            if entry["error"]:
+                line += f" ({entry['error']})"
+            print(line)
+    wall_s = time.perf_counter() - started
+
+    busy_s = sum(entry["elapsed_s"] or 0.0 for entry in entries)
+    entries.sort(key=lambda entry: (entry["earthquake_name"], entry["magnitude"]))
+    return {
+        "started_at": started_at,
+        "wall_s": wall_s,
+        "workers": workers,
+        "inner_workers": inner_workers,
+        "events": len(events),
+        "ok": sum(entry["status"] in ("ok", "cached") for entry in entries),
+        "cached": sum(entry["status"] == "cached" for entry in entries),
+        "failed": sum(entry["status"] == "failed" for entry in entries),
+        "skipped": sum(entry["status"] == "skipped" for entry in entries),
+        "busy_s": busy_s,
+        # Sum of per-event times over wall time: how many events were effectively processed at once
+        "parallel_speedup": busy_s / wall_s if wall_s > 0 else None,
+        "results": entries,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the seismic analysis for every event of a catalog.")
+    parser.add_argument('--catalog', type=str, required=True,
+                        help='CSV or QuakeML event catalog.')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Number of events processed at the same time. Defaults to the CPU count.')
+    parser.add_argument('--inner_workers', type=int, default=None,
+                        help='Processes each event may use for reading and rendering. Defaults to CPU count / workers.')
+    parser.add_argument('--output_root', type=str, default=None,
+                        help='Directory for the per-event output folders. Defaults to Output/.')
+    parser.add_argument('--manifest', type=str, default=None,
+                        help='Path of the summary manifest. Defaults to <output_root>/batch_manifest_<time>.json.')
+    parser.add_argument('--no_cache', action='store_true',
+                        help='Recompute the products even if an identical analysis is cached.')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Analyse one trace at a time so several long-window events fit in memory together.')
+    parser.add_argument('--max_radius_km', type=float, default=None,
+                        help='Only analyse stations within this distance of each epicenter. Defaults to STATION_MAX_RADIUS_KM; 0 for no limit.')
+    parser.add_argument('--max_stations', type=int, default=None,
+                        help='Only analyse this many stations nearest each epicenter. Defaults to STATION_MAX_COUNT; 0 for no limit.')
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.catalog):
+        sys.exit(f"Error: Catalog '{args.catalog}' does not exist.")
+    events = read_catalog(args.catalog)
+    print(f"batch.py: {len(events)} events in {args.catalog}, {args.workers} worker(s)")
+
+    manifest = run_batch(events, args.workers, args.output_root, args.inner_workers, use_cache=not args.no_cache, streaming=args.streaming,
+                         max_radius_km=args.max_radius_km, max_stations=args.max_stations)
+    manifest["catalog"] = os.path.abspath(args.catalog)
+    manifest_path = args.manifest or os.path.join(args.output_root or OUTPUT_DIR,
+                                                  f"batch_manifest_{time.strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2, default=str)
+
+    print(f"batch.py: {manifest['ok']} ok, {manifest['failed']} failed, {manifest['skipped']} skipped "
+          f"in {manifest['wall_s']:.1f}s ({manifest['parallel_speedup'] or 0:.1f}x parallel)")
+    print(f"batch.py: Manifest saved to {manifest_path}")
+    sys.exit(1 if manifest['failed'] else 0)
@@ -0,0 +1,36 @@
+# src/component/decimation.py
+import numpy as np
+
+def minmax_bins(data, n_bins):
+    """
+    Splits data into n_bins contiguous bins and returns (edges, mins, maxs).
+
+    edges has n_bins + 1 entries; bin i covers samples edges[i]:edges[i + 1].
+    """
+    n_bins = max(1, min(int(n_bins), len(data)))
+    edges = np.linspace(0, len(data), n_bins + 1).astype(np.int64)
+    starts = edges[:-1]
+    return edges, np.minimum.reduceat(data, starts), np.maximum.reduceat(data, starts)
+
+def minmax_envelope(data, n_bins):
+    """
+    Reduces data to a min/max envelope of n_bins bins for line plotting.
+
+    Returns (positions, values): two points per bin, both placed at the bin's centre sample position,
+    alternating min and max so a single polyline traces the full vertical extent of every bin.
+    If data already has no more than 2 * n_bins samples, every sample is returned unchanged.
+    """
+    if len(data) <= 2 * n_bins:
+        return np.arange(len(data), dtype=np.float64), data
+    edges, mins, maxs = minmax_bins(data, n_bins)
+    centres = (edges[:-1] + edges[1:] - 1) / 2.0
+    positions = np.repeat(centres, 2)
+    values = np.empty(2 * len(mins), dtype=data.dtype)
+    values[0::2] = mins
+    values[1::2] = maxs
+    return positions, values
+
+def axes_pixel_width(ax):
+    """Returns the width of an axes in display pixels at the figure's dpi."""
+    fig = ax.figure
+    return max(1, int(round(ax.get_position().width * fig.get_figwidth() * fig.dpi)))
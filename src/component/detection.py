@@ -0,0 +1,142 @@
+# src/component/detection.py
+import csv
+import numpy as np
+
+STA_S = 1.0  # Short-term average window (s)
+LTA_S = 10.0  # Long-term average window (s)
+TRIGGER_ON = 3.5  # STA/LTA ratio at which a P arrival is picked
+PEAK_COLUMNS = ("station_code", "trace_id", "dist_km", "p_pick_time", "p_travel_time_s", "sta_lta_max",
+                "pgv_um_s", "pgv_time", "pga_um_s2", "pga_time")
+
+def _segment_ids(offsets, npts):
+    """Returns the trace number of every sample of the flat buffer."""
+    return np.repeat(np.arange(len(npts)), npts)
+
+def _first_per_segment(mask, offsets, n_segments):
+    """Returns the flat index of the first True sample of every segment, or -1 where there is none."""
+    hits = np.flatnonzero(mask)
+    first = np.full(n_segments, -1, dtype=np.int64)
+    if len(hits):
+        segments = np.searchsorted(offsets, hits, side='right') - 1
+        unique_segments, first_hit = np.unique(segments, return_index=True)
+        first[unique_segments] = hits[first_hit]
+    return first
+
+def sta_lta_batch(data, offsets, npts, sampling_rates, sta_s=STA_S, lta_s=LTA_S):
+    """
+    Computes the classic STA/LTA ratio of the squared signal for every trace of a flat buffer at once.
+
+    Both averages come from cumulative sums of the energy, so the cost is a few vector operations
+    regardless of the number of traces. The sum restarts at every trace: a running total carried over
+    from a loud trace would swamp the windows of a quiet one in float64 cancellation, so each trace gets
+    the ratio it would have on its own. The ratio is 0 for the first lta_s seconds of each trace, where
+    the long-term window is not yet full.
+
+    Returns:
+        np.ndarray: float64 ratio per sample, aligned with data.
+    """
+    energy = np.square(data, dtype=np.float64)
+    segment = _segment_ids(offsets, npts)
+    # Every trace's sums are preceded by their own zero, so trace i's sample j sits at j + i + 1
+    cumulative = np.zeros(len(energy) + len(npts), dtype=np.float64)
+    for i, (offset, n) in enumerate(zip(offsets, npts)):
+        np.cumsum(energy[offset:offset + n], out=cumulative[offset + i + 1:offset + i + 1 + n])
+
+    n_sta = np.maximum(1, np.round(sta_s * sampling_rates)).astype(np.int64)
+    n_lta = np.maximum(n_sta + 1, np.round(lta_s * sampling_rates)).astype(np.int64)
+    index = np.arange(len(energy), dtype=np.int64)
+    local = index - offsets[segment]
+    valid = local + 1 >= n_lta[segment]
+
+    # Windows end at (and include) each sample; invalid samples are clamped to an empty window
+    end = index + segment + 1
+    sta_start = np.where(valid, end - n_sta[segment], end)
+    lta_start = np.where(valid, end - n_lta[segment], end)
+    sta = (cumulative[end] - cumulative[sta_start]) / n_sta[segment]
+    lta = (cumulative[end] - cumulative[lta_start]) / n_lta[segment]
+    ratio = np.zeros(len(energy), dtype=np.float64)
+    np.divide(sta, lta, out=ratio, where=valid & (lta > 0))
+    return ratio
+
+def detect_peaks(batch, origin_time=None, sta_s=STA_S, lta_s=LTA_S, trigger_on=TRIGGER_ON):
+    """
+    Picks the first P arrival with STA/LTA and measures peak ground velocity and acceleration on every trace.
+
+    Works on the flat velocity buffer of a TraceBatch (µm/s); acceleration is its first difference
+    times the sampling rate.
+
+    Args:
+        batch (TraceBatch): Output of preprocess_traces.
+        origin_time (UTCDateTime): Optional origin time; when given, pick travel times are reported.
+        sta_s, lta_s (float): STA and LTA window lengths in seconds.
+        trigger_on (float): STA/LTA ratio at which the first arrival is picked.
+
+    Returns:
+        list: One dict per trace with the PEAK_COLUMNS keys, nearest station first.
+    """
+    if len(batch) == 0:
+        return []
+    traces = [tr for tr, _ in batch.traces_with_dist]
+    offsets, npts, data = batch.offsets, batch.npts, batch.data
+    sampling_rates = np.array([tr.stats.sampling_rate for tr in traces], dtype=np.float64)
+    segment = _segment_ids(offsets, npts)
+
+    ratio = sta_lta_batch(data, offsets, npts, sampling_rates, sta_s, lta_s)
+    ratio_max = np.maximum.reduceat(ratio, offsets)
+    pick = _first_per_segment(ratio >= trigger_on, offsets, len(traces))
+
+    abs_velocity = np.abs(data)
+    pgv = np.maximum.reduceat(abs_velocity, offsets)
+    pgv_index = _first_per_segment(abs_velocity == pgv[segment], offsets, len(traces))
+
+    abs_acceleration = np.zeros(len(data), dtype=np.float64)
+    np.subtract(data[1:], data[:-1], out=abs_acceleration[1:])
+    abs_acceleration[offsets] = 0.0  # No difference across trace boundaries
+    np.abs(abs_acceleration, out=abs_acceleration)
+    abs_acceleration *= sampling_rates[segment]
+    pga = np.maximum.reduceat(abs_acceleration, offsets)
+    pga_index = _first_per_segment(abs_acceleration == pga[segment], offsets, len(traces))
+
+    def sample_time(i, flat_index):
+        return traces[i].stats.starttime + (flat_index - offsets[i]) / sampling_rates[i]
+
+    rows = []
+    for i, (tr, dist_km) in enumerate(batch.traces_with_dist):
+        pick_time = sample_time(i, pick[i]) if pick[i] >= 0 else None
+        rows.append({
+            "station_code": tr.stats.network + "." + tr.stats.station,
+            "trace_id": tr.id,
+            "dist_km": round(float(dist_km), 3),
+            "p_pick_time": str(pick_time) if pick_time is not None else "",
+            "p_travel_time_s": round(pick_time - origin_time, 3) if pick_time is not None and origin_time is not None else "",
+            "sta_lta_max": round(float(ratio_max[i]), 3),
+            "pgv_um_s": float(pgv[i]),
+            "pgv_time": str(sample_time(i, pgv_index[i])),
+            "pga_um_s2": float(pga[i]),
+            "pga_time": str(sample_time(i, pga_index[i])),
+        })
+    rows.sort(key=lambda row: row["dist_km"])
+    return rows
+
+def peaks_event(row):
+    """Returns a detect_peaks row as sent in 'trace' progress events, with a missing pick as None."""
+    return {key: (None if value == "" else value) for key, value in row.items()}
+
+def write_station_peaks(rows, output_csv):
+    """Writes the per-station picks and peaks to a CSV file."""
+    with open(output_csv, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=PEAK_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"Saved picks and peak ground motion of {len(rows)} stations to {output_csv}")
+
+def read_station_peaks(peaks_csv):
+    """Reads a station peaks CSV back into dicts, with numbers as floats and missing picks as None."""
+    with open(peaks_csv, newline='') as f:
+        rows = list(csv.DictReader(f))
+    for row in rows:
+        for column in ("dist_km", "p_travel_time_s", "sta_lta_max", "pgv_um_s", "pga_um_s2"):
+            row[column] = float(row[column]) if row[column] != "" else None
+        if row["p_pick_time"] == "":
+            row["p_pick_time"] = None
+    return rows
@@ -0,0 +1,256 @@
+# src/component/inventory.py
+import csv
+import json
+import os
+import threading
+import time
+import numpy as np
+from pyproj import Geod
+from scipy.spatial import cKDTree
+from .paths import ASSETS_DIR
+
+SEED_CSV = os.path.join(ASSETS_DIR, 'stations', 'nepal_stations.csv')
+CACHE_DIR = os.path.join(ASSETS_DIR, 'cache')
+INVENTORY_CACHE = os.environ.get('STATION_INVENTORY_CACHE', os.path.join(CACHE_DIR, 'station_inventory.json'))
+DEFAULT_TTL = float(os.environ.get('STATION_INVENTORY_TTL', 24 * 3600))  # Seconds
+# 'background': serve the cached/seed inventory at once and refresh a stale one in a background thread
+# 'sync': refresh a stale inventory before returning; 'never': never contact the FDSN service
+DEFAULT_REFRESH = os.environ.get('STATION_INVENTORY_REFRESH', 'background')
+FDSN_TIMEOUT = 10
+# Area fetched on refresh as "latitude,longitude,maxradius_degrees" (default: 2.5 degrees around central Nepal);
+# set it empty to fetch the whole AM network
+INVENTORY_REGION = os.environ.get('STATION_INVENTORY_REGION', '28.0,84.0,2.5')
+# Station selection around an epicenter (about 2.5 degrees); 0 disables the limit
+DEFAULT_MAX_RADIUS_KM = float(os.environ.get('STATION_MAX_RADIUS_KM', 280))
+DEFAULT_MAX_STATIONS = int(os.environ.get('STATION_MAX_COUNT', 0))
+WGS84 = Geod(ellps='WGS84')
+EARTH_RADIUS_KM = 6371.0
+# Spherical distances differ from WGS84 geodesics by less than this fraction, so index queries are widened by it
+SPHERE_TOLERANCE = 0.006
+
+# In-process memo so long-lived workers only read the cache file again when it changes
+_memo = {}
+_memo_lock = threading.Lock()
+_refreshing = set()
+
+def _unit_vectors(lat, lon):
+    """Returns points on the unit sphere for arrays of latitudes and longitudes in degrees."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+def _chord(dist_km):
+    """Returns the straight-line distance on the unit sphere between points dist_km apart along its surface."""
+    return 2 * np.sin(np.minimum(dist_km / EARTH_RADIUS_KM, np.pi) / 2)
+
+class StationInventory:
+    """
+    Station coordinates held as parallel NumPy arrays with a code -> row index.
+
+    Distances and azimuths from an epicenter are computed in one vectorized geodesic call. Station selection
+    ("nearest N", "within R km") goes through a k-d tree over the stations' positions on the unit sphere,
+    where straight-line distance grows with great-circle distance, so a query only touches nearby stations
+    however large the inventory; the candidates are then ranked by their exact WGS84 distances.
+    """
+
+    def __init__(self, stations, fetched_at=0.0, source='seed'):
+        self.codes = [s['station_code'] for s in stations]
+        self.lat = np.array([float(s['lat']) for s in stations], dtype=np.float64)
+        self.lon = np.array([float(s['lon']) for s in stations], dtype=np.float64)
+        self.elev = np.array([float(s['elev']) for s in stations], dtype=np.float64)
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        self.fetched_at = fetched_at
+        self.source = source
+        self._tree = None
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, station_code):
+        return station_code in self.index
+
+    def is_stale(self, ttl=DEFAULT_TTL):
+        return time.time() - self.fetched_at > ttl
+
+    def geodesics(self, epi_lat, epi_lon, rows=None):
+        """Returns (dist_km, azimuth, back_azimuth) arrays for the stations in rows (default all) relative to the epicenter."""
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=np.intp)
+        epi_lats = np.full(len(rows), float(epi_lat))
+        epi_lons = np.full(len(rows), float(epi_lon))
+        azimuth, back_azimuth, dist_m = WGS84.inv(epi_lons, epi_lats, self.lon[rows], self.lat[rows])
+        return np.asarray(dist_m) / 1000, np.mod(azimuth, 360), np.mod(back_azimuth, 360)
+
+    @property
+    def tree(self):
+        """k-d tree over the stations' unit-sphere positions, built on first use."""
+        if self._tree is None:
+            self._tree = cKDTree(_unit_vectors(self.lat, self.lon))
+        return self._tree
+
+    def within(self, epi_lat, epi_lon, radius_km):
+        """Returns the rows of the stations at most radius_km from the epicenter, nearest first."""
+        if not len(self):
+            return np.empty(0, dtype=np.intp)
+        center = _unit_vectors(float(epi_lat), float(epi_lon))[0]
+        candidates = np.array(self.tree.query_ball_point(center, _chord(radius_km * (1 + SPHERE_TOLERANCE))), dtype=np.intp)
+        if not len(candidates):
+            return candidates
+        dist_km = self.geodesics(epi_lat, epi_lon, candidates)[0]
+        order = np.argsort(dist_km, kind='stable')
+        return candidates[order][dist_km[order] <= radius_km]
+
+    def nearest(self, epi_lat, epi_lon, n, max_radius_km=None):
+        """Returns the rows of the n stations nearest the epicenter (optionally within max_radius_km), nearest first."""
+        n = min(int(n), len(self))
+        if n <= 0:
+            return np.empty(0, dtype=np.intp)
+        center = _unit_vectors(float(epi_lat), float(epi_lon))[0]
+        chord, _ = self.tree.query(center, k=[n])
+        # Every station that could rank among the n nearest by geodesic distance lies within this chord
+        reach_km = 2 * EARTH_RADIUS_KM * np.arcsin(min(float(chord[0]) / 2, 1.0)) * (1 + SPHERE_TOLERANCE)
+        if max_radius_km:
+            reach_km = min(reach_km, max_radius_km)
+        return self.within(epi_lat, epi_lon, reach_km)[:n]
+
+    def select(self, epi_lat, epi_lon, max_radius_km=None, max_stations=None):
+        """Returns the rows of the stations to use for an event, nearest first; 0 or None disables a limit."""
+        if max_stations:
+            return self.nearest(epi_lat, epi_lon, max_stations, max_radius_km)
+        if max_radius_km:
+            return self.within(epi_lat, epi_lon, max_radius_km)
+        return np.argsort(self.geodesics(epi_lat, epi_lon)[0], kind='stable')
+
+    def station_metadata(self, epi_lat, epi_lon, rows=None):
+        """Builds the station_code -> metadata dict used by the rest of the pipeline."""
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=np.intp)
+        dist_km, azimuth, back_azimuth = self.geodesics(epi_lat, epi_lon, rows)
+        return {
+            self.codes[i]: {
+                "station_code": self.codes[i],
+                "lat": float(self.lat[i]),
+                "lon": float(self.lon[i]),
+                "elev": float(self.elev[i]),
+                "dist_km": float(dist_km[k]),
+                "azimuth": float(azimuth[k]),
+                "back_azimuth": float(back_azimuth[k]),
+            }
+            for k, i in enumerate(rows)
+        }
+
+    def to_records(self):
+        return [
+            {"station_code": code, "lat": float(lat), "lon": float(lon), "elev": float(elev)}
+            for code, lat, lon, elev in zip(self.codes, self.lat, self.lon, self.elev)
+        ]
+
+    def merged_with(self, other):
+        """Returns a new inventory holding the stations of both, preferring `other` for shared codes."""
+        records = {record['station_code']: record for record in self.to_records()}
+        records.update({record['station_code']: record for record in other.to_records()})
+        return StationInventory(list(records.values()), max(self.fetched_at, other.fetched_at), other.source)
+
+    def save(self, path=INVENTORY_CACHE):
+        """Writes the inventory atomically so concurrent readers never see a partial file."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"fetched_at": self.fetched_at, "source": self.source, "stations": self.to_records()}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=INVENTORY_CACHE):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data['stations'], data.get('fetched_at', 0.0), data.get('source', 'cache'))
+
+    @classmethod
+    def from_csv(cls, path=SEED_CSV):
+        """Reads a station CSV with station_code, lat, lon and elev columns (extra columns are ignored)."""
+        with open(path, newline='') as f:
+            stations = [row for row in csv.DictReader(f) if row.get('station_code')]
+        # Seed data is treated as already expired so the first online run refreshes it
+        return cls(stations, fetched_at=0.0, source='seed')
+
+    @classmethod
+    def from_fdsn(cls, timeout=FDSN_TIMEOUT, region=INVENTORY_REGION):
+        """Fetches the Raspberry Shake stations in region (see INVENTORY_REGION) from the RASPISHAKE FDSN station service."""
+        from obspy.clients.fdsn import Client
+        rs = Client('RASPISHAKE', timeout=timeout)
+        area = {}
+        if region:
+            latitude, longitude, maxradius = (float(value) for value in region.split(','))
+            area = {"latitude": latitude, "longitude": longitude, "maxradius": maxradius}
+        inventory = rs.get_stations(network="AM", level="station", **area)
+        stations = [
+            {"station_code": f"{network.code}.{station.code}", "lat": station.latitude,
+             "lon": station.longitude, "elev": station.elevation}
+            for network in inventory for station in network
+        ]
+        if not stations:
+            raise ValueError("No stations found")
+        return cls(stations, fetched_at=time.time(), source='fdsn')
+
+def refresh_inventory(cache_path=INVENTORY_CACHE, seed_csv=SEED_CSV):
+    """Fetches the inventory from FDSN, merges it into the cached one and saves it."""
+    try:
+        base = StationInventory.load(cache_path) if os.path.exists(cache_path) else StationInventory.from_csv(seed_csv)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Station inventory cache unreadable ({e}); starting from the seed file.")
+        base = StationInventory.from_csv(seed_csv)
+    inventory = base.merged_with(StationInventory.from_fdsn())
+    inventory.save(cache_path)
+    print(f"Refreshed station inventory: {len(inventory)} stations saved to {cache_path}")
+    return inventory
+
+def _refresh_in_background(cache_path, seed_csv):
+    with _memo_lock:
+        if cache_path in _refreshing:
+            return
+        _refreshing.add(cache_path)
+
+    def run():
+        try:
+            refresh_inventory(cache_path, seed_csv)
+        except Exception as e:
+            print(f"Background station inventory refresh failed: {e}")
+        finally:
+            with _memo_lock:
+                _refreshing.discard(cache_path)
+
+    threading.Thread(target=run, name='inventory-refresh', daemon=True).start()
+
+def load_inventory(cache_path=INVENTORY_CACHE, seed_csv=SEED_CSV, ttl=DEFAULT_TTL, refresh=DEFAULT_REFRESH):
+    """
+    Returns the station inventory from the on-disk cache, falling back to the seed CSV.
+
+    Args:
+        cache_path (str): JSON cache file written by previous refreshes.
+        seed_csv (str): Station CSV used when no cache exists yet.
+        ttl (float): Age in seconds after which the cached inventory is refreshed.
+        refresh (str): 'background', 'sync' or 'never' (see DEFAULT_REFRESH).
+
+    Returns:
+        StationInventory: The inventory; never empty as long as the seed CSV exists.
+    """
+    mtime = os.path.getmtime(cache_path) if os.path.exists(cache_path) else None
+    with _memo_lock:
+        memo = _memo.get(cache_path)
+    if memo is not None and memo[0] == mtime:
+        inventory = memo[1]
+    else:
+        try:
+            inventory = StationInventory.load(cache_path) if mtime is not None else StationInventory.from_csv(seed_csv)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Station inventory cache unreadable ({e}); using the seed file.")
+            inventory = StationInventory.from_csv(seed_csv)
+        with _memo_lock:
+            _memo[cache_path] = (mtime, inventory)
+
+    if inventory.is_stale(ttl) and refresh != 'never':
+        if refresh == 'sync':
+            try:
+                inventory = refresh_inventory(cache_path, seed_csv)
+            except Exception as e:
+                print(f"Station inventory refresh failed: {e}. Using {inventory.source} inventory.")
+        else:
+            _refresh_in_background(cache_path, seed_csv)
+    return inventory
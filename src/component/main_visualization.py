@@ -1,13 +1,24 @@
 # src/component/main_visualization.py
 import os
+import shutil
 import pandas as pd
+from obspy import UTCDateTime
 # Assuming these are available in the same component directory or via sys.path
-from .data_processing import process_seismic_data
-from .map_creation import create_map
+from .data_processing import ingest_seismic_data
+from .map_creation import DEFAULT_FEATURES, create_map, map_extent
 from .plot_creation import create_velocity_plots
+from .record_section import create_record_section
 from .metadata import fetch_station_metadata
+from .preprocessing import preprocess_traces
+from .detection import detect_peaks, peaks_event, write_station_peaks
+from .waveform_store import SAMPLES_FILE, INDEX_FILE, write_waveform_store
+from . import waveform_tiles as tiles
+from .profiling import RunProfiler, write_run_report
+from .streaming_pipeline import plan_traces, render_streaming
+from .spectral import compute_spectra, create_spectral_plots, write_spectra
+from . import result_cache
 
-def process_data(folder_path, output_csv, output_pdf, map_pdf, epi_lat=28.2292, epi_lon=84.3985, epi_mag=5.3):
+def process_data(folder_path, output_csv, output_pdf, map_pdf, epi_lat=28.2292, epi_lon=84.3985, epi_mag=5.3, progress_callback=None, full_resolution=False, use_cache=True, waveform_store=None, record_section_pdf=None, origin_time=None, reduction_velocity=None, peaks_csv=None, max_workers=None, run_report=None, streaming=False, spectra_pdf=None, spectra_npz=None, max_radius_km=None, max_stations=None, page_previews=None, waveform_tiles=None, map_features=DEFAULT_FEATURES):
     """
     Main function to process seismic data, generate metadata, maps, and velocity plots.
 
@@ -19,7 +30,70 @@ def process_data(folder_path, output_csv, output_pdf, map_pdf, epi_lat=28.2292,
         epi_lat (float): Latitude of the earthquake epicenter. Defaults to 28.2292.
         epi_lon (float): Longitude of the earthquake epicenter. Defaults to 84.3985.
         epi_mag (float): Magnitude of the earthquake. Defaults to 5.3.
+        progress_callback (callable): Optional `progress_callback(stage, data=None)` called as each
+            pipeline stage ('metadata', 'read', 'preprocess', 'detect', 'map', 'plot', 'spectra') starts, and
+            with result events: 'trace' with each station's picks and peaks, nearest first, and 'page' as each
+            velocity page is rendered.
+        full_resolution (bool): Draw every sample in the velocity plots instead of per-pixel min/max envelopes.
+        use_cache (bool): Reuse the products of an earlier run with identical inputs and settings.
+        waveform_store (str): Optional directory to save the preprocessed traces to (see component.waveform_store),
+            so later products can read them without decoding the MiniSEED again. Written in streaming mode as well.
+        record_section_pdf (str): Optional full path for a record section of all traces on one time axis.
+        origin_time (str or UTCDateTime): Event origin time the record section is aligned to; defaults to
+            the earliest trace start.
+        reduction_velocity (float): Optional reduction velocity (km/s) for the record section.
+        peaks_csv (str): Full path for the per-station P picks and peak ground motion table.
+            Defaults to station_peaks.csv next to output_csv.
+        max_workers (int): Processes used to read files and render pages. Defaults to the CPU count;
+            set it lower when several analyses run side by side.
+        run_report (str): Full path for the JSON run report (per-stage wall and CPU time, peak RSS, bytes,
+            traces and samples). Defaults to run_report.json next to output_csv.
+        streaming (bool): Read, preprocess and draw one trace at a time, nearest station first, so memory stays
+            at one trace plus one page however long the window (see component.streaming_pipeline). Pages are
+            rendered in this process and the spectral products are not written.
+        spectra_pdf (str): Optional full path for the spectrogram and Welch PSD plots of every trace.
+        spectra_npz (str): Optional full path for the same spectra as a compressed NumPy file
+            (see component.spectral).
+        max_radius_km (float): Only analyse stations within this distance of the epicenter. Defaults to
+            STATION_MAX_RADIUS_KM; 0 for no limit.
+        max_stations (int): Only analyse this many stations nearest the epicenter. Defaults to STATION_MAX_COUNT;
+            0 for no limit.
+        page_previews (str): Optional directory for a PNG (and WebP) preview of every page of the PDFs,
+            named <product>_<page>. Velocity pages are named in the 'page' events, so results can be shown
+            before the PDF is complete.
+        waveform_tiles (str): Optional directory for the min/max pyramid of every trace served to the
+            interactive viewer (see component.waveform_tiles). Written in streaming mode as well. Level 0 is
+            served from the waveform store, which defaults to a 'waveforms' directory next to waveform_tiles.
+        map_features (tuple): Natural Earth layers drawn under the station map (see component.map_creation).
+            Defaults to DEFAULT_FEATURES; an empty tuple draws the stations on a blank background.
+
+    Returns:
+        str: Run status: 'ok', 'cached', 'no_traces', 'invalid_input' (or 'failed' in the report if it raised).
     """
+    if run_report is None:
+        run_report = os.path.join(os.path.dirname(output_csv), "run_report.json")
+    profiler = RunProfiler(progress_callback)
+    status = "failed"
+    try:
+        status = _run_pipeline(profiler, folder_path, output_csv, output_pdf, map_pdf, epi_lat, epi_lon, epi_mag,
+                               full_resolution, use_cache, waveform_store, record_section_pdf, origin_time,
+                               reduction_velocity, peaks_csv, max_workers, streaming, spectra_pdf, spectra_npz,
+                               max_radius_km, max_stations, page_previews, waveform_tiles, map_features)
+        return status
+    finally:
+        report = profiler.finish(status)
+        try:
+            write_run_report(report, run_report)
+            print(f"Run report saved to {run_report} ({report['wall_s']:.2f}s wall, {report['cpu_s']:.2f}s CPU)")
+        except OSError as e:
+            print(f"Error saving run report: {e}")
+
+def _run_pipeline(profiler, folder_path, output_csv, output_pdf, map_pdf, epi_lat, epi_lon, epi_mag, full_resolution,
+                  use_cache, waveform_store, record_section_pdf, origin_time, reduction_velocity, peaks_csv, max_workers, streaming,
+                  spectra_pdf, spectra_npz, max_radius_km, max_stations, page_previews, waveform_tiles, map_features):
+    """Runs the pipeline stages of process_data, timing each through profiler, and returns the run status."""
+    report = profiler.stage
+
     gain = 1e9 # Gain factor for velocity conversion, typically provided by instrument calibration
     plots_per_page = 6
     nrows, ncols = 6, 1  # 6 rows, 1 column for 6 plots per page on A4 portrait
@@ -27,19 +101,20 @@ def process_data(folder_path, output_csv, output_pdf, map_pdf, epi_lat=28.2292,
     
     if nrows * ncols != plots_per_page:
         print(f"Error: nrows ({nrows}) * ncols ({ncols}) must equal plots_per_page ({plots_per_page}).")
-        return
+        return "invalid_input"
 
     # Check if the input folder exists and is writable (for listing files)
     if not os.path.isdir(folder_path):
         print(f"Error: Directory '{folder_path}' does not exist.")
-        return
+        return "invalid_input"
     if not os.access(folder_path, os.R_OK): # Check for read access
         print(f"Error: Directory '{folder_path}' is not readable.")
-        return
+        return "invalid_input"
 
     # 1. Fetch station metadata relative to the epicenter
-    # Pass epi_lat and epi_lon from arguments to fetch_station_metadata
-    station_metadata = fetch_station_metadata(epi_lat, epi_lon)
+    # Pass epi_lat and epi_lon from arguments to fetch_station_metadata, which selects the stations near it
+    report('metadata')
+    station_metadata = fetch_station_metadata(epi_lat, epi_lon, max_radius_km, max_stations)
     if station_metadata:
         # Save fetched station metadata to a CSV file
         try:
@@ -49,19 +124,147 @@ def process_data(folder_path, output_csv, output_pdf, map_pdf, epi_lat=28.2292,
             print(f"Error saving station metadata to CSV: {e}")
             # Continue without saving CSV if there's an issue, but log it
 
+    # From the selection rather than the stations with data, so it matches the base maps rendered ahead of time
+    extent = map_extent(station_metadata, epi_lat, epi_lon)
+
+    if peaks_csv is None:
+        peaks_csv = os.path.join(os.path.dirname(output_csv), "station_peaks.csv")
+    origin_time = UTCDateTime(origin_time) if origin_time else None
+
+    # Kept with the cached result, so a cache hit sends the same 'trace' and 'page' events as this run
+    result_events = []
+
+    def publish_page(data):
+        result_events.append(['page', data])
+        profiler.event('page', data)
+
+    def publish_trace(row):
+        data = peaks_event(row)
+        result_events.append(['trace', data])
+        profiler.event('trace', data)
+
+    if waveform_tiles and not waveform_store:
+        waveform_store = os.path.join(os.path.dirname(waveform_tiles.rstrip(os.sep)), "waveforms")
+    if streaming and (spectra_pdf or spectra_npz):
+        print("Warning: Spectral products are not computed in streaming mode.")
+        spectra_pdf = spectra_npz = None
+
+    # Products of an identical earlier run (same MiniSEED content, epicenter, stations and settings) are reused.
+    # Every setting that changes a product belongs in the key; streaming runs draw their pages separately.
+    cached_outputs = {"velocity.pdf": output_pdf, "map.pdf": map_pdf, "station_peaks.csv": peaks_csv}
+    if record_section_pdf:
+        cached_outputs["record_section.pdf"] = record_section_pdf
+    if spectra_pdf:
+        cached_outputs["spectra.pdf"] = spectra_pdf
+    if spectra_npz:
+        cached_outputs["spectra.npz"] = spectra_npz
+    if waveform_store:
+        os.makedirs(waveform_store, exist_ok=True)
+        cached_outputs["waveforms_" + SAMPLES_FILE] = os.path.join(waveform_store, SAMPLES_FILE)
+        cached_outputs["waveforms_" + INDEX_FILE] = os.path.join(waveform_store, INDEX_FILE)
+    if waveform_tiles:
+        os.makedirs(waveform_tiles, exist_ok=True)
+        cached_outputs["tiles_" + tiles.PYRAMID_FILE] = os.path.join(waveform_tiles, tiles.PYRAMID_FILE)
+        cached_outputs["tiles_" + tiles.INDEX_FILE] = os.path.join(waveform_tiles, tiles.INDEX_FILE)
+    cached_directories = {"pages": page_previews} if page_previews else None
+    cache_key = None
+    if use_cache:
+        cache_key = result_cache.analysis_key(folder_path, {
+            "epicenter": [epi_lat, epi_lon, epi_mag], "stations": station_metadata, "gain": gain,
+            "layout": [plots_per_page, nrows, ncols, list(figsize)], "full_resolution": full_resolution,
+            "origin_time": str(origin_time) if origin_time is not None else None,
+            "record_section": reduction_velocity if record_section_pdf else None,
+            "streaming": bool(streaming), "map_features": list(map_features),
+        })
+        if result_cache.lookup(cache_key, cached_outputs, directories=cached_directories):
+            print(f"Reused cached results {cache_key[:12]} for identical inputs")
+            for name, data in result_cache.read_events(cache_key):
+                profiler.event(name, data)
+            print("\n--- Seismic Data Processing and Visualization Complete ---")
+            return "cached"
+    if page_previews:
+        # Previews of an earlier run may have more pages than this one
+        shutil.rmtree(page_previews, ignore_errors=True)
+
+    if streaming:
+        # Order the traces by distance from their headers, then analyse them one at a time
+        report('read', {"streaming": True})
+        plan, used_stations, file_stats = plan_traces(folder_path, station_metadata)
+        profiler.count("files", len(file_stats))
+        profiler.count("bytes_read", sum(stats["bytes"] for stats in file_stats))
+        profiler.count("stations", len(used_stations))
+        if not plan:
+            print("Warning: No valid traces found for plotting. Skipping plot generation.")
+            return "no_traces"
+        report('map')
+        create_map(used_stations, epi_lat, epi_lon, epi_mag, map_pdf, extent=extent, features=map_features,
+                   page_previews=page_previews)
+        report('plot', {"streaming": True})
+        totals = render_streaming(plan, station_metadata, gain, output_pdf, peaks_csv, nrows, ncols, figsize, origin_time,
+                                  epi_mag, full_resolution, record_section_pdf, reduction_velocity, page_previews,
+                                  publish_page, publish_trace, waveform_tiles, waveform_store)
+        profiler.count("traces", totals["traces"])
+        profiler.count("samples", totals["samples"])
+        if cache_key is not None:
+            result_cache.store(cache_key, cached_outputs, directories=cached_directories, events=result_events)
+        print("\n--- Seismic Data Processing and Visualization Complete ---")
+        return "ok"
+
     # 2. Process seismic data (read .mseed files and associate with distance)
-    # Pass folder_path and station_metadata to process_seismic_data
-    traces_with_dist, used_stations = process_seismic_data(folder_path, station_metadata)
+    # Pass folder_path and station_metadata to ingest_seismic_data, which also reports per-file statistics
+    report('read')
+    traces_with_dist, used_stations, file_stats = ingest_seismic_data(folder_path, station_metadata, max_workers)
+    profiler.count("files", len(file_stats))
+    profiler.count("bytes_read", sum(stats["bytes"] for stats in file_stats))
+    profiler.count("traces", len(traces_with_dist))
+    profiler.count("stations", len(used_stations))
     if not traces_with_dist:
         print("Warning: No valid traces found for plotting. Skipping plot generation.")
-        return
+        return "no_traces"
+
+    # Detrend, demean and convert all traces to µm/s once; the plots reuse the converted samples
+    report('preprocess')
+    batch = preprocess_traces(traces_with_dist, gain)
+    traces_with_dist = batch.traces_with_dist
+    profiler.count("samples", int(batch.npts.sum()))
+    if waveform_store:
+        write_waveform_store(batch, waveform_store, gain)
+    if waveform_tiles:
+        tiles.write_waveform_tiles(sorted(traces_with_dist, key=lambda x: x[1]), waveform_tiles, batch.units, waveform_store)
+
+    # Pick P arrivals and measure peak ground motion on all traces in one batch
+    report('detect')
+    peaks = detect_peaks(batch, origin_time)
+    write_station_peaks(peaks, peaks_csv)
+    for row in peaks:
+        publish_trace(row)
 
     # 3. Create map visualization
     # Pass epi_lat, epi_lon, and epi_mag to create_map
-    create_map(used_stations, epi_lat, epi_lon, epi_mag, map_pdf)
+    report('map')
+    create_map(used_stations, epi_lat, epi_lon, epi_mag, map_pdf, extent=extent, features=map_features,
+               page_previews=page_previews)
 
     # 4. Create velocity plots
     # Pass epi_mag to create_velocity_plots as well for potential use in titles/labels
-    create_velocity_plots(traces_with_dist, station_metadata, output_pdf, gain, plots_per_page, nrows, ncols, figsize, epi_mag)
+    report('plot')
+    create_velocity_plots(traces_with_dist, station_metadata, output_pdf, gain, plots_per_page, nrows, ncols, figsize, epi_mag, preprocessed=True, full_resolution=full_resolution, render_workers=max_workers,
+                          page_previews=page_previews, page_callback=publish_page)
+    if record_section_pdf:
+        create_record_section(traces_with_dist, record_section_pdf, origin_time,
+                              reduction_velocity, epi_mag, full_resolution=full_resolution, page_previews=page_previews)
+
+    # Spectrograms and Welch PSDs of all traces, computed in batched FFTs over one equal-length matrix
+    if spectra_pdf or spectra_npz:
+        report('spectra')
+        spectra = compute_spectra(batch)
+        if spectra_npz:
+            write_spectra(spectra, spectra_npz)
+        if spectra_pdf:
+            create_spectral_plots(spectra, spectra_pdf, plots_per_page, figsize, epi_mag, page_previews)
+
+    if cache_key is not None:
+        result_cache.store(cache_key, cached_outputs, directories=cached_directories, events=result_events)
 
     print("\n--- Seismic Data Processing and Visualization Complete ---")
+    return "ok"
@@ -1,33 +1,157 @@
+import hashlib
+import json
+import math
+import os
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_pdf import PdfPages
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature
 import matplotlib.lines as mlines
+from .metadata import fetch_station_metadata
+from .paths import ASSETS_DIR
+from .plot_creation import save_figure_previews
 
-def create_map(used_stations, epi_lat, epi_lon, epi_mag, map_pdf):
+BASEMAP_CACHE_DIR = os.path.join(ASSETS_DIR, 'cache', 'basemap')
+DEFAULT_EXTENT = (80.0, 88.5, 26.0, 30.5)
+# Background layers by name, with the keyword arguments they are drawn with
+BASEMAP_FEATURES = {
+    'land': (cfeature.LAND, {}),
+    'coastline': (cfeature.COASTLINE, {}),
+    'borders': (cfeature.BORDERS, {'linestyle': ':'}),
+    'rivers': (cfeature.RIVERS, {}),
+}
+DEFAULT_FEATURES = ('land', 'coastline', 'borders', 'rivers')
+# Margin around the epicenter and stations, smallest span of a map side, and the grid its edges snap to (degrees)
+MAP_MARGIN_DEG = 0.5
+MIN_MAP_SPAN_DEG = 2.0
+MAP_GRID_DEG = 0.5
+BASEMAP_WIDTH_PX = 2400
+BASEMAP_VERSION = 1  # Bump to invalidate cached base maps after changing how they are drawn
+# Epicenters ("lat,lon;lat,lon") whose base maps warm workers render at start-up; defaults to process_data's epicenter
+BASEMAP_WARM_EPICENTERS = os.environ.get('BASEMAP_WARM_EPICENTERS', '28.2292,84.3985')
+
+def basemap_key(extent, features, projection='PlateCarree', width_px=BASEMAP_WIDTH_PX):
+    """Returns the cache key of a base map rendered for this extent, projection and feature set."""
+    spec = {"extent": [float(v) for v in extent], "projection": projection, "features": list(features),
+            "width_px": width_px, "version": BASEMAP_VERSION}
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+
+def get_base_map(extent=DEFAULT_EXTENT, features=DEFAULT_FEATURES, cache_dir=BASEMAP_CACHE_DIR, width_px=BASEMAP_WIDTH_PX):
+    """
+    Returns the path of a PNG of the background layers over extent, rendering and caching it on first use.
+
+    The image covers exactly the extent in PlateCarree coordinates, so it can be placed with imshow.
+    """
+    path = os.path.join(cache_dir, f"{basemap_key(extent, features, width_px=width_px)}.png")
+    if os.path.exists(path):
+        return path
+    os.makedirs(cache_dir, exist_ok=True)
+    lon_span, lat_span = extent[1] - extent[0], extent[3] - extent[2]
+    dpi = 100
+    # Write to a temporary file first so concurrent workers never read a half-written image
+    tmp_path = f"{path}.{os.getpid()}.tmp.png"
+    fig = plt.figure(figsize=(width_px / dpi, width_px * lat_span / lon_span / dpi), dpi=dpi)
+    try:
+        ax = fig.add_axes([0, 0, 1, 1], projection=ccrs.PlateCarree())
+        ax.set_extent(extent, crs=ccrs.PlateCarree())
+        for name in features:
+            feature, kwargs = BASEMAP_FEATURES[name]
+            ax.add_feature(feature, **kwargs)
+        ax.set_axis_off()
+        fig.savefig(tmp_path, dpi=dpi)
+        os.replace(tmp_path, path)
+    finally:
+        plt.close(fig)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    print(f"Rendered base map {os.path.basename(path)} for extent {list(extent)}")
+    return path
+
+def map_extent(used_stations, epi_lat, epi_lon, margin=MAP_MARGIN_DEG, min_span=MIN_MAP_SPAN_DEG, grid=MAP_GRID_DEG):
+    """
+    Returns the (lon_min, lon_max, lat_min, lat_max) extent showing the epicenter and every station.
+
+    The edges are snapped outward to a grid, so nearby events share a cached base map.
+    """
+    lons = [float(epi_lon)] + [float(station['lon']) for station in used_stations.values()]
+    lats = [float(epi_lat)] + [float(station['lat']) for station in used_stations.values()]
+
+    def side(low, high, limit):
+        low, high = low - margin, high + margin
+        if high - low < min_span:
+            center = (low + high) / 2
+            low, high = center - min_span / 2, center + min_span / 2
+        # Near the poles and the date line the window is moved inward rather than cut short
+        shift = max(0.0, -limit - low) - max(0.0, high - limit)
+        low, high = low + shift, high + shift
+        return max(-limit, math.floor(low / grid) * grid), min(limit, math.ceil(high / grid) * grid)
+
+    lon_min, lon_max = side(min(lons), max(lons), 180.0)
+    lat_min, lat_max = side(min(lats), max(lats), 90.0)
+    return (lon_min, lon_max, lat_min, lat_max)
+
+def event_map_extent(epi_lat, epi_lon, max_radius_km=None, max_stations=None):
+    """
+    Returns the map extent of an event: its epicenter and the stations selected around it.
+
+    The extent depends only on the epicenter and the station selection, not on which stations sent data,
+    so the base map can be rendered before the event's files are read.
+    """
+    return map_extent(fetch_station_metadata(epi_lat, epi_lon, max_radius_km, max_stations), epi_lat, epi_lon)
+
+def warm_epicenters(spec=BASEMAP_WARM_EPICENTERS):
+    """Parses BASEMAP_WARM_EPICENTERS into (lat, lon) pairs."""
+    return [tuple(float(value) for value in point.split(',')) for point in spec.split(';') if point.strip()]
+
+def prepare_base_maps(epicenters, max_radius_km=None, max_stations=None, features=DEFAULT_FEATURES):
+    """Renders the base maps that events at these (lat, lon) epicenters will use; returns their extents."""
+    extents = sorted({event_map_extent(lat, lon, max_radius_km, max_stations) for lat, lon in epicenters})
+    for extent in extents:
+        try:
+            get_base_map(extent, features)
+        except Exception as e:
+            print(f"Warning: could not render the base map for extent {list(extent)}: {e}")
+    return extents
+
+def draw_base_map(ax_map, extent, features, use_cache=True):
+    """Draws the background layers, from the cached image when possible."""
+    if not use_cache:
+        for name in features:
+            feature, kwargs = BASEMAP_FEATURES[name]
+            ax_map.add_feature(feature, **kwargs)
+        return
+    try:
+        image = plt.imread(get_base_map(extent, features))
+    except Exception as e:
+        print(f"Warning: could not build the base map ({e}). Drawing stations without background layers.")
+        return
+    ax_map.imshow(image, origin='upper', extent=extent, transform=ccrs.PlateCarree(), interpolation='bilinear', zorder=0)
+
+def create_map(used_stations, epi_lat, epi_lon, epi_mag, map_pdf, extent=None, features=DEFAULT_FEATURES, use_cache=True,
+               page_previews=None):
+    """Writes the station map and its legend; extent defaults to map_extent() of the epicenter and stations."""
+    if extent is None:
+        extent = map_extent(used_stations, epi_lat, epi_lon)
     with PdfPages(map_pdf) as pdf:
         fig_map = plt.figure(figsize=(10, 8))
         ax_map = fig_map.add_subplot(1, 1, 1, projection=ccrs.PlateCarree())
-        ax_map.set_extent([80.0, 88.5, 26.0, 30.5])
-        ax_map.add_feature(cfeature.LAND)
-        ax_map.add_feature(cfeature.COASTLINE)
-        ax_map.add_feature(cfeature.BORDERS, linestyle=':')
-        ax_map.add_feature(cfeature.RIVERS)
+        ax_map.set_extent(extent)
+        draw_base_map(ax_map, extent, features, use_cache)
         ax_map.gridlines(draw_labels=True)
-        ax_map.scatter(epi_lon, epi_lat, s=200, c='red', marker='*', label=f'Lamjung M{epi_mag} Epicenter')
-        
+        ax_map.scatter(epi_lon, epi_lat, s=200, c='red', marker='*', label=f'M{epi_mag} Epicenter')
+
         sorted_stations = sorted(used_stations.items(), key=lambda x: x[1]['dist_km'])
         for idx, (station_code, station) in enumerate(sorted_stations, 1):
             ax_map.scatter(station['lon'], station['lat'], s=100, c='blue', marker='^')
             ax_map.text(station['lon'] + 0.05, station['lat'], str(idx), fontsize=8, weight='bold')
-        ax_map.set_title("Raspberry Shake Stations and Lamjung Earthquake Epicenter")
+        ax_map.set_title(f"Raspberry Shake Stations and M{epi_mag} Earthquake Epicenter")
         pdf.savefig(fig_map)
 
         fig_legend = plt.figure(figsize=(10, 8))
         ax_legend = fig_legend.add_subplot(1, 1, 1)
         ax_legend.axis('off')
         legend_elements = [
-            mlines.Line2D([], [], color='red', marker='*', linestyle='None', markersize=15, label=f'Lamjung M{epi_mag} Epicenter'),
+            mlines.Line2D([], [], color='red', marker='*', linestyle='None', markersize=15, label=f'M{epi_mag} Epicenter'),
             mlines.Line2D([], [], color='blue', marker='^', linestyle='None', markersize=10, label='Raspberry Shake Station')
         ]
         for idx, (station_code, _) in enumerate(sorted_stations, 1):
@@ -35,6 +159,7 @@ def create_map(used_stations, epi_lat, epi_lon, epi_mag, map_pdf):
         ax_legend.legend(handles=legend_elements, loc='center', fontsize=10)
         ax_legend.set_title("Legend")
         pdf.savefig(fig_legend)
+        save_figure_previews([fig_map, fig_legend], page_previews, "map")
         plt.close(fig_map)
         plt.close(fig_legend)
-        print(f"Map and legend saved to {map_pdf}")
\ No newline at end of file
+        print(f"Map and legend saved to {map_pdf}")
@@ -1,29 +1,23 @@
-from obspy.clients.fdsn import Client
-from obspy.geodetics import gps2dist_azimuth
+from .inventory import DEFAULT_MAX_RADIUS_KM, DEFAULT_MAX_STATIONS, load_inventory
 
-def fetch_station_metadata(epi_lat, epi_lon):
-    try:
-        rs = Client('RASPISHAKE')
-        inventory = rs.get_stations(network="AM", latitude=28.0, longitude=84.0, maxradius=2.5, level="station")
-        stations = []
-        for network in inventory:
-            for station in network:
-                dist_m, _, _ = gps2dist_azimuth(station.latitude, station.longitude, epi_lat, epi_lon)
-                dist_km = dist_m / 1000
-                stations.append({
-                    "station_code": f"{network.code}.{station.code}",
-                    "lat": station.latitude,
-                    "lon": station.longitude,
-                    "elev": station.elevation,
-                    "dist_km": dist_km
-                })
-        if stations:
-            print(f"Fetched {len(stations)} stations from RASPISHAKE")
-            return {s["station_code"]: s for s in stations}
-        raise ValueError("No stations found")
-    except Exception as e:
-        print(f"Error fetching station metadata: {e}. Using fallback stations.")
-        return {
-            "AM.R0BD5": {"lat": 28.18, "lon": 83.60, "elev": 785.0, "dist_km": gps2dist_azimuth(28.18, 83.60, epi_lat, epi_lon)[0] / 1000},
-            "AM.R0CEA": {"lat": 28.23, "lon": 83.92, "elev": 787.0, "dist_km": gps2dist_azimuth(28.23, 83.92, epi_lat, epi_lon)[0] / 1000}
-        }
\ No newline at end of file
+def fetch_station_metadata(epi_lat, epi_lon, max_radius_km=None, max_stations=None):
+    """
+    Returns metadata for the cached inventory's stations around the epicenter, with distances and azimuths.
+
+    Args:
+        max_radius_km (float): Only stations within this distance. Defaults to STATION_MAX_RADIUS_KM; 0 for no limit.
+        max_stations (int): Only this many nearest stations. Defaults to STATION_MAX_COUNT; 0 for no limit.
+    """
+    inventory = load_inventory()
+    max_radius_km = DEFAULT_MAX_RADIUS_KM if max_radius_km is None else max_radius_km
+    max_stations = DEFAULT_MAX_STATIONS if max_stations is None else max_stations
+    rows = inventory.select(epi_lat, epi_lon, max_radius_km, max_stations)
+    station_metadata = inventory.station_metadata(epi_lat, epi_lon, rows)
+    print(f"Selected {len(station_metadata)} of {len(inventory)} stations from the {inventory.source} station inventory"
+          + (f" within {max_radius_km:g} km" if max_radius_km else "")
+          + (f" (at most {max_stations})" if max_stations else ""))
+    return station_metadata
+
+def nearby_station_codes(epi_lat, epi_lon, max_radius_km=None, max_stations=None):
+    """Returns the 'NET.STA' codes fetch_station_metadata would select for the epicenter, nearest first."""
+    return list(fetch_station_metadata(epi_lat, epi_lon, max_radius_km, max_stations))
@@ -0,0 +1,41 @@
+# src/component/paths.py
+import os
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+ASSETS_DIR = os.path.join(ROOT_DIR, 'assets')
+OUTPUT_DIR = os.path.join(ROOT_DIR, 'Output')
+
+def event_folder_name(earthquake_name, magnitude):
+    """Returns the '<name>_<magnitude>' folder name shared by the assets and Output directories."""
+    return f"{earthquake_name}_{float(magnitude)}"
+
+def event_paths(earthquake_name, magnitude, output_dir=None):
+    """
+    Builds the input folder and output file paths for one event.
+
+    Args:
+        earthquake_name (str): Name of the earthquake event.
+        magnitude (float): Magnitude of the earthquake.
+        output_dir (str): Optional output directory. Defaults to Output/<name>_<magnitude>.
+
+    Returns:
+        dict: 'folder_path', 'output_dir', 'output_pdf', 'map_pdf', 'record_section_pdf', 'spectra_pdf', 'output_csv',
+            'peaks_csv', 'spectra_npz', 'run_report', 'waveform_store', 'page_previews' and 'waveform_tiles'.
+    """
+    folder_name = event_folder_name(earthquake_name, magnitude)
+    output_dir = output_dir or os.path.join(OUTPUT_DIR, folder_name)
+    return {
+        "folder_path": os.path.join(ASSETS_DIR, folder_name),
+        "output_dir": output_dir,
+        "output_pdf": os.path.join(output_dir, f"{earthquake_name}_velocity_um_per_s.pdf"),
+        "map_pdf": os.path.join(output_dir, f"{earthquake_name}_stations_map.pdf"),
+        "record_section_pdf": os.path.join(output_dir, f"{earthquake_name}_record_section.pdf"),
+        "spectra_pdf": os.path.join(output_dir, f"{earthquake_name}_spectra.pdf"),
+        "output_csv": os.path.join(output_dir, "nepal_stations.csv"),
+        "peaks_csv": os.path.join(output_dir, "station_peaks.csv"),
+        "spectra_npz": os.path.join(output_dir, "spectra.npz"),
+        "run_report": os.path.join(output_dir, "run_report.json"),
+        "waveform_store": os.path.join(output_dir, "waveforms"),
+        "page_previews": os.path.join(output_dir, "pages"),
+        "waveform_tiles": os.path.join(output_dir, "tiles"),
+    }
@@ -1,66 +1,227 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_pdf import PdfPages
+from .decimation import axes_pixel_width, minmax_envelope
 
-def create_velocity_plots(traces_with_dist, station_metadata, output_pdf, gain, plots_per_page, nrows, ncols, figsize, epi_mag):
-    with PdfPages(output_pdf) as pdf:
-        # Sort traces by distance for ascending order
-        traces_with_dist.sort(key=lambda x: x[1])
-        # Create a figure and a set of subplots, using constrained_layout for automatic spacing
-        fig, axes = plt.subplots(nrows, ncols, figsize=figsize, constrained_layout=True)
-        axes = axes.flatten() # Flatten the axes array for easy iteration
-        plot_idx = 0
-
-        for tr, dist_km in traces_with_dist:
-            try:
-                # Pre-processing: remove linear trend and mean
-                tr.detrend("linear")
-                tr.detrend("demean")
-                # Convert data from nm/s to µm/s (micrometers per second)
-                # Assuming gain converts raw counts to nm/s, so dividing by gain and multiplying by 1e6 (nm to µm)
-                tr.data = (tr.data / gain) * 1e6 
-                # Get time values in Matplotlib's date format
-                times = tr.times("matplotlib")
-
-                # Check if current page is full, save and start new page if needed
-                if plot_idx >= plots_per_page:
-                    pdf.savefig(fig) # Save the current page
-                    plt.close(fig) # Close the current figure to free memory
-                    # Create a new figure and subplots for the next page
-                    fig, axes = plt.subplots(nrows, ncols, figsize=figsize, constrained_layout=True)
-                    axes = axes.flatten()
-                    plot_idx = 0 # Reset plot index for the new page
-
-                # Get the current subplot axis
-                ax = axes[plot_idx]
-                # Plot the trace data
-                ax.plot_date(times, tr.data, 'k-', linewidth=0.5)
-                
-                # Get station metadata using the station code from the trace ID
-                station_code = tr.stats.network + "." + tr.stats.station
-                meta = station_metadata[station_code]
-                
-                # Set subplot title with trace ID, date, distance, and plot number
-                ax.set_title(f"{tr.id} — {tr.stats.starttime.date}\nDist: {meta['dist_km']:.1f}km (#{plot_idx + 1})", fontsize=8)
-                ax.set_ylabel("Velocity (µm/s)", fontsize=6)
-                ax.set_xlabel("Time (UTC)", fontsize=6)
-                ax.grid(True) # Add grid lines
-                ax.tick_params(axis='both', which='major', labelsize=5) # Adjust tick label size
-                
-                # Remove fig.autofmt_xdate() as it conflicts with constrained_layout=True
-                # fig.autofmt_xdate() 
-                
-                plot_idx += 1 # Increment plot index
-                print(f"Plotted trace: {tr.id} at distance {dist_km:.1f}km")
-            except Exception as e:
-                print(f"Error plotting trace {tr.id}: {e}")
-                continue
-
-        # After the loop, save any remaining plots on the last page
-        if plot_idx > 0:
-            # Hide any unused subplots on the last page
-            for i in range(plot_idx, nrows * ncols):
-                axes[i].set_visible(False)
-            pdf.savefig(fig) # Save the final page
-            plt.close(fig) # Close the figure
-        print(f"Plots saved to {output_pdf}")
+try:
+    from pypdf import PdfWriter
+except ImportError:  # Pages are then rendered one after another in this process
+    PdfWriter = None
 
+try:
+    from PIL import Image, features
+    WEBP_PREVIEWS = features.check('webp')
+except ImportError:  # Previews are then PNG only
+    WEBP_PREVIEWS = False
+
+SECONDS_PER_DAY = 86400.0
+# Resolution of the page previews shown on the web page instead of the PDFs (about 410 x 580 px for A4)
+PREVIEW_DPI = 50
+
+def trace_plot_data(tr, n_bins, full_resolution=False):
+    """
+    Returns (times, values) to draw for a trace, with times in Matplotlib date units.
+
+    Unless full_resolution is set, the trace is reduced to a min/max envelope of n_bins bins, one per
+    pixel of the panel width, so the number of points drawn does not grow with the window length or
+    sample rate.
+    """
+    if full_resolution:
+        return tr.times("matplotlib"), tr.data
+    positions, values = minmax_envelope(tr.data, n_bins)
+    times = tr.stats.starttime.matplotlib_date + positions * (tr.stats.delta / SECONDS_PER_DAY)
+    return times, values
+
+def new_page(nrows, ncols, figsize):
+    """Creates an empty page figure and returns it with its flattened array of panel axes."""
+    # Create a figure and a set of subplots, using constrained_layout for automatic spacing
+    fig, axes = plt.subplots(nrows, ncols, figsize=figsize, constrained_layout=True)
+    return fig, axes.flatten() # Flatten the axes array for easy iteration
+
+def panel_width(nrows, ncols, figsize):
+    """Returns the width in pixels of a panel on a new page, which sets the bins of the decimated traces."""
+    fig, axes = new_page(nrows, ncols, figsize)
+    width = axes_pixel_width(axes[0])
+    plt.close(fig)
+    return width
+
+def prepare_panel(tr, dist_km, meta, n_bins, full_resolution=False):
+    """
+    Returns what draw_panel needs to draw a trace: its id, distance, title, and the decimated times and values.
+
+    Raises if the trace cannot be drawn, so callers can leave it out before panels are numbered.
+    """
+    # Get time values in Matplotlib's date format, decimated to the panel width unless full resolution is requested
+    times, values = trace_plot_data(tr, n_bins, full_resolution)
+    return {"id": tr.id, "dist_km": dist_km, "times": times, "values": values,
+            "title": f"{tr.id} — {tr.stats.starttime.date}\nDist: {meta['dist_km']:.1f}km"}
+
+def prepare_panels(traces_with_dist, station_metadata, n_bins, full_resolution=False):
+    """Prepares the panels of distance-sorted traces, leaving out those without metadata or that cannot be drawn."""
+    panels = []
+    for tr, dist_km in traces_with_dist:
+        station_code = tr.stats.network + "." + tr.stats.station
+        if station_code not in station_metadata:
+            print(f"Error plotting trace {tr.id}: no metadata for {station_code}")
+            continue
+        try:
+            panels.append(prepare_panel(tr, dist_km, station_metadata[station_code], n_bins, full_resolution))
+        except Exception as e:
+            print(f"Error plotting trace {tr.id}: {e}")
+    return panels
+
+def draw_panel(ax, panel, plot_idx):
+    """Draws one prepared trace (see prepare_panel) into its panel."""
+    try:
+        # Plot the trace data against Matplotlib dates (ax.plot_date is deprecated)
+        ax.xaxis_date()
+        ax.plot(panel["times"], panel["values"], 'k-', linewidth=0.5)
+
+        # Set subplot title with trace ID, date, distance, and plot number
+        ax.set_title(f"{panel['title']} (#{plot_idx + 1})", fontsize=8)
+        ax.set_ylabel("Velocity (µm/s)", fontsize=6)
+        ax.set_xlabel("Time (UTC)", fontsize=6)
+        ax.grid(True) # Add grid lines
+        ax.tick_params(axis='both', which='major', labelsize=5) # Adjust tick label size
+
+        # Remove fig.autofmt_xdate() as it conflicts with constrained_layout=True
+        # fig.autofmt_xdate()
+        print(f"Plotted trace: {panel['id']} at distance {panel['dist_km']:.1f}km")
+    except Exception as e:
+        print(f"Error plotting trace {panel['id']}: {e}")
+        ax.set_visible(False)
+
+def hide_unused_panels(axes, n_used):
+    """Hides any unused subplots on the last page."""
+    for i in range(n_used, len(axes)):
+        axes[i].set_visible(False)
+
+def draw_page(page_items, nrows, ncols, figsize):
+    """
+    Draws one page of velocity panels and returns the figure.
+
+    Args:
+        page_items (list): Up to nrows * ncols panels from prepare_panel, nearest first.
+    """
+    fig, axes = new_page(nrows, ncols, figsize)
+    for plot_idx, panel in enumerate(page_items):
+        draw_panel(axes[plot_idx], panel, plot_idx)
+    hide_unused_panels(axes, len(page_items))
+    return fig
+
+def page_preview_path(page_previews, number, product="velocity"):
+    """Returns the preview PNG path of page number (1-based) of a product's PDF in the page_previews directory."""
+    return os.path.join(page_previews, f"{product}_{number:04d}.png")
+
+def save_page_preview(fig, preview_png):
+    """
+    Saves a small PNG of a page figure, plus a lossless WebP of the same pixels when Pillow supports it.
+
+    The WebP is encoded from the PNG rather than drawn again, and is about a third of its size.
+    """
+    fig.savefig(preview_png, format='png', dpi=PREVIEW_DPI)
+    if WEBP_PREVIEWS:
+        with Image.open(preview_png) as image:
+            image.save(os.path.splitext(preview_png)[0] + ".webp", format='WEBP', lossless=True)
+
+def save_figure_previews(figures, page_previews, product):
+    """Saves the previews of a product's page figures, in page order, when page_previews is set."""
+    if not page_previews:
+        return
+    os.makedirs(page_previews, exist_ok=True)
+    for number, fig in enumerate(figures, 1):
+        save_page_preview(fig, page_preview_path(page_previews, number, product))
+
+def page_event(number, panels, preview_png=None):
+    """Returns the data of the 'page' progress event for a rendered page of (trace_id, dist_km) panels."""
+    return {"page": number, "traces": [trace_id for trace_id, _ in panels],
+            "dist_km": [round(float(dist_km), 3) for _, dist_km in panels],
+            "preview": os.path.basename(preview_png) if preview_png else None}
+
+def render_page_file(page_items, page_pdf, nrows, ncols, figsize, preview_png=None):
+    """Draws one page and saves it as a single-page PDF (and optional PNG preview); runs inside the page rendering pool."""
+    fig = draw_page(page_items, nrows, ncols, figsize)
+    fig.savefig(page_pdf, format='pdf')
+    if preview_png:
+        save_page_preview(fig, preview_png)
+    plt.close(fig)
+    return page_pdf
+
+def paginate(panels, plots_per_page):
+    """Splits distance-sorted panels into pages."""
+    return [panels[i:i + plots_per_page] for i in range(0, len(panels), plots_per_page)]
+
+def create_velocity_plots(traces_with_dist, station_metadata, output_pdf, gain, plots_per_page, nrows, ncols, figsize, epi_mag, preprocessed=False, full_resolution=False, render_workers=None,
+                          page_previews=None, page_callback=None):
+    """
+    Writes the distance-ordered velocity PDF, one page of nrows x ncols panels at a time.
+
+    Traces are decimated and checked before they are assigned to pages, so one that cannot be drawn is
+    left out without using up a panel, and the panels are numbered as in a serial run. Pages are rendered
+    in parallel in a process pool (render_workers, default the CPU count) and merged in page order; with a
+    single worker, a single page or without pypdf they are rendered in-process.
+    With page_previews set, a PNG preview of every page is saved there as well, and page_callback(data)
+    is called with page_event's data as each page is finished, nearest stations first.
+    """
+    # Sort traces by distance for ascending order
+    traces_with_dist.sort(key=lambda x: x[1])
+    if not preprocessed:
+        for tr, _ in traces_with_dist:
+            # Pre-processing: remove linear trend and mean
+            tr.detrend("linear")
+            tr.detrend("demean")
+            # Convert data from nm/s to µm/s (micrometers per second)
+            # Assuming gain converts raw counts to nm/s, so dividing by gain and multiplying by 1e6 (nm to µm)
+            tr.data = (tr.data / gain) * 1e6
+    panels = prepare_panels(traces_with_dist, station_metadata, panel_width(nrows, ncols, figsize), full_resolution)
+    pages = paginate(panels, plots_per_page)
+    previews = [None] * len(pages)
+    if page_previews:
+        os.makedirs(page_previews, exist_ok=True)
+        previews = [page_preview_path(page_previews, number) for number in range(1, len(pages) + 1)]
+
+    def page_done(index):
+        if page_callback is not None:
+            page_callback(page_event(index + 1, [(panel["id"], panel["dist_km"]) for panel in pages[index]], previews[index]))
+
+    if render_workers is None:
+        render_workers = os.cpu_count() or 1
+    render_workers = max(1, min(render_workers, len(pages)))
+    if render_workers > 1 and PdfWriter is not None:
+        render_pages_parallel(pages, output_pdf, nrows, ncols, figsize, render_workers, previews, page_done)
+    else:
+        with PdfPages(output_pdf) as pdf:
+            for index, page_items in enumerate(pages):
+                fig = draw_page(page_items, nrows, ncols, figsize)
+                pdf.savefig(fig) # Save the page
+                if previews[index]:
+                    save_page_preview(fig, previews[index])
+                plt.close(fig) # Close the figure to free memory
+                page_done(index)
+    print(f"Plots saved to {output_pdf}")
+
+def render_pages_parallel(pages, output_pdf, nrows, ncols, figsize, render_workers, previews=None, page_done=None):
+    """Renders every page to its own PDF in a process pool and concatenates them into output_pdf; page_done(index) follows each page in order."""
+    page_dir = tempfile.mkdtemp(prefix='velocity_pages_', dir=os.path.dirname(os.path.abspath(output_pdf)))
+    try:
+        page_paths = [os.path.join(page_dir, f"page_{number:04d}.pdf") for number in range(1, len(pages) + 1)]
+        n = len(pages)
+        previews = previews or [None] * n
+        rendered = []
+        with ProcessPoolExecutor(max_workers=render_workers) as executor:
+            for index, page_path in enumerate(executor.map(render_page_file, pages, page_paths, [nrows] * n, [ncols] * n,
+                                                           [figsize] * n, previews)):
+                rendered.append(page_path)
+                if page_done is not None:
+                    page_done(index)
+        writer = PdfWriter()
+        for page_path in rendered:
+            writer.append(page_path)
+        with open(output_pdf, 'wb') as f:
+            writer.write(f)
+        writer.close()
+    finally:
+        shutil.rmtree(page_dir, ignore_errors=True)
@@ -0,0 +1,106 @@
+# src/component/preprocessing.py
+import numpy as np
+
+VELOCITY_UNITS = "µm/s"
+
+class TraceBatch:
+    """
+    Preprocessed traces whose samples live in one contiguous buffer.
+
+    Each trace's `data` is a view into `data`, starting at `offsets[i]` with `npts[i]` samples,
+    so plots, exports and stores can share the same converted samples without copying them.
+    """
+
+    def __init__(self, traces_with_dist, data, offsets, npts, units=VELOCITY_UNITS):
+        self.traces_with_dist = traces_with_dist
+        self.data = data
+        self.offsets = offsets
+        self.npts = npts
+        self.units = units
+
+    def __len__(self):
+        return len(self.traces_with_dist)
+
+    def __iter__(self):
+        return iter(self.traces_with_dist)
+
+def detrend_linear(data, offsets, npts):
+    """
+    Removes a least-squares line from every segment of the flat buffer in place.
+
+    The fit is applied to one segment view at a time, so the scratch memory is two arrays the length
+    of the longest trace rather than several copies of the whole buffer.
+    """
+    if len(npts) == 0:
+        return
+    x = np.arange(int(npts.max()), dtype=np.float64)
+    scratch = np.empty(len(x), dtype=data.dtype)
+    for offset, n in zip(offsets, npts):
+        segment = data[offset:offset + n]
+        count = float(n)  # Sums of x and x**2 in closed form; float, as n**4 overflows int64 for long traces
+        sum_x = count * (count - 1) / 2
+        denominator = count * (count - 1) * count * (2 * count - 1) / 6 - sum_x ** 2
+        sum_y = segment.sum(dtype=np.float64)
+        slope = (count * np.dot(segment, x[:n]) - sum_x * sum_y) / denominator if denominator != 0 else 0.0
+        intercept = (sum_y - slope * sum_x) / count
+        np.multiply(x[:n], slope, out=scratch[:n], casting='unsafe')
+        segment -= scratch[:n]
+        segment -= intercept
+
+def demean(data, offsets, npts):
+    """Removes the mean of every segment of the flat buffer in place."""
+    for offset, n in zip(offsets, npts):
+        segment = data[offset:offset + n]
+        segment -= segment.sum(dtype=np.float64) / n
+
+def preprocess_traces(traces_with_dist, gain, dtype=np.float64, inventory=None):
+    """
+    Detrends, demeans and converts all traces to velocity in µm/s in one batch.
+
+    The raw samples are copied once into a single buffer of the requested dtype; every later step
+    works on that buffer in place across all traces, and each Trace's data becomes a view into it.
+
+    Args:
+        traces_with_dist (list): (Trace, dist_km) tuples as returned by process_seismic_data.
+        gain (float): Counts per nm/s, used when no response inventory is given.
+        dtype: np.float32 or np.float64.
+        inventory (obspy.Inventory): Optional response inventory. When given, the instrument response is
+            removed per trace (output velocity) instead of dividing by a constant gain.
+
+    Returns:
+        TraceBatch: The preprocessed traces; traces without samples are dropped.
+    """
+    kept = []
+    for tr, dist_km in traces_with_dist:
+        if tr.stats.npts > 0:
+            kept.append((tr, dist_km))
+        else:
+            print(f"Skipping empty trace {tr.id}")
+    npts = np.array([tr.stats.npts for tr, _ in kept], dtype=np.int64)
+    offsets = np.zeros(len(kept), dtype=np.int64)
+    if len(kept) > 1:
+        np.cumsum(npts[:-1], out=offsets[1:])
+    data = np.empty(int(npts.sum()), dtype=dtype)
+    for (tr, _), offset, n in zip(kept, offsets, npts):
+        data[offset:offset + n] = tr.data
+        tr.data = data[offset:offset + n]
+    if not kept:
+        return TraceBatch(kept, data, offsets, npts)
+
+    detrend_linear(data, offsets, npts)
+    demean(data, offsets, npts)
+
+    if inventory is not None:
+        # Response removal is per trace; results are written back into the shared buffer (m/s -> µm/s)
+        for (tr, _), offset, n in zip(kept, offsets, npts):
+            tr.remove_response(inventory=inventory, output="VEL")
+            data[offset:offset + n] = tr.data
+            tr.data = data[offset:offset + n]
+        data *= 1e6
+    else:
+        # Convert from counts to nm/s with the gain, then from nm/s to µm/s
+        data *= 1e6 / gain
+
+    for tr, _ in kept:
+        tr.stats.setdefault("processing", []).append(f"preprocess_traces: detrend(linear), demean, velocity in {VELOCITY_UNITS}")
+    return TraceBatch(kept, data, offsets, npts)
@@ -0,0 +1,136 @@
+# src/component/profiling.py
+import json
+import os
+import resource
+import sys
+import time
+
+REPORT_VERSION = 2
+
+def _cpu_seconds():
+    """CPU time of this process plus its finished child processes (reading and rendering pools)."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+def _maxrss_bytes(who):
+    """Lifetime peak resident set size from getrusage, in bytes."""
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(who).ru_maxrss * scale
+
+def _reset_peak_rss():
+    """
+    Resets this process's peak resident set size (VmHWM) to its current size, so the next reading covers
+    only what follows. Returns False where this is not supported (outside Linux).
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def _peak_rss_since_reset():
+    """VmHWM of this process in bytes: its peak resident set size since the last _reset_peak_rss()."""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) * 1024
+    raise OSError("VmHWM not found in /proc/self/status")
+
+class RunProfiler:
+    """
+    Records the wall and CPU time of each pipeline stage plus run-wide counters.
+
+    stage(name) ends the current stage and starts the next one, forwarding the name to progress_callback,
+    so it can stand in for the progress reporting calls in process_data.
+
+    Peak memory is measured per stage and per run on Linux by resetting the kernel's high-water mark, so a
+    long-lived warm worker does not report the peak of the largest job it ever ran. Elsewhere the
+    process's lifetime peak is reported and peak_rss_scope says so. Child processes cannot be reset, so
+    lifetime_peak_child_rss_bytes is the largest finished child of the process's whole life.
+    """
+
+    def __init__(self, progress_callback=None):
+        self.progress_callback = progress_callback
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._cpu_started = _cpu_seconds()
+        self.per_run_rss = _reset_peak_rss()
+        self._peak_rss = 0
+        self.stages = []
+        self.counters = {}
+        self._current = None
+
+    def _read_peak_rss(self, reset):
+        """Returns the peak RSS since the last reset (or the lifetime peak), folding it into the run's peak."""
+        if self.per_run_rss:
+            peak = _peak_rss_since_reset()
+            if reset:
+                _reset_peak_rss()
+        else:
+            peak = _maxrss_bytes(resource.RUSAGE_SELF)
+        self._peak_rss = max(self._peak_rss, peak)
+        return peak
+
+    def stage(self, name, data=None):
+        self._end_stage()
+        # Covers the time before the first stage; each stage then starts from a fresh high-water mark
+        self._read_peak_rss(reset=True)
+        self._current = {"stage": name, "_wall": time.perf_counter(), "_cpu": _cpu_seconds()}
+        if self.progress_callback is not None:
+            self.progress_callback(name, data)
+
+    def _end_stage(self):
+        if self._current is None:
+            return
+        current = self._current
+        self.stages.append({
+            "stage": current["stage"],
+            "wall_s": round(time.perf_counter() - current["_wall"], 6),
+            "cpu_s": round(_cpu_seconds() - current["_cpu"], 6),
+            "peak_rss_bytes": self._read_peak_rss(reset=False),
+        })
+        self._current = None
+
+    def event(self, name, data=None):
+        """Forwards a result event such as 'trace' or 'page' to progress_callback without starting a stage."""
+        if self.progress_callback is not None:
+            self.progress_callback(name, data)
+
+    def count(self, name, value):
+        """Adds value to a run-wide counter such as bytes_read, files, traces or samples."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def finish(self, status):
+        """Ends the last stage and returns the run report."""
+        self._end_stage()
+        self._read_peak_rss(reset=False)
+        return {
+            "version": REPORT_VERSION,
+            "status": status,
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "wall_s": round(time.perf_counter() - self._started, 6),
+            "cpu_s": round(_cpu_seconds() - self._cpu_started, 6),
+            "peak_rss_bytes": self._peak_rss,
+            "peak_rss_scope": "run" if self.per_run_rss else "process",
+            "lifetime_peak_child_rss_bytes": _maxrss_bytes(resource.RUSAGE_CHILDREN),
+            "stages": self.stages,
+            "counters": self.counters,
+        }
+
+def write_run_report(report, path):
+    """Writes a run report as JSON, replacing any previous report atomically."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
+
+def read_run_report(path):
+    """Returns the run report at path, or None if there is none."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
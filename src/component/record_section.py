@@ -0,0 +1,103 @@
+# src/component/record_section.py
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from .decimation import axes_pixel_width, minmax_envelope
+from .plot_creation import save_figure_previews
+
+def record_section_segments(traces_with_dist, origin_time, n_bins, amplitude_km, reduction_velocity=None, full_resolution=False):
+    """
+    Builds one polyline per trace for a record section.
+
+    Each trace is normalised to its own peak absolute amplitude, scaled to amplitude_km and offset
+    vertically by its distance. Times are seconds after origin_time, minus dist_km / reduction_velocity
+    when a reduction velocity (km/s) is given. Unless full_resolution is set, traces are reduced to
+    min/max envelopes of n_bins bins first.
+
+    Returns:
+        list: (N, 2) arrays of (time_s, distance_km) points, in the order of traces_with_dist.
+    """
+    segments = []
+    for tr, dist_km in traces_with_dist:
+        if tr.stats.npts == 0:
+            continue
+        if full_resolution:
+            positions, values = np.arange(tr.stats.npts, dtype=np.float64), tr.data
+        else:
+            positions, values = minmax_envelope(tr.data, n_bins)
+        peak = np.abs(values).max()
+        offset_s = tr.stats.starttime - origin_time
+        if reduction_velocity:
+            offset_s -= dist_km / reduction_velocity
+        segment = np.empty((len(values), 2), dtype=np.float64)
+        segment[:, 0] = positions * tr.stats.delta + offset_s
+        segment[:, 1] = values
+        if peak > 0:
+            segment[:, 1] *= amplitude_km / peak
+        segment[:, 1] += dist_km
+        segments.append(segment)
+    return segments
+
+def create_record_section(traces_with_dist, output_pdf, origin_time=None, reduction_velocity=None, epi_mag=None, figsize=(11.69, 8.27), full_resolution=False,
+                          page_previews=None):
+    """
+    Writes a record section: every trace on one shared time axis, offset vertically by epicentral distance.
+
+    All traces are drawn as a single LineCollection, so the cost of drawing grows with the number of
+    points rather than the number of stations.
+
+    Args:
+        traces_with_dist (list): (Trace, dist_km) tuples, e.g. the preprocessed traces.
+        output_pdf (str): Full path for the record section PDF file.
+        origin_time (UTCDateTime): Event origin time; defaults to the earliest trace start.
+        reduction_velocity (float): Optional reduction velocity in km/s; times become t - dist_km / v.
+        epi_mag (float): Magnitude shown in the title.
+        figsize (tuple): Figure size in inches (A4 landscape by default).
+        full_resolution (bool): Draw every sample instead of per-pixel min/max envelopes.
+        page_previews (str): Optional directory for a PNG/WebP preview of the page (section_0001).
+    """
+    traces_with_dist = sorted((item for item in traces_with_dist if item[0].stats.npts > 0), key=lambda x: x[1])
+    if not traces_with_dist:
+        print("Warning: No traces for the record section. Skipping it.")
+        return
+    if origin_time is None:
+        origin_time = min(tr.stats.starttime for tr, _ in traces_with_dist)
+
+    distances = np.array([dist_km for _, dist_km in traces_with_dist])
+    amplitude_km = record_section_amplitude(distances)
+    fig, ax = plt.subplots(figsize=figsize, constrained_layout=True)
+    segments = record_section_segments(traces_with_dist, origin_time, axes_pixel_width(ax), amplitude_km,
+                                       reduction_velocity, full_resolution)
+    save_record_section(fig, ax, segments, distances, amplitude_km, output_pdf, origin_time, reduction_velocity, epi_mag,
+                        page_previews)
+
+def record_section_amplitude(distances):
+    """Returns the height in km of a trace at its peak, given the sorted station distances."""
+    # Half the median gap between neighbouring stations keeps most traces from overlapping
+    gaps = np.diff(distances)
+    gaps = gaps[gaps > 0]
+    spread = distances[-1] - distances[0]
+    amplitude_km = 0.5 * (np.median(gaps) if len(gaps) else max(spread, 1.0))
+    return max(amplitude_km, 0.01 * max(spread, 1.0))
+
+def save_record_section(fig, ax, segments, distances, amplitude_km, output_pdf, origin_time, reduction_velocity=None, epi_mag=None,
+                        page_previews=None):
+    """Draws the segments from record_section_segments() as one LineCollection, labels the axes and saves the PDF (and preview)."""
+    ax.add_collection(LineCollection(segments, colors='k', linewidths=0.4))
+    ax.autoscale_view()
+    ax.set_ylim(distances[0] - 2 * amplitude_km, distances[-1] + 2 * amplitude_km)
+
+    if reduction_velocity:
+        ax.set_xlabel(f"Reduced time t - Δ/{reduction_velocity:g} km/s (s after {origin_time.strftime('%Y-%m-%d %H:%M:%S')} UTC)")
+    else:
+        ax.set_xlabel(f"Time (s after {origin_time.strftime('%Y-%m-%d %H:%M:%S')} UTC)")
+    ax.set_ylabel("Epicentral distance (km)")
+    title = "Record section, traces normalised to their peak velocity"
+    if epi_mag is not None:
+        title = f"M{epi_mag} {title}"
+    ax.set_title(title)
+    ax.grid(True, linewidth=0.3)
+    fig.savefig(output_pdf, format='pdf')
+    save_figure_previews([fig], page_previews, "section")
+    plt.close(fig)
+    print(f"Record section of {len(segments)} traces saved to {output_pdf}")
@@ -0,0 +1,155 @@
+# src/component/result_cache.py
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from .paths import ASSETS_DIR
+
+RESULT_CACHE_DIR = os.path.join(ASSETS_DIR, 'cache', 'results')
+EVENTS_FILE = 'events.json'
+DEFAULT_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+CACHE_VERSION = 7  # Bump when a code change alters the generated products
+
+# (path, size, mtime_ns) -> sha256, so long-lived workers do not re-hash unchanged files
+_file_hashes = {}
+_file_hashes_lock = threading.Lock()
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """Returns the SHA-256 of a file's content, memoised on its size and modification time."""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _file_hashes_lock:
+        digest = _file_hashes.get(memo_key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        with _file_hashes_lock:
+            _file_hashes[memo_key] = digest
+    return digest
+
+def analysis_key(folder_path, params):
+    """
+    Returns the cache key of an analysis: a hash over the content of every .mseed file in folder_path
+    and the JSON-serialisable params (epicenter, magnitude, station metadata, plot settings).
+    """
+    files = sorted(file for file in os.listdir(folder_path) if file.lower().endswith(".mseed"))
+    spec = {
+        "version": CACHE_VERSION,
+        "inputs": [(file, hash_file(os.path.join(folder_path, file))) for file in files],
+        "params": params,
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+def lookup(key, outputs, cache_dir=RESULT_CACHE_DIR, directories=None):
+    """
+    Copies a cached result into place.
+
+    Args:
+        key (str): Key from analysis_key.
+        outputs (dict): Product name -> destination path, e.g. {'velocity_pdf': '/.../x.pdf'}.
+        directories (dict): Optional product name -> destination directory, for products made of a
+            varying number of files such as page previews. The destination is replaced.
+
+    Returns:
+        bool: True if every product was found and copied.
+    """
+    directories = directories or {}
+    entry = os.path.join(cache_dir, key)
+    sources = {name: os.path.join(entry, name) for name in outputs}
+    if not all(os.path.isfile(source) for source in sources.values()):
+        return False
+    if not all(os.path.isdir(os.path.join(entry, name)) for name in directories):
+        return False
+    try:
+        for name, destination in outputs.items():
+            shutil.copyfile(sources[name], destination)
+        for name, destination in directories.items():
+            shutil.rmtree(destination, ignore_errors=True)
+            shutil.copytree(os.path.join(entry, name), destination)
+    except OSError as e:
+        # The entry was evicted while it was being copied; the caller recomputes the products
+        print(f"Cached result {key[:12]} could not be restored: {e}")
+        return False
+    # The entry's modification time records its last use for eviction
+    os.utime(entry)
+    return True
+
+def read_events(key, cache_dir=RESULT_CACHE_DIR):
+    """Returns the [name, data] result events stored with a cached result, so a cache hit can send them again."""
+    try:
+        with open(os.path.join(cache_dir, key, EVENTS_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+def store(key, outputs, cache_dir=RESULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, directories=None, events=None):
+    """
+    Copies the generated products (and directories, see lookup) into the cache under key, then evicts old
+    entries beyond max_bytes. events is an optional list of [name, data] result events kept for read_events.
+
+    An existing entry under key is never removed, since a lookup may be copying from it: products it
+    lacks are moved into it one by one and the ones it has are kept, as equal keys mean equal products.
+    """
+    directories = directories or {}
+    if not all(os.path.isfile(path) for path in outputs.values()):
+        return
+    if not all(os.path.isdir(path) for path in directories.values()):
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    entry = os.path.join(cache_dir, key)
+    tmp_entry = f"{entry}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_entry, ignore_errors=True)
+    os.makedirs(tmp_entry)
+    for name, path in outputs.items():
+        shutil.copyfile(path, os.path.join(tmp_entry, name))
+    for name, path in directories.items():
+        shutil.copytree(path, os.path.join(tmp_entry, name))
+    if events is not None:
+        with open(os.path.join(tmp_entry, EVENTS_FILE), 'w') as f:
+            json.dump(events, f, default=str)
+    try:
+        os.rename(tmp_entry, entry)
+    except OSError:
+        # An earlier run, or another worker, stored this key first
+        for name in os.listdir(tmp_entry):
+            if not os.path.exists(os.path.join(entry, name)):
+                try:
+                    os.rename(os.path.join(tmp_entry, name), os.path.join(entry, name))
+                except OSError:
+                    pass  # Moved in concurrently, or the entry was evicted
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+    evict(cache_dir, max_bytes)
+
+def entry_size(entry):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(entry) for name in names)
+
+def evict(cache_dir=RESULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+    """Removes the least recently used entries until the cache holds at most max_bytes."""
+    entries = []
+    for name in os.listdir(cache_dir):
+        entry = os.path.join(cache_dir, name)
+        if os.path.isdir(entry) and not name.endswith('.tmp'):
+            try:
+                entries.append((os.path.getmtime(entry), entry_size(entry), entry))
+            except OSError:
+                continue  # Removed concurrently
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+        print(f"Evicted cached result {os.path.basename(entry)} ({size / 1e6:.1f} MB)")
+
+def cache_stats(cache_dir=RESULT_CACHE_DIR):
+    """Returns the number of entries and total bytes held by the cache."""
+    if not os.path.isdir(cache_dir):
+        return {"entries": 0, "bytes": 0, "checked_at": time.time()}
+    entries = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if not name.endswith('.tmp')]
+    entries = [entry for entry in entries if os.path.isdir(entry)]
+    return {"entries": len(entries), "bytes": sum(entry_size(entry) for entry in entries), "checked_at": time.time()}
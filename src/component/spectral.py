@@ -0,0 +1,259 @@
+# src/component/spectral.py
+import math
+import os
+import warnings
+from fractions import Fraction
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.collections import LineCollection
+from matplotlib.ticker import FixedLocator, NullLocator
+from scipy.signal import get_window, resample_poly
+from .plot_creation import page_preview_path, save_page_preview
+
+PSD_SEGMENT_S = 20.0  # Welch segment length; sets the PSD frequency resolution
+SPECTROGRAM_SEGMENT_S = 2.0
+SPECTROGRAM_MAX_COLUMNS = 512  # Neighbouring STFT columns are averaged down to at most this many
+TRACE_CHUNK = 64  # Traces transformed per FFT call, bounding the size of the segment arrays
+WINDOW = 'hann'
+
+def _segment_length(seconds, sampling_rate):
+    """Returns the power of two closest to seconds * sampling_rate samples."""
+    return 2 ** max(4, int(round(math.log2(seconds * sampling_rate))))
+
+def equal_length_matrix(batch):
+    """
+    Puts the traces of a TraceBatch on one sampling rate and into the rows of one zero-padded matrix.
+
+    Traces sampled at another rate than the most common one are resampled to it with a polyphase filter.
+
+    Returns:
+        tuple: (matrix of shape (traces, max npts), valid samples per row, sampling_rate).
+    """
+    rates = np.array([tr.stats.sampling_rate for tr, _ in batch.traces_with_dist])
+    values, counts = np.unique(rates, return_counts=True)
+    sampling_rate = float(values[np.argmax(counts)])
+    if np.all(rates == sampling_rate):
+        npts = batch.npts.astype(np.int64)
+        matrix = np.zeros((len(batch), int(npts.max())), dtype=np.float64)
+        # Row-major order of the mask matches the concatenated segments of the flat buffer
+        matrix[np.arange(matrix.shape[1]) < npts[:, None]] = batch.data
+        return matrix, npts, sampling_rate
+
+    rows = []
+    for (tr, _), rate in zip(batch.traces_with_dist, rates):
+        if rate == sampling_rate:
+            rows.append(np.asarray(tr.data, dtype=np.float64))
+            continue
+        ratio = Fraction(sampling_rate / rate).limit_denominator(1000)
+        rows.append(resample_poly(np.asarray(tr.data, dtype=np.float64), ratio.numerator, ratio.denominator))
+    npts = np.array([len(row) for row in rows], dtype=np.int64)
+    matrix = np.zeros((len(rows), int(npts.max())), dtype=np.float64)
+    for i, row in enumerate(rows):
+        matrix[i, :len(row)] = row
+    return matrix, npts, sampling_rate
+
+def segment_power(matrix, npts, sampling_rate, nperseg, step):
+    """
+    Returns the one-sided power spectral density of every segment of every row, and which segments are valid.
+
+    Segments are demeaned and Hann-windowed, as scipy.signal.welch does with detrend='constant';
+    a segment is valid when it lies entirely within its row's npts samples.
+
+    Returns:
+        tuple: (freqs, power of shape (traces, segments, freqs), valid mask of shape (traces, segments)).
+    """
+    window = get_window(WINDOW, nperseg)
+    scale = 1.0 / (sampling_rate * np.sum(window ** 2))
+    n_segments = max(0, (matrix.shape[1] - nperseg) // step + 1)
+    starts = np.arange(n_segments) * step
+    valid = starts[None, :] + nperseg <= npts[:, None]
+    freqs = np.fft.rfftfreq(nperseg, 1.0 / sampling_rate)
+    power = np.empty((matrix.shape[0], n_segments, len(freqs)), dtype=np.float32)
+    if n_segments == 0:
+        return freqs, power, valid
+    views = np.lib.stride_tricks.sliding_window_view(matrix, nperseg, axis=1)[:, ::step][:, :n_segments]
+    for first in range(0, matrix.shape[0], TRACE_CHUNK):
+        segments = views[first:first + TRACE_CHUNK]
+        segments = (segments - segments.mean(axis=-1, keepdims=True)) * window
+        spectrum = np.fft.rfft(segments, axis=-1)
+        chunk = (spectrum.real ** 2 + spectrum.imag ** 2) * scale
+        # One-sided: double every bin except DC (and Nyquist for even segment lengths)
+        chunk[..., 1:None if nperseg % 2 else -1] *= 2
+        power[first:first + TRACE_CHUNK] = chunk
+    return freqs, power, valid
+
+def compute_spectra(batch, psd_segment_s=PSD_SEGMENT_S, spectrogram_segment_s=SPECTROGRAM_SEGMENT_S,
+                    max_columns=SPECTROGRAM_MAX_COLUMNS):
+    """
+    Computes a Welch PSD and an STFT spectrogram for every trace of a TraceBatch in batched FFT calls.
+
+    Welch PSDs average the valid segments of psd_segment_s with 50% overlap; spectrograms use
+    spectrogram_segment_s segments with 50% overlap, averaged in time to at most max_columns columns.
+    Values are in dB relative to 1 (µm/s)²/Hz; traces shorter than a segment get NaN.
+
+    Returns:
+        dict: 'trace_ids', 'station_codes', 'dist_km', 'starttimes', 'sampling_rate', 'psd_freqs',
+            'psd_db' (traces, freqs), 'spectrogram_freqs', 'spectrogram_times' (seconds after each
+            trace's start) and 'spectrogram_db' (traces, columns, freqs; float16).
+    """
+    matrix, npts, sampling_rate = equal_length_matrix(batch)
+
+    nperseg = _segment_length(psd_segment_s, sampling_rate)
+    psd_freqs, power, valid = segment_power(matrix, npts, sampling_rate, nperseg, nperseg // 2)
+    counts = valid.sum(axis=1)
+    psd = np.einsum('tsf,ts->tf', power, valid.astype(np.float32))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        psd_db = 10 * np.log10(psd / counts[:, None])
+    del power
+
+    nperseg = _segment_length(spectrogram_segment_s, sampling_rate)
+    step = nperseg // 2
+    spec_freqs, power, valid = segment_power(matrix, npts, sampling_rate, nperseg, step)
+    power[~valid] = np.nan
+    # Average groups of neighbouring columns so long windows keep a bounded size
+    group = max(1, math.ceil(power.shape[1] / max_columns))
+    n_columns = math.ceil(power.shape[1] / group)
+    padded = np.full((power.shape[0], n_columns * group, power.shape[2]), np.nan, dtype=np.float32)
+    padded[:, :power.shape[1]] = power
+    with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # Columns without any valid segment become NaN
+        spectrogram = np.nanmean(padded.reshape(power.shape[0], n_columns, group, power.shape[2]), axis=2)
+        spectrogram_db = 10 * np.log10(spectrogram)
+    centres = (np.arange(n_columns * group) * step + nperseg / 2) / sampling_rate
+    spec_times = centres.reshape(n_columns, group).mean(axis=1)
+
+    traces = [tr for tr, _ in batch.traces_with_dist]
+    return {
+        "trace_ids": np.array([tr.id for tr in traces]),
+        "station_codes": np.array([tr.stats.network + "." + tr.stats.station for tr in traces]),
+        "dist_km": np.array([dist_km for _, dist_km in batch.traces_with_dist], dtype=np.float64),
+        "starttimes": np.array([str(tr.stats.starttime) for tr in traces]),
+        "sampling_rate": sampling_rate,
+        "psd_freqs": psd_freqs,
+        "psd_db": psd_db.astype(np.float32),
+        "spectrogram_freqs": spec_freqs,
+        "spectrogram_times": spec_times,
+        # float16 keeps about 0.06 dB of precision at typical levels, at half the size
+        "spectrogram_db": spectrogram_db.astype(np.float16),
+    }
+
+def write_spectra(spectra, output_npz):
+    """Saves the spectra as a compressed .npz file (see compute_spectra for the arrays it holds)."""
+    np.savez_compressed(output_npz, units=np.array("dB re 1 (µm/s)^2/Hz"), **spectra)
+    print(f"Saved spectra of {len(spectra['trace_ids'])} traces to {output_npz}")
+
+def read_spectra(spectra_npz):
+    """Loads a spectra .npz file written by write_spectra into a dict of arrays."""
+    with np.load(spectra_npz) as data:
+        return {key: data[key] for key in data.files}
+
+def _value_limits(values, upper=99.5):
+    """Returns the 2nd and upper percentiles of the finite values, or (None, None) if there are none."""
+    finite = values[np.isfinite(values)]
+    if not len(finite):
+        return None, None
+    return np.percentile(finite.astype(np.float64), [2, upper])
+
+def draw_spectral_page(spectra, page, first, plots_per_page, figsize, psd_mask, decades, color_limits, psd_limits):
+    """
+    Draws one page of spectrogram and PSD rows and returns the figure.
+
+    Panels are placed on a fixed grid with shared axes, one colour bar and fixed decade ticks: the layout
+    and tick searches of per-panel colour bars and logarithmic locators would cost more than the drawing.
+    """
+    fig = plt.figure(figsize=figsize)
+    grid = fig.add_gridspec(plots_per_page, 3, width_ratios=[30, 10, 0.6], left=0.08, right=0.95, top=0.96,
+                            bottom=0.04, wspace=0.3, hspace=0.55)
+    spec_freqs, spec_times = spectra["spectrogram_freqs"], spectra["spectrogram_times"]
+    if len(spec_times) > 1:
+        time_extent = (spec_times[0], spec_times[-1])
+    elif len(spec_times) == 1:
+        # One column is centred on the first segment, which starts at the trace start
+        time_extent = (0.0, 2 * spec_times[0])
+    else:
+        # No trace is as long as one spectrogram segment; the rows show the PSD only
+        time_extent = None
+    log_freqs = spectra["psd_freqs"][psd_mask]
+    ax_spec0 = ax_psd0 = image = None
+    for row, i in enumerate(page):
+        ax_spec = fig.add_subplot(grid[row, 0], sharex=ax_spec0, sharey=ax_spec0)
+        ax_psd = fig.add_subplot(grid[row, 1], sharex=ax_psd0, sharey=ax_psd0)
+        ax_spec.set_title(f"{spectra['trace_ids'][i]} — {spectra['starttimes'][i][:19]}\n"
+                          f"Dist: {spectra['dist_km'][i]:.1f}km (#{first + row + 1})", fontsize=8)
+        if time_extent is not None:
+            image = ax_spec.imshow(spectra["spectrogram_db"][i].T, origin='lower', aspect='auto', cmap='magma',
+                                   vmin=color_limits[0], vmax=color_limits[1], interpolation='nearest',
+                                   extent=(*time_extent, spec_freqs[0], spec_freqs[-1]))
+            ax_spec.set_ylabel("Frequency (Hz)", fontsize=6)
+            ax_spec.set_xlabel("Time after trace start (s)", fontsize=6)
+            ax_spec.tick_params(axis='both', which='major', labelsize=5)
+        else:
+            ax_spec.text(0.5, 0.5, "Trace shorter than one spectrogram segment", ha='center', va='center',
+                         transform=ax_spec.transAxes, fontsize=7)
+            ax_spec.set_axis_off()
+        ax_psd.plot(log_freqs, spectra["psd_db"][i, psd_mask], 'k-', linewidth=0.6)
+        if ax_psd0 is None:
+            ax_psd.set_xscale('log')
+            ax_psd.xaxis.set_major_locator(FixedLocator(decades))
+            ax_psd.xaxis.set_minor_locator(NullLocator())
+            ax_psd.set_xlim(log_freqs[0], log_freqs[-1])
+            if psd_limits[0] is not None:
+                ax_psd.set_ylim(psd_limits[0] - 5, psd_limits[1] + 5)
+            ax_spec0, ax_psd0 = ax_spec, ax_psd
+        ax_psd.set_xlabel("Frequency (Hz)", fontsize=6)
+        ax_psd.set_ylabel("dB re 1 (µm/s)²/Hz", fontsize=6)
+        ax_psd.tick_params(axis='both', which='major', labelsize=5)
+        ax_psd.grid(True, linewidth=0.3)
+    if image is not None:
+        colorbar = fig.colorbar(image, cax=fig.add_subplot(grid[:, 2]))
+        colorbar.set_label("Power (dB re 1 (µm/s)²/Hz)", fontsize=7)
+        colorbar.ax.tick_params(labelsize=5)
+    return fig
+
+def create_spectral_plots(spectra, output_pdf, plots_per_page=6, figsize=(8.27, 11.69), epi_mag=None, page_previews=None):
+    """
+    Writes the spectral PDF: an overview of every PSD coloured by distance, then one row per trace
+    with its spectrogram and PSD, nearest station first. With page_previews set, a preview of every
+    page is saved there as spectra_<page>.
+    """
+    if page_previews:
+        os.makedirs(page_previews, exist_ok=True)
+
+    def save_page(pdf, fig, number):
+        pdf.savefig(fig)
+        if page_previews:
+            save_page_preview(fig, page_preview_path(page_previews, number, "spectra"))
+        plt.close(fig)
+
+    order = np.argsort(spectra["dist_km"], kind='stable')
+    psd_freqs, psd_db = spectra["psd_freqs"], spectra["psd_db"]
+    psd_mask = psd_freqs > 0  # The DC bin has no place on a logarithmic frequency axis
+    vmin, vmax = _value_limits(spectra["spectrogram_db"])
+    # Event peaks are what the PSDs are read for, so they are never clipped
+    psd_limits = _value_limits(psd_db[:, psd_mask], upper=100)
+
+    with PdfPages(output_pdf) as pdf:
+        fig, ax = plt.subplots(figsize=(figsize[1], figsize[0]), constrained_layout=True)
+        log_freqs = psd_freqs[psd_mask]
+        lines = LineCollection([np.column_stack([log_freqs, psd_db[i, psd_mask]]) for i in order],
+                               array=spectra["dist_km"][order], cmap='viridis', linewidths=0.6)
+        ax.add_collection(lines)
+        ax.set_xscale('log')
+        ax.set_xlim(log_freqs[0], log_freqs[-1])
+        if psd_limits[0] is not None:
+            ax.set_ylim(psd_limits[0] - 5, psd_limits[1] + 5)
+        fig.colorbar(lines, ax=ax, label="Epicentral distance (km)")
+        ax.set_xlabel("Frequency (Hz)")
+        ax.set_ylabel("PSD (dB re 1 (µm/s)²/Hz)")
+        title = f"Welch power spectral densities of {len(order)} traces"
+        ax.set_title(f"M{epi_mag} {title}" if epi_mag is not None else title)
+        ax.grid(True, which='both', linewidth=0.3)
+        save_page(pdf, fig, 1)
+
+        decades = 10.0 ** np.arange(np.floor(np.log10(log_freqs[0])), np.ceil(np.log10(log_freqs[-1])) + 1)
+        for number, first in enumerate(range(0, len(order), plots_per_page), 2):
+            fig = draw_spectral_page(spectra, order[first:first + plots_per_page], first, plots_per_page, figsize,
+                                     psd_mask, decades, (vmin, vmax), psd_limits)
+            save_page(pdf, fig, number)
+    print(f"Spectral plots saved to {output_pdf}")
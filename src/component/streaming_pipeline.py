@@ -0,0 +1,193 @@
+# src/component/streaming_pipeline.py
+"""
+Bounded-memory analysis for long time windows.
+
+The batch pipeline decodes every trace of the folder into memory before plotting. Here the stations
+are ordered by distance from the MiniSEED headers alone, and each trace is then decoded, preprocessed,
+picked and drawn into its page before the next one is read. Only the decimated points of the current
+page and of the record section are kept, so peak memory is one trace plus one page whatever the
+number of stations or the window length.
+"""
+import os
+import time
+from contextlib import nullcontext
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+from obspy import read
+from .data_processing import scan_mseed_headers
+from .decimation import axes_pixel_width
+from .detection import detect_peaks, write_station_peaks
+from .plot_creation import (draw_panel, hide_unused_panels, new_page, page_event, page_preview_path, panel_width,
+                            prepare_panel, save_page_preview)
+from .preprocessing import VELOCITY_UNITS, preprocess_traces
+from .record_section import record_section_amplitude, record_section_segments, save_record_section
+from .waveform_store import WaveformStoreWriter
+from .waveform_tiles import WaveformTilesWriter
+
+RECORD_SECTION_FIGSIZE = (11.69, 8.27)
+
+def plan_traces(folder_path, station_metadata):
+    """
+    Scans the headers of every .mseed file and lists the Z traces to analyse, nearest station first.
+
+    Returns:
+        tuple: (plan, used_stations, file_stats). plan holds one dict per SEED id with 'file', 'id',
+            'station_code', 'dist_km', 'starttime' and 'npts'; file_stats one dict per file, as
+            returned by ingest_seismic_data.
+    """
+    files = [os.path.join(folder_path, file) for file in sorted(os.listdir(folder_path)) if file.lower().endswith(".mseed")]
+    plan = {}
+    used_stations = {}
+    file_stats = []
+    started = time.perf_counter()
+    for file_path in files:
+        stats = {"file": os.path.basename(file_path), "bytes": os.path.getsize(file_path), "headers": 0,
+                 "selected": [], "skipped": [], "error": None}
+        file_stats.append(stats)
+        try:
+            headers = scan_mseed_headers(file_path)
+        except Exception as e:
+            stats["error"] = str(e)
+            print(f"Error reading {stats['file']}: {e}")
+            continue
+        stats["headers"] = len(headers)
+        for header in headers:
+            if not header["channel"].endswith("Z"):
+                continue
+            station_code = header["station_code"]
+            if station_code not in station_metadata:
+                if station_code not in stats["skipped"]:
+                    stats["skipped"].append(station_code)
+                    print(f"{station_code} is not among the selected stations, skipping trace")
+                continue
+            key = (file_path, header["id"])
+            if key in plan:
+                plan[key]["npts"] += header["npts"]
+                plan[key]["starttime"] = min(plan[key]["starttime"], header["starttime"])
+                continue
+            stats["selected"].append(header["id"])
+            used_stations[station_code] = station_metadata[station_code]
+            plan[key] = {"file": file_path, "id": header["id"], "station_code": station_code,
+                         "dist_km": station_metadata[station_code]["dist_km"],
+                         "starttime": header["starttime"], "npts": header["npts"]}
+    plan = sorted(plan.values(), key=lambda entry: entry["dist_km"])
+    total_bytes = sum(stats["bytes"] for stats in file_stats)
+    print(f"Scanned {len(files)} files ({total_bytes / 1e6:.1f} MB) in {time.perf_counter() - started:.2f}s: "
+          f"{len(plan)} Z traces from {len(used_stations)} stations")
+    return plan, used_stations, file_stats
+
+def iter_preprocessed(plan, gain):
+    """Yields the preprocessed TraceBatch of each planned SEED id in plan order, decoding one id at a time."""
+    for entry in plan:
+        try:
+            st = read(entry["file"], format="MSEED", sourcename=entry["id"])
+        except Exception as e:
+            print(f"Error reading {entry['id']} from {os.path.basename(entry['file'])}: {e}")
+            continue
+        yield preprocess_traces([(tr, entry["dist_km"]) for tr in st], gain)
+
+def render_streaming(plan, station_metadata, gain, output_pdf, peaks_csv, nrows, ncols, figsize, origin_time=None,
+                     epi_mag=None, full_resolution=False, record_section_pdf=None, reduction_velocity=None,
+                     page_previews=None, page_callback=None, trace_callback=None, waveform_tiles=None,
+                     waveform_store=None):
+    """
+    Writes the velocity PDF, station peaks and optional record section, holding one trace in memory at a time.
+
+    Args:
+        plan (list): Output of plan_traces, nearest station first.
+        origin_time (UTCDateTime): Origin time for pick travel times and the record section.
+        full_resolution (bool): Draw every sample. The page then keeps its traces' samples, so memory
+            grows to one page of full traces.
+        page_previews (str): Optional directory for a PNG preview of every page.
+        page_callback (callable): Called with plot_creation.page_event's data as each page is saved.
+        trace_callback (callable): Called with each trace's picks and peaks row as soon as it is analysed.
+        waveform_tiles (str): Optional directory for the viewer's min/max pyramid, built one trace at a time.
+            Its level 0 is read from waveform_store, which is then required.
+        waveform_store (str): Optional directory to save the preprocessed traces to, one trace at a time.
+
+    Returns:
+        dict: 'traces' and 'samples' analysed.
+    """
+    totals = {"traces": 0, "samples": 0}
+    peaks = []
+    panels_per_page = nrows * ncols
+
+    section = None
+    if record_section_pdf:
+        section_fig, section_ax = plt.subplots(figsize=RECORD_SECTION_FIGSIZE, constrained_layout=True)
+        distances = [entry["dist_km"] for entry in plan]
+        section = {"fig": section_fig, "ax": section_ax, "segments": [], "distances": distances,
+                   "amplitude_km": record_section_amplitude(distances), "n_bins": axes_pixel_width(section_ax),
+                   "origin_time": origin_time or min(entry["starttime"] for entry in plan)}
+
+    if page_previews:
+        os.makedirs(page_previews, exist_ok=True)
+    page_number = 0
+    panels = []
+
+    def save_page(fig):
+        nonlocal page_number
+        page_number += 1
+        pdf.savefig(fig) # Save the page
+        preview_png = page_preview_path(page_previews, page_number) if page_previews else None
+        if preview_png:
+            save_page_preview(fig, preview_png)
+        plt.close(fig) # Close the figure to free memory
+        if page_callback is not None:
+            page_callback(page_event(page_number, panels, preview_png))
+        panels.clear()
+
+    n_bins = panel_width(nrows, ncols, figsize)
+    tiles_writer = WaveformTilesWriter(waveform_tiles, VELOCITY_UNITS, waveform_store) if waveform_tiles else nullcontext()
+    store_writer = WaveformStoreWriter(waveform_store, VELOCITY_UNITS, gain) if waveform_store else nullcontext()
+    # The store is listed last so it is in place before the tiles that read it
+    with PdfPages(output_pdf) as pdf, tiles_writer, store_writer:
+        fig, axes, plot_idx = None, None, 0
+        for batch in iter_preprocessed(plan, gain):
+            for tr, dist_km in batch:
+                if waveform_store:
+                    store_writer.add(tr, dist_km)
+                if waveform_tiles:
+                    tiles_writer.add(tr, dist_km)
+            batch_peaks = detect_peaks(batch, origin_time)
+            peaks.extend(batch_peaks)
+            if trace_callback is not None:
+                for row in batch_peaks:
+                    trace_callback(row)
+            for tr, dist_km in batch:
+                # A trace that cannot be drawn is left out before it takes a panel, as in create_velocity_plots
+                try:
+                    panel = prepare_panel(tr, dist_km, station_metadata[tr.stats.network + "." + tr.stats.station],
+                                          n_bins, full_resolution)
+                except Exception as e:
+                    print(f"Error plotting trace {tr.id}: {e}")
+                    continue
+                if fig is None:
+                    fig, axes = new_page(nrows, ncols, figsize)
+                draw_panel(axes[plot_idx], panel, plot_idx)
+                panels.append((tr.id, dist_km))
+                plot_idx += 1
+                if plot_idx == panels_per_page:
+                    save_page(fig)
+                    fig, axes, plot_idx = None, None, 0
+            if section is not None:
+                section["segments"].extend(record_section_segments(batch.traces_with_dist, section["origin_time"], section["n_bins"],
+                                                                   section["amplitude_km"], reduction_velocity, full_resolution))
+            totals["traces"] += len(batch)
+            totals["samples"] += int(batch.npts.sum())
+            del batch
+        if fig is not None:
+            hide_unused_panels(axes, plot_idx)
+            save_page(fig)
+    print(f"Plots saved to {output_pdf}")
+
+    write_station_peaks(peaks, peaks_csv)
+    if section is not None:
+        if section["segments"]:
+            save_record_section(section["fig"], section["ax"], section["segments"], sorted(section["distances"]),
+                                section["amplitude_km"], record_section_pdf, section["origin_time"], reduction_velocity, epi_mag,
+                                page_previews)
+        else:
+            plt.close(section["fig"])
+            print("Warning: No traces for the record section. Skipping it.")
+    return totals
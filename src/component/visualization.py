@@ -149,7 +149,8 @@ def create_velocity_plots(traces_with_dist, station_metadata, output_pdf, gain,
                     plot_idx = 0
 
                 ax = axes[plot_idx]
-                ax.plot_date(times, tr.data, 'k-', linewidth=0.5)
+                ax.xaxis_date()
+                ax.plot(times, tr.data, 'k-', linewidth=0.5)
                 station_code = tr.stats.network + "." + tr.stats.station
                 meta = station_metadata[station_code]
                 ax.set_title(f"{tr.id} — {tr.stats.starttime.date}\nDist: {meta['dist_km']:.1f}km (#{plot_idx + 1})", fontsize=8)
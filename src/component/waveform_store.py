@@ -0,0 +1,173 @@
+# src/component/waveform_store.py
+import json
+import os
+import shutil
+import numpy as np
+from obspy import Trace, UTCDateTime
+
+STORE_VERSION = 1
+SAMPLES_FILE = "samples.npy"
+INDEX_FILE = "index.json"
+
+class WaveformStoreWriter:
+    """
+    Builds a waveform store one trace at a time; use as a context manager or call close().
+
+    Traces must be added nearest station first. The samples are appended to samples.npy behind a
+    header that close() rewrites with the final length (numpy pads the header so the length fits in
+    place), and the directory is replaced atomically so readers never see a partial store.
+    """
+
+    def __init__(self, store_dir, units, gain, dtype=np.float32):
+        self.store_dir = store_dir
+        self.units = units
+        self.gain = gain
+        self.dtype = np.dtype(dtype)
+        self._tmp_dir = f"{store_dir.rstrip(os.sep)}.{os.getpid()}.tmp"
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+        os.makedirs(self._tmp_dir)
+        self._file = open(os.path.join(self._tmp_dir, SAMPLES_FILE), 'wb')
+        self._write_header(0)
+        self._data_start = self._file.tell()
+        self._written = 0
+        self.columns = {"id": [], "station_code": [], "starttime": [], "sampling_rate": [], "npts": [], "offset": [],
+                        "dist_km": []}
+
+    def _write_header(self, length):
+        header = {"descr": np.lib.format.dtype_to_descr(self.dtype), "fortran_order": False, "shape": (length,)}
+        np.lib.format.write_array_header_1_0(self._file, header)
+
+    def add(self, tr, dist_km):
+        """Appends the samples of a preprocessed trace."""
+        np.asarray(tr.data, dtype=self.dtype).tofile(self._file)
+        columns = self.columns
+        columns["id"].append(tr.id)
+        columns["station_code"].append(tr.stats.network + "." + tr.stats.station)
+        columns["starttime"].append(str(tr.stats.starttime))
+        columns["sampling_rate"].append(float(tr.stats.sampling_rate))
+        columns["npts"].append(int(tr.stats.npts))
+        columns["offset"].append(self._written)
+        columns["dist_km"].append(float(dist_km))
+        self._written += int(tr.stats.npts)
+
+    def close(self):
+        """Completes the samples header, writes the index and moves the store into place; returns store_dir."""
+        self._file.seek(0)
+        self._write_header(self._written)
+        if self._file.tell() != self._data_start:
+            self.abort()
+            raise RuntimeError(f"The {SAMPLES_FILE} header of {self._written} samples does not fit in place")
+        self._file.close()
+        index = {
+            "version": STORE_VERSION,
+            "units": self.units,
+            "gain": self.gain,
+            "dtype": self.dtype.name,
+            "columns": self.columns,
+        }
+        with open(os.path.join(self._tmp_dir, INDEX_FILE), 'w') as f:
+            json.dump(index, f)
+        shutil.rmtree(self.store_dir, ignore_errors=True)
+        os.rename(self._tmp_dir, self.store_dir)
+        print(f"Saved {len(self.columns['id'])} traces to waveform store {self.store_dir}")
+        return self.store_dir
+
+    def abort(self):
+        self._file.close()
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def write_waveform_store(batch, store_dir, gain, dtype=np.float32):
+    """
+    Writes preprocessed traces to store_dir as one flat sample array plus a columnar index.
+
+    samples.npy holds every trace's samples back to back, nearest station first; index.json holds one
+    list per column (id, station_code, starttime, sampling_rate, npts, offset, dist_km) and the units
+    and gain of the samples. The directory is replaced atomically so readers never see a partial store.
+
+    Args:
+        batch (TraceBatch): Output of preprocess_traces.
+        store_dir (str): Destination directory, e.g. Output/<event>/waveforms.
+        gain (float): Gain the samples were converted with, recorded in the index.
+        dtype: Sample dtype on disk; float32 halves the size of the float64 working buffer.
+
+    Returns:
+        str: store_dir.
+    """
+    with WaveformStoreWriter(store_dir, batch.units, gain, dtype) as writer:
+        for tr, dist_km in sorted(batch.traces_with_dist, key=lambda x: x[1]):
+            writer.add(tr, dist_km)
+    return store_dir
+
+class WaveformStore:
+    """
+    Read-only view of a waveform store written by write_waveform_store.
+
+    The samples are memory-mapped, so opening a store is cheap and every slice returned by data,
+    window or traces is a view into the file; nothing is decoded or copied until it is used.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, INDEX_FILE)) as f:
+            index = json.load(f)
+        if index.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported waveform store version {index.get('version')} in {store_dir}")
+        self.units = index["units"]
+        self.gain = index["gain"]
+        columns = index["columns"]
+        self.ids = columns["id"]
+        self.station_codes = columns["station_code"]
+        self.starttimes = [UTCDateTime(t) for t in columns["starttime"]]
+        self.sampling_rates = np.array(columns["sampling_rate"], dtype=np.float64)
+        self.npts = np.array(columns["npts"], dtype=np.int64)
+        self.offsets = np.array(columns["offset"], dtype=np.int64)
+        self.dist_km = np.array(columns["dist_km"], dtype=np.float64)
+        self.samples = np.load(os.path.join(store_dir, SAMPLES_FILE), mmap_mode='r')
+        self._positions = {trace_id: i for i, trace_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def position(self, trace_id):
+        """Returns the row of a SEED id (e.g. 'AM.R023E.00.EHZ'); rows are ordered nearest station first."""
+        try:
+            return self._positions[trace_id]
+        except KeyError:
+            raise KeyError(f"Trace {trace_id} is not in the waveform store {self.store_dir}") from None
+
+    def data(self, i):
+        """Returns the samples of row i as a read-only view into the memory-mapped file."""
+        return self.samples[self.offsets[i]:self.offsets[i] + self.npts[i]]
+
+    def window(self, i, starttime=None, endtime=None):
+        """Returns (first sample time, samples) of row i between starttime and endtime (UTCDateTime), as a view."""
+        first = 0
+        last = int(self.npts[i])
+        rate = self.sampling_rates[i]
+        if starttime is not None:
+            first = min(last, max(0, int(np.ceil((starttime - self.starttimes[i]) * rate))))
+        if endtime is not None:
+            last = max(first, min(last, int(np.floor((endtime - self.starttimes[i]) * rate)) + 1))
+        return self.starttimes[i] + first / rate, self.data(i)[first:last]
+
+    def trace(self, i):
+        """Returns row i as an obspy Trace whose data is a view into the store."""
+        network, station, location, channel = self.ids[i].split(".")
+        header = {"network": network, "station": station, "location": location, "channel": channel,
+                  "starttime": self.starttimes[i], "sampling_rate": self.sampling_rates[i]}
+        tr = Trace(data=self.data(i), header=header)
+        tr.stats.processing = [f"waveform_store: velocity in {self.units}"]
+        return tr
+
+    def traces_with_dist(self):
+        """Returns (Trace, dist_km) tuples for every row, nearest first, in the form the plots expect."""
+        return [(self.trace(i), float(self.dist_km[i])) for i in range(len(self))]
@@ -0,0 +1,189 @@
+# src/component/waveform_tiles.py
+"""
+Multi-resolution min/max pyramid of the processed traces, served as tiles to the browser viewer.
+
+Level 0 holds every sample; each further level holds the minimum and maximum of LEVEL_FACTOR bins of
+the level below, down to a level of at most TOP_LEVEL_BINS bins. A viewer asks for the level whose bins
+are about one screen pixel wide, so every request moves data for the pixels on screen only, whatever
+the window length. Level 0 is served from the event's waveform store (see component.waveform_store),
+which already holds the samples; the higher levels of all traces are appended to one float32 file of
+interleaved min/max pairs described by a JSON index, so traces can be added one at a time by the
+streaming pipeline and read back through a single memory map.
+"""
+import json
+import os
+import shutil
+import numpy as np
+from obspy import UTCDateTime
+from .waveform_store import WaveformStore
+
+TILES_VERSION = 2
+PYRAMID_FILE = "pyramid.f32"
+INDEX_FILE = "index.json"
+LEVEL_FACTOR = 4
+TOP_LEVEL_BINS = 1024
+# Largest number of bins (or samples at level 0) returned by one tile request
+MAX_TILE_BINS = 8192
+
+def pyramid_levels(data):
+    """Yields (level, (n, 2) min/max bins) for every level above 0 of a trace's samples."""
+    mins = maxs = data
+    level = 0
+    while len(mins) > TOP_LEVEL_BINS:
+        level += 1
+        pad = -len(mins) % LEVEL_FACTOR
+        if pad:
+            # Repeating the last value leaves the min and max of the partial last bin unchanged
+            mins = np.concatenate((mins, np.repeat(mins[-1:], pad)))
+            maxs = np.concatenate((maxs, np.repeat(maxs[-1:], pad)))
+        mins = mins.reshape(-1, LEVEL_FACTOR).min(axis=1)
+        maxs = maxs.reshape(-1, LEVEL_FACTOR).max(axis=1)
+        yield level, np.column_stack((mins, maxs))
+
+class WaveformTilesWriter:
+    """
+    Builds a tile store one trace at a time; use as a context manager or call close().
+
+    Traces must be added in the order they are added to the waveform store at store_dir, whose samples
+    serve level 0. They are written to a temporary directory that replaces tiles_dir on close, so
+    readers never see a partial store.
+    """
+
+    def __init__(self, tiles_dir, units, store_dir):
+        self.tiles_dir = tiles_dir
+        self.units = units
+        self.store_dir = store_dir
+        self._tmp_dir = f"{tiles_dir.rstrip(os.sep)}.{os.getpid()}.tmp"
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+        os.makedirs(self._tmp_dir)
+        self._file = open(os.path.join(self._tmp_dir, PYRAMID_FILE), 'wb')
+        self._written = 0
+        self.columns = {"id": [], "station_code": [], "starttime": [], "sampling_rate": [], "npts": [], "dist_km": [],
+                        "levels": []}
+
+    def add(self, tr, dist_km):
+        """Appends every level above 0 of a preprocessed trace."""
+        levels = []
+        for level, values in pyramid_levels(np.asarray(tr.data, dtype=np.float32)):
+            levels.append([self._written, len(values)])
+            values.tofile(self._file)
+            self._written += values.size
+        columns = self.columns
+        columns["id"].append(tr.id)
+        columns["station_code"].append(tr.stats.network + "." + tr.stats.station)
+        columns["starttime"].append(str(tr.stats.starttime))
+        columns["sampling_rate"].append(float(tr.stats.sampling_rate))
+        columns["npts"].append(int(tr.stats.npts))
+        columns["dist_km"].append(float(dist_km))
+        columns["levels"].append(levels)
+
+    def close(self):
+        """Writes the index and moves the store into place; returns tiles_dir."""
+        self._file.close()
+        index = {"version": TILES_VERSION, "units": self.units, "level_factor": LEVEL_FACTOR,
+                 "waveform_store": os.path.relpath(self.store_dir, self.tiles_dir), "columns": self.columns}
+        with open(os.path.join(self._tmp_dir, INDEX_FILE), 'w') as f:
+            json.dump(index, f)
+        shutil.rmtree(self.tiles_dir, ignore_errors=True)
+        os.rename(self._tmp_dir, self.tiles_dir)
+        print(f"Saved waveform tiles of {len(self.columns['id'])} traces to {self.tiles_dir}")
+        return self.tiles_dir
+
+    def abort(self):
+        self._file.close()
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def write_waveform_tiles(traces_with_dist, tiles_dir, units, store_dir):
+    """Writes the tile store of distance-sorted (Trace, dist_km) pairs over the waveform store at store_dir."""
+    with WaveformTilesWriter(tiles_dir, units, store_dir) as writer:
+        for tr, dist_km in traces_with_dist:
+            writer.add(tr, dist_km)
+    return tiles_dir
+
+class WaveformTiles:
+    """Read-only view of a tile store; tiles are slices of its memory-mapped pyramid or of the waveform store."""
+
+    def __init__(self, tiles_dir):
+        self.tiles_dir = tiles_dir
+        with open(os.path.join(tiles_dir, INDEX_FILE)) as f:
+            index = json.load(f)
+        if index.get("version") != TILES_VERSION:
+            raise ValueError(f"Unsupported waveform tiles version {index.get('version')} in {tiles_dir}")
+        self.units = index["units"]
+        self.level_factor = index["level_factor"]
+        columns = index["columns"]
+        self.ids = columns["id"]
+        self.station_codes = columns["station_code"]
+        self.starttimes = [UTCDateTime(t) for t in columns["starttime"]]
+        self.sampling_rates = np.array(columns["sampling_rate"], dtype=np.float64)
+        self.npts = np.array(columns["npts"], dtype=np.int64)
+        self.dist_km = np.array(columns["dist_km"], dtype=np.float64)
+        self.levels = columns["levels"]
+        self.store = WaveformStore(os.path.normpath(os.path.join(tiles_dir, index["waveform_store"])))
+        if self.store.ids != self.ids:
+            raise ValueError(f"The waveform store {self.store.store_dir} does not match the waveform tiles {tiles_dir}")
+        # An empty file cannot be memory-mapped; it holds no levels to read anyway
+        pyramid_path = os.path.join(tiles_dir, PYRAMID_FILE)
+        self.values = np.memmap(pyramid_path, dtype='<f4', mode='r') if os.path.getsize(pyramid_path) else np.empty(0, '<f4')
+        self._positions = {trace_id: i for i, trace_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def position(self, trace_id):
+        """Returns the row of a SEED id; rows are ordered nearest station first."""
+        try:
+            return self._positions[trace_id]
+        except KeyError:
+            raise KeyError(f"Trace {trace_id} is not in the waveform tiles {self.tiles_dir}") from None
+
+    def level_bins(self, i):
+        """Returns the bin count of every level of row i, from the samples at level 0 up."""
+        return [int(self.npts[i])] + [count for _, count in self.levels[i]]
+
+    def bin_seconds(self, i, level):
+        return self.level_factor ** level / self.sampling_rates[i]
+
+    def level_for(self, i, starttime, endtime, width):
+        """Returns the coarsest level with at least width bins between starttime and endtime."""
+        span = max(float(endtime - starttime), 0.0)
+        level = len(self.levels[i])
+        while level > 0 and span / self.bin_seconds(i, level) < width:
+            level -= 1
+        return level
+
+    def tile(self, i, level, starttime=None, endtime=None):
+        """
+        Returns (first bin time, mins, maxs) of row i at level between starttime and endtime (UTCDateTime).
+
+        At level 0 mins and maxs are the same sample view. Raises ValueError for an unknown level or a
+        range of more than MAX_TILE_BINS bins.
+        """
+        if not 0 <= level <= len(self.levels[i]):
+            raise ValueError(f"Level must be between 0 and {len(self.levels[i])}")
+        count = self.level_bins(i)[level]
+        bin_seconds = self.bin_seconds(i, level)
+        first, last = 0, count
+        if starttime is not None:
+            first = min(count, max(0, int(np.floor((starttime - self.starttimes[i]) / bin_seconds))))
+        if endtime is not None:
+            last = max(first, min(count, int(np.floor((endtime - self.starttimes[i]) / bin_seconds)) + 1))
+        if last - first > MAX_TILE_BINS:
+            raise ValueError(f"{last - first} bins requested at level {level}; at most {MAX_TILE_BINS} per tile, "
+                             f"use a coarser level or a shorter range")
+        first_time = self.starttimes[i] + first * bin_seconds
+        if level == 0:
+            values = self.store.data(i)[first:last]
+            return first_time, values, values
+        offset = self.levels[i][level - 1][0]
+        pairs = self.values[offset + 2 * first:offset + 2 * last].reshape(-1, 2)
+        return first_time, pairs[:, 0], pairs[:, 1]
@@ -9,6 +9,8 @@ import json # To mock saving a config if needed
 # This allows importing modules from 'component' which is parallel to 'src'
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from component.paths import event_paths
+
 # Import the main processing function from your component module
 _process_data_source = "placeholder" # Default source
 
@@ -20,7 +22,7 @@ except ImportError:
     print("main.py: Warning: 'component.main_visualization.py' not found or 'process_data' not defined in it.")
     print("main.py: Using a placeholder 'process_data' function for demonstration.")
     # Define a placeholder if the actual module isn't available
-    def process_data(folder_path, output_csv_path, output_pdf_path, map_pdf_path, epi_lat=None, epi_lon=None, epi_mag=None):
+    def process_data(folder_path, output_csv_path, output_pdf_path, map_pdf_path, epi_lat=None, epi_lon=None, epi_mag=None, progress_callback=None, full_resolution=False, use_cache=True, waveform_store=None, record_section_pdf=None, origin_time=None, reduction_velocity=None, peaks_csv=None, max_workers=None, run_report=None, streaming=False, spectra_pdf=None, spectra_npz=None, max_radius_km=None, max_stations=None, page_previews=None, waveform_tiles=None, map_features=None):
         print(f"--- SIMULATING DATA PROCESSING (PLACEHOLDER) ---")
         print(f"Input folder: {folder_path}")
         print(f"Output CSV path: {output_csv_path}")
@@ -64,38 +66,57 @@ if __name__ == "__main__":
                         help='Longitude of the earthquake epicenter.')
     parser.add_argument('--magnitude', type=float, default=5.3, # Added argument for magnitude
                         help='Magnitude of the earthquake.')
-    
-    args = parser.parse_args()
+    parser.add_argument('--output_dir', type=str, default=None,
+                        help='Directory for the generated files. Defaults to Output/<earthquake_name>_<magnitude>.')
+    parser.add_argument('--full_resolution', action='store_true',
+                        help='Draw every sample in the velocity plots instead of per-pixel min/max envelopes.')
+    parser.add_argument('--no_cache', action='store_true',
+                        help='Recompute the products even if an identical analysis is cached.')
+    parser.add_argument('--waveform_store', action='store_true',
+                        help='Save the preprocessed traces to <output_dir>/waveforms for later products. The waveform tiles '
+                             'read their samples from it, so it is written anyway.')
+    parser.add_argument('--origin_time', type=str, default=None,
+                        help='Event origin time (UTC, ISO 8601) the record section is aligned to. Defaults to the earliest trace start.')
+    parser.add_argument('--reduction_velocity', type=float, default=None,
+                        help='Reduction velocity in km/s for the record section time axis.')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Analyse one trace at a time, nearest station first, to bound memory for long time windows.')
+    parser.add_argument('--max_radius_km', type=float, default=None,
+                        help='Only analyse stations within this distance of the epicenter. Defaults to STATION_MAX_RADIUS_KM; 0 for no limit.')
+    parser.add_argument('--max_stations', type=int, default=None,
+                        help='Only analyse this many stations nearest the epicenter. Defaults to STATION_MAX_COUNT; 0 for no limit.')
+    parser.add_argument('--max_workers', type=int, default=None,
+                        help='Processes used for reading and rendering. Defaults to the CPU count.')
 
-    # Define root directory for easier path construction
-    ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-    
-    # Construct the dynamic subfolder name using earthquake name and magnitude
-    # This must match the folder created by app.py for uploads
-    dynamic_folder_name = f"{args.earthquake_name}_{args.magnitude}"
+    args = parser.parse_args()
 
-    # Input folder where MiniSEED files are uploaded by Flask app
-    # This now points to the dynamic subfolder within 'assets'
-    folder_path = os.path.join(ROOT_DIR, 'assets', dynamic_folder_name)
+    # Construct the input folder and output paths from the earthquake name and magnitude
+    # The folder name must match the one created by app.py for uploads
+    paths = event_paths(args.earthquake_name, args.magnitude, args.output_dir)
+    folder_path = paths["folder_path"]
     print(f"main.py: Using input folder path: {folder_path}")
 
     if not os.path.exists(folder_path):
         sys.exit(f"Error: Input folder '{folder_path}' does not exist. Ensure files are uploaded correctly.")
-    
-    # Output directory for processed files
-    # This now points to a dynamic subfolder within 'Output'
-    output_dir = os.path.join(ROOT_DIR, 'Output', dynamic_folder_name)
-    os.makedirs(output_dir, exist_ok=True) # Ensure output directory exists
 
-    # Define output file paths based on earthquake name and dynamic output folder
-    output_pdf_path = os.path.join(output_dir, f"{args.earthquake_name}_velocity_um_per_s.pdf")
-    map_pdf_path = os.path.join(output_dir, f"{args.earthquake_name}_stations_map.pdf")
-    output_csv_path = os.path.join(output_dir, "nepal_stations.csv") # Example CSV output
+    os.makedirs(paths["output_dir"], exist_ok=True) # Ensure output directory exists
+    output_pdf_path = paths["output_pdf"]
+    map_pdf_path = paths["map_pdf"]
+    output_csv_path = paths["output_csv"]
 
     print(f"main.py: Output PDF (Velocity) will be saved to: {output_pdf_path}")
     print(f"main.py: Output PDF (Map) will be saved to: {map_pdf_path}")
+    print(f"main.py: Output PDF (Record section) will be saved to: {paths['record_section_pdf']}")
+    print(f"main.py: Output PDF (Spectra) will be saved to: {paths['spectra_pdf']}")
     print(f"main.py: Output CSV will be saved to: {output_csv_path}")
 
+    # Stage markers (and result events, with their data as JSON) are parsed by the backend job queue to report progress
+    def print_stage(stage, data=None):
+        if data is None:
+            print(f"main.py: stage={stage}", flush=True)
+        else:
+            print(f"main.py: stage={stage} {json.dumps(data, default=str)}", flush=True)
+
     # Call the main data processing function
     process_data(
         folder_path=folder_path,
@@ -104,7 +125,24 @@ if __name__ == "__main__":
         map_pdf=map_pdf_path,
         epi_lat=args.latitude,
         epi_lon=args.longitude,
-        epi_mag=args.magnitude # Pass magnitude to process_data
+        epi_mag=args.magnitude, # Pass magnitude to process_data
+        progress_callback=print_stage,
+        full_resolution=args.full_resolution,
+        use_cache=not args.no_cache,
+        waveform_store=paths["waveform_store"] if args.waveform_store else None,
+        record_section_pdf=paths["record_section_pdf"],
+        peaks_csv=paths["peaks_csv"],
+        spectra_pdf=paths["spectra_pdf"],
+        spectra_npz=paths["spectra_npz"],
+        page_previews=paths["page_previews"],
+        waveform_tiles=paths["waveform_tiles"],
+        run_report=paths["run_report"],
+        origin_time=args.origin_time,
+        reduction_velocity=args.reduction_velocity,
+        streaming=args.streaming,
+        max_radius_km=args.max_radius_km,
+        max_stations=args.max_stations,
+        max_workers=args.max_workers
     )
 
     print("main.py: Script finished successfully.")
@@ -0,0 +1,9 @@
+# tests/conftest.py
+import os
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# The pipeline is imported as the 'component' package and the backend modules by their file names, as at run time
+for path in (os.path.join(ROOT_DIR, 'src'), os.path.join(ROOT_DIR, 'backend_serve'), os.path.join(ROOT_DIR, 'benchmarks')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
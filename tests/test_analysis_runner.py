@@ -0,0 +1,21 @@
+# tests/test_analysis_runner.py
+import analysis_runner
+
+CHILD = """
+import sys
+sys.stderr.write("warning " * 25000)
+sys.stderr.flush()
+print('main.py: stage=read {"streaming": true}', flush=True)
+sys.stderr.write("done")
+"""
+
+def test_subprocess_writing_a_lot_to_stderr_does_not_hang(tmp_path, monkeypatch):
+    script = tmp_path / "main.py"
+    script.write_text(CHILD)
+    monkeypatch.setattr(analysis_runner, "MAIN_SCRIPT_PATH", str(script))
+    monkeypatch.setattr(analysis_runner, "BASE_OUTPUT_FOLDER", str(tmp_path / "Output"))
+    stages = []
+    result = analysis_runner.run_analysis_subprocess("job", lambda stage, data=None: stages.append((stage, data)), "Test", 5.0)
+    assert stages == [("read", {"streaming": True})]
+    assert len(result["stderr"]) == 200000 + len("done")
+    assert result["outputs"] == []
@@ -0,0 +1,25 @@
+# tests/test_analysis_worker.py
+import os
+import pytest
+import analysis_worker
+
+def quick_init(progress_queue):
+    analysis_worker._progress_queue = progress_queue
+
+def fake_process_data(job_id, kwargs):
+    if kwargs.get("crash"):
+        os._exit(1)  # As when the kernel kills a worker for running out of memory
+    return {"pid": os.getpid(), "elapsed_s": 0.0}
+
+def test_dead_worker_fails_only_its_job(monkeypatch):
+    monkeypatch.setattr(analysis_worker, "_init_worker", quick_init)
+    monkeypatch.setattr(analysis_worker, "_run_process_data", fake_process_data)
+    pool = analysis_worker.WarmWorkerPool(max_workers=1)
+    try:
+        first = pool.run("a", lambda *args: None)["pid"]
+        with pytest.raises(RuntimeError, match="worker process died"):
+            pool.run("b", lambda *args: None, crash=True)
+        after = pool.run("c", lambda *args: None)["pid"]
+        assert after != first
+    finally:
+        pool.shutdown()
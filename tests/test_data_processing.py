@@ -0,0 +1,28 @@
+# tests/test_data_processing.py
+import numpy as np
+from obspy import Stream, Trace, UTCDateTime
+from component.data_processing import ingest_file
+
+START = UTCDateTime(2025, 1, 1)
+
+def test_reads_the_z_traces_of_wanted_stations_only(tmp_path):
+    stream = Stream()
+    for station in ("R2", "R1", "R9"):
+        for channel in ("EHE", "EHZ", "EHN"):
+            for part in range(2):  # A gap splits every channel into two traces
+                stream += Trace(np.full(100, 10 * int(station[1:]) + "ENZ".index(channel[-1]), dtype=np.int32),
+                                header={"network": "AM", "station": station, "location": "00", "channel": channel,
+                                        "sampling_rate": 100.0, "starttime": START + part * 10})
+    path = str(tmp_path / "multi.mseed")
+    stream.write(path, format="MSEED", encoding="INT32")
+
+    traces, stats = ingest_file(path, {"AM.R1", "AM.R2"})
+    assert stats["error"] is None and stats["headers"] == 18
+    assert stats["selected"] == ["AM.R2.00.EHZ", "AM.R1.00.EHZ"]
+    assert stats["skipped"] == ["AM.R9"]
+    assert [tr.id for tr in traces] == ["AM.R2.00.EHZ"] * 2 + ["AM.R1.00.EHZ"] * 2
+    assert [tr.stats.starttime for tr in traces] == [START, START + 10] * 2
+    assert traces[0].data[0] == 22 and traces[2].data[0] == 12
+
+    windowed, _ = ingest_file(path, {"AM.R1"}, starttime=START + 10, endtime=START + 20)
+    assert [tr.stats.starttime for tr in windowed] == [START + 10]
@@ -0,0 +1,24 @@
+# tests/test_decimation.py
+import numpy as np
+from component.decimation import minmax_bins, minmax_envelope
+
+def test_bins_cover_every_sample_once():
+    data = np.random.default_rng(0).normal(size=1003)
+    edges, mins, maxs = minmax_bins(data, 10)
+    assert edges[0] == 0 and edges[-1] == len(data) and len(mins) == len(maxs) == 10
+    for i in range(10):
+        assert mins[i] == data[edges[i]:edges[i + 1]].min()
+        assert maxs[i] == data[edges[i]:edges[i + 1]].max()
+
+def test_envelope_keeps_the_extremes_of_every_bin():
+    data = np.random.default_rng(1).normal(size=100000)
+    data[54321] = 50.0  # A spike one sample wide still reaches the plot
+    positions, values = minmax_envelope(data, 400)
+    assert len(values) == 800 and values.max() == 50.0 and values.min() == data.min()
+    assert np.all(np.diff(positions) >= 0) and positions[0] >= 0 and positions[-1] < len(data)
+
+def test_short_data_is_returned_unchanged():
+    data = np.arange(7, dtype=np.float32)
+    positions, values = minmax_envelope(data, 4)
+    assert values is data
+    np.testing.assert_array_equal(positions, np.arange(7))
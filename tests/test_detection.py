@@ -0,0 +1,33 @@
+# tests/test_detection.py
+import numpy as np
+from component.detection import sta_lta_batch
+
+SAMPLING_RATE = 100.0
+
+def batched_and_single(traces):
+    """Returns the batched STA/LTA ratio of the traces and the ratio of each trace computed on its own."""
+    npts = np.array([len(trace) for trace in traces], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(npts)[:-1])).astype(np.int64)
+    rates = np.full(len(traces), SAMPLING_RATE)
+    batched = sta_lta_batch(np.concatenate(traces), offsets, npts, rates)
+    single = [sta_lta_batch(trace, np.array([0]), np.array([len(trace)]), rates[:1]) for trace in traces]
+    return [batched[offset:offset + n] for offset, n in zip(offsets, npts)], single
+
+def test_quiet_trace_after_loud_trace_matches_single_trace():
+    rng = np.random.default_rng(0)
+    for loud, quiet in ((5000.0, 0.003), (20000.0, 0.005)):
+        traces = [rng.normal(0, loud, 6000), rng.normal(0, quiet, 6000)]
+        batched, single = batched_and_single(traces)
+        for b, s in zip(batched, single):
+            np.testing.assert_allclose(b, s, rtol=1e-9, atol=1e-12)
+        # Stationary noise stays far below the trigger level
+        assert 0.5 < batched[1].max() < 3.0
+
+def test_ratio_is_scale_invariant_and_zero_before_lta_window():
+    rng = np.random.default_rng(1)
+    noise = rng.normal(0, 1, 4000)
+    noise[2500:2600] *= 50  # An arrival
+    batched, _ = batched_and_single([noise * 1e4, noise * 1e-4])
+    np.testing.assert_allclose(batched[0], batched[1], rtol=1e-9)
+    assert not batched[0][:999].any()
+    assert batched[0][2500:2600].max() > 3.5
@@ -0,0 +1,76 @@
+# tests/test_download_handler.py
+import threading
+from datetime import datetime
+from http.server import ThreadingHTTPServer
+import pytest
+from obspy import UTCDateTime, read
+from download_handler import create_session, download_raspberry_data, download_station_window
+from download_index import DownloadIndex
+from fdsn_stub import DataselectHandler
+
+START = UTCDateTime(2025, 1, 1, 6)
+
+@pytest.fixture
+def stub():
+    """Starts the FDSN stub on a free port with its own failure settings; yields (url, handler class)."""
+    handler = type("Handler", (DataselectHandler,), {"no_data_stations": set(), "failures": {}, "requests": {}})
+    server = ThreadingHTTPServer(("localhost", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://localhost:{server.server_address[1]}/fdsnws/dataselect/1/query", handler
+    server.shutdown()
+    server.server_close()
+
+def test_window_is_fetched_once_then_served_from_the_archive(stub, tmp_path):
+    url, handler = stub
+    index = DownloadIndex(str(tmp_path / "archive"))
+    with create_session(1) as session:
+        first = download_station_window(session, index, "R1", START, START + 60, str(tmp_path / "a.mseed"), url, backoff=0.01)
+        second = download_station_window(session, index, "R1", START, START + 120, str(tmp_path / "b.mseed"), url, backoff=0.01)
+    assert first["status"] == "ok" and first["requests"] == 1 and first["bytes"] > 0
+    # Only the new minute is requested
+    assert second["requests"] == 1 and second["cached_s"] == pytest.approx(60, abs=0.02)
+    assert handler.requests["R1"] == 2
+    stream = read(str(tmp_path / "b.mseed"))
+    assert {tr.stats.channel for tr in stream} == {"EHZ", "EHN", "EHE"}
+    assert all(tr.stats.endtime - tr.stats.starttime == pytest.approx(120, abs=0.02) for tr in stream)
+
+def test_transient_errors_are_retried_with_backoff(stub, tmp_path):
+    url, handler = stub
+    handler.failures = {"R1": 2, "R2": 10}
+    index = DownloadIndex(str(tmp_path / "archive"))
+    with create_session(1) as session:
+        recovered = download_station_window(session, index, "R1", START, START + 60, str(tmp_path / "r1.mseed"), url,
+                                            retries=3, backoff=0.01)
+        failed = download_station_window(session, index, "R2", START, START + 60, str(tmp_path / "r2.mseed"), url,
+                                         retries=2, backoff=0.01)
+    assert recovered["status"] == "ok" and recovered["attempts"] == 3
+    assert failed["status"] == "failed" and failed["attempts"] == 3 and "503" in failed["error"]
+    assert handler.requests == {"R1": 3, "R2": 3}
+    assert not (tmp_path / "r2.mseed").exists()
+
+def test_summary_counts_succeeded_no_data_and_failed_stations(stub, tmp_path):
+    url, handler = stub
+    handler.no_data_stations = {"R2"}
+    handler.failures = {"R3": 100}
+    index = DownloadIndex(str(tmp_path / "archive"))
+    events = []
+    summary = download_raspberry_data("Test_Event", datetime(2025, 1, 1, 6, 1), 0.5, 28.2, 84.4, str(tmp_path),
+                                      stations=["R1", "R2", "R3"], max_workers=3, base_url=url, retries=1, backoff=0.01,
+                                      index=index, progress_callback=lambda stage, result: events.append(stage))
+    assert summary["succeeded"] == ["R1"]
+    assert summary["no_data"] == ["R2"]
+    assert list(summary["failed"]) == ["R3"]
+    assert [r["station"] for r in summary["stations"]] == ["R1", "R2", "R3"]
+    assert events == ["station"] * 3
+    assert summary["bytes_downloaded"] == summary["stations"][0]["bytes"] > 0
+    assert (tmp_path / "Test_Event" / "R1_Test_Event.mseed").exists()
+
+    # The empty range is remembered, so a repeat asks for nothing from R2 and only retries R3
+    requests_before = dict(handler.requests)
+    repeat = download_raspberry_data("Test_Event", datetime(2025, 1, 1, 6, 1), 0.5, 28.2, 84.4, str(tmp_path),
+                                     stations=["R1", "R2", "R3"], base_url=url, retries=0, backoff=0.01, index=index)
+    assert repeat["no_data"] == ["R2"] and repeat["bytes_downloaded"] == 0
+    assert handler.requests["R1"] == requests_before["R1"]
+    assert handler.requests["R2"] == requests_before["R2"]
+    assert handler.requests["R3"] == requests_before["R3"] + 1
@@ -0,0 +1,42 @@
+# tests/test_download_index.py
+import os
+import numpy as np
+from obspy import Stream, Trace, UTCDateTime
+from download_index import DownloadIndex
+
+START = UTCDateTime(2025, 1, 1)
+
+def write_chunk(index, station, start, seconds):
+    path = index.chunk_path(station, start, start + seconds)
+    trace = Trace(np.zeros(int(seconds * 100), dtype=np.int32),
+                  header={"network": "AM", "station": station, "channel": "EHZ", "sampling_rate": 100.0, "starttime": start})
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Stream([trace]).write(path, format="MSEED", encoding="INT32")
+    return path
+
+def test_indexes_of_two_processes_keep_each_others_chunks(tmp_path):
+    # Two instances stand for two processes sharing the archive
+    first, second = DownloadIndex(str(tmp_path)), DownloadIndex(str(tmp_path))
+    first.add("R1", write_chunk(first, "R1", START, 60))
+    second.add("R2", write_chunk(second, "R2", START, 60))
+    first.add("R1", write_chunk(first, "R1", START + 60, 60))
+    reloaded = DownloadIndex(str(tmp_path))
+    assert reloaded.coverage("R1") == [(START.timestamp, START.timestamp + 120)]
+    assert reloaded.coverage("R2") == [(START.timestamp, START.timestamp + 60)]
+    assert second.missing("R1", START, START + 120) == []
+
+def test_no_data_ranges_are_skipped_until_they_expire(tmp_path):
+    index = DownloadIndex(str(tmp_path), no_data_ttl=3600)
+    index.add_no_data("R1", START, START + 60)
+    assert index.missing("R1", START, START + 120) == [(START + 60, START + 120)]
+    assert index.no_data_seconds("R1", START, START + 120) == 60
+    assert DownloadIndex(str(tmp_path)).missing("R1", START, START + 60) == []
+
+    expired = DownloadIndex(str(tmp_path / "expired"), no_data_ttl=-1)
+    expired.add_no_data("R1", START, START + 60)
+    assert expired.missing("R1", START, START + 60) == [(START, START + 60)]
+    assert expired.no_data == {}
+
+def test_chunk_paths_are_unique(tmp_path):
+    index = DownloadIndex(str(tmp_path))
+    assert len({index.chunk_path("R1", START, START + 60) for _ in range(1000)}) == 1000
@@ -0,0 +1,55 @@
+# tests/test_plot_creation.py
+import warnings
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.dates as mdates
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+from obspy import Trace, UTCDateTime
+from component.plot_creation import create_velocity_plots, draw_page, panel_width, paginate, prepare_panels
+
+NROWS, NCOLS, FIGSIZE = 3, 1, (8.27, 5.0)
+
+def traces_and_metadata(n, broken):
+    traces_with_dist, metadata = [], {}
+    for i in range(n):
+        station = f"R{i}"
+        traces_with_dist.append((Trace(np.sin(np.arange(2000) / (10.0 + i)),
+                                       header={"network": "AM", "station": station, "channel": "EHZ",
+                                               "sampling_rate": 100.0, "starttime": UTCDateTime(2025, 1, 1)}), float(i)))
+        # A station whose metadata lacks its distance cannot be titled, so its trace fails to draw
+        metadata[f"AM.{station}"] = {} if i in broken else {"dist_km": float(i)}
+    return traces_with_dist, metadata
+
+def test_failed_trace_does_not_use_up_a_panel_number():
+    traces_with_dist, metadata = traces_and_metadata(5, broken={1})
+    panels = prepare_panels(traces_with_dist, metadata, panel_width(NROWS, NCOLS, FIGSIZE))
+    pages = paginate(panels, NROWS * NCOLS)
+    assert [[panel["id"] for panel in page] for page in pages] == [["AM.R0..EHZ", "AM.R2..EHZ", "AM.R3..EHZ"], ["AM.R4..EHZ"]]
+    fig = draw_page(pages[0], NROWS, NCOLS, FIGSIZE)
+    assert [ax.get_title().endswith(f"(#{n})") for n, ax in enumerate(fig.axes, 1)] == [True] * 3
+    assert all(ax.get_visible() for ax in fig.axes)
+    plt.close(fig)
+
+@pytest.mark.parametrize("render_workers", [1, 2])
+def test_pages_list_the_drawn_traces_only(tmp_path, render_workers):
+    traces_with_dist, metadata = traces_and_metadata(7, broken={0, 4})
+    events = []
+    create_velocity_plots(traces_with_dist, metadata, str(tmp_path / "velocity.pdf"), 1e9, NROWS * NCOLS, NROWS, NCOLS,
+                          FIGSIZE, 5.0, preprocessed=True, render_workers=render_workers, page_callback=events.append)
+    assert [event["traces"] for event in events] == [["AM.R1..EHZ", "AM.R2..EHZ", "AM.R3..EHZ"], ["AM.R5..EHZ", "AM.R6..EHZ"]]
+    assert (tmp_path / "velocity.pdf").stat().st_size > 0
+
+def test_panels_are_drawn_on_a_date_axis_without_plot_date():
+    traces_with_dist, metadata = traces_and_metadata(1, broken=set())
+    panels = prepare_panels(traces_with_dist, metadata, panel_width(NROWS, NCOLS, FIGSIZE))
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', matplotlib.MatplotlibDeprecationWarning)
+        fig = draw_page(panels, NROWS, NCOLS, FIGSIZE)
+    ax = fig.axes[0]
+    assert isinstance(ax.xaxis.get_major_formatter(), mdates.AutoDateFormatter)
+    # The first point is the centre of the first envelope bin, a few samples after the trace start
+    start = mdates.num2date(ax.get_lines()[0].get_xdata()[0])
+    assert 0 <= (start.replace(tzinfo=None) - UTCDateTime(2025, 1, 1).datetime).total_seconds() < 0.1
+    plt.close(fig)
@@ -0,0 +1,37 @@
+# tests/test_preprocessing.py
+import numpy as np
+import pytest
+from obspy import Trace
+from component.preprocessing import preprocess_traces
+
+GAIN = 1e9
+
+def raw_traces(lengths, seed=0):
+    rng = np.random.default_rng(seed)
+    traces = []
+    for i, n in enumerate(lengths):
+        data = (rng.normal(0, 500, n) + 40 * np.arange(n) / max(n, 1) + 10000 * (i + 1)).astype(np.int32)
+        traces.append((Trace(data, header={"network": "AM", "station": f"R{i}", "channel": "EHZ", "sampling_rate": 100.0}), float(i)))
+    return traces
+
+@pytest.mark.parametrize("dtype, rtol", [(np.float64, 1e-9), (np.float32, 1e-3)])
+def test_batch_matches_obspy_detrend_and_demean(dtype, rtol):
+    lengths = [1, 2, 3000, 250000, 17]
+    expected = []
+    for tr, _ in raw_traces(lengths):
+        tr = tr.copy()
+        tr.data = tr.data.astype(np.float64)
+        tr.detrend("linear")
+        tr.detrend("demean")
+        expected.append(tr.data * 1e6 / GAIN)
+    batch = preprocess_traces(raw_traces(lengths), GAIN, dtype=dtype)
+    assert batch.data.dtype == dtype
+    for (tr, _), want in zip(batch, expected):
+        assert np.shares_memory(tr.data, batch.data)
+        np.testing.assert_allclose(tr.data, want, rtol=rtol, atol=rtol * np.abs(want).max(initial=0) + 1e-12)
+
+def test_empty_traces_are_dropped():
+    traces = raw_traces([10, 0, 5])
+    batch = preprocess_traces(traces, GAIN)
+    assert [tr.stats.station for tr, _ in batch] == ["R0", "R2"]
+    assert list(batch.npts) == [10, 5] and list(batch.offsets) == [0, 10]
@@ -0,0 +1,22 @@
+# tests/test_profiling.py
+import numpy as np
+import pytest
+from component.profiling import RunProfiler
+
+def run(allocate_bytes):
+    profiler = RunProfiler()
+    profiler.stage('read')
+    block = np.ones(allocate_bytes, dtype=np.uint8)
+    del block
+    profiler.stage('plot')
+    return profiler.finish('completed')
+
+def test_earlier_large_run_does_not_inflate_later_peak():
+    big = run(400 * 1024 ** 2)
+    if big["peak_rss_scope"] != "run":
+        pytest.skip("the peak memory cannot be reset on this platform")
+    small = run(1024)
+    assert big["stages"][0]["peak_rss_bytes"] - small["peak_rss_bytes"] > 300 * 1024 ** 2
+    # The allocation is freed before the plot stage starts
+    assert big["stages"][1]["peak_rss_bytes"] < big["stages"][0]["peak_rss_bytes"] - 300 * 1024 ** 2
+    assert big["peak_rss_bytes"] >= max(stage["peak_rss_bytes"] for stage in big["stages"])
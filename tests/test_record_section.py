@@ -0,0 +1,46 @@
+# tests/test_record_section.py
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+from obspy import Trace, UTCDateTime
+from component.record_section import create_record_section, record_section_amplitude, record_section_segments
+
+ORIGIN = UTCDateTime(2025, 1, 1)
+
+def trace(station, values, start_s=0.0, sampling_rate=10.0):
+    return Trace(np.asarray(values, dtype=np.float64),
+                 header={"network": "AM", "station": station, "channel": "EHZ", "sampling_rate": sampling_rate,
+                         "starttime": ORIGIN + start_s})
+
+def test_segments_are_normalised_offset_and_reduced():
+    traces_with_dist = [(trace("R1", [0.0, 2.0, -4.0, 1.0], start_s=5.0), 30.0), (trace("R2", np.zeros(3)), 60.0)]
+    segments = record_section_segments(traces_with_dist, ORIGIN, n_bins=100, amplitude_km=10.0, reduction_velocity=6.0)
+    np.testing.assert_allclose(segments[0][:, 0], 5.0 - 30.0 / 6.0 + np.arange(4) * 0.1)
+    np.testing.assert_allclose(segments[0][:, 1], 30.0 + np.array([0.0, 5.0, -10.0, 2.5]))
+    # A flat trace is drawn as a line at its distance rather than divided by a zero peak
+    np.testing.assert_allclose(segments[1][:, 1], 60.0)
+    np.testing.assert_allclose(segments[1][:, 0], -10.0 + np.arange(3) * 0.1)
+
+def test_long_traces_are_reduced_to_envelopes_that_keep_the_peak():
+    data = np.sin(np.arange(50000) / 7.0)
+    data[12345] = -3.0
+    segment, = record_section_segments([(trace("R1", data), 10.0)], ORIGIN, n_bins=200, amplitude_km=2.0)
+    assert len(segment) == 400
+    assert segment[:, 1].min() == 10.0 - 2.0
+
+def test_amplitude_is_half_the_median_station_gap():
+    assert record_section_amplitude(np.array([10.0, 20.0, 30.0, 70.0])) == 5.0
+    # Co-located stations do not shrink it to zero, and a lone station gets a visible height
+    assert record_section_amplitude(np.array([10.0, 10.0, 10.0])) == 0.5
+    assert record_section_amplitude(np.array([10.0, 10.0, 1000.0])) == 0.5 * 990.0
+
+def test_record_section_skips_empty_traces(tmp_path, capsys):
+    traces_with_dist = [(trace("R2", np.random.default_rng(0).normal(size=600)), 40.0), (trace("R1", []), 20.0),
+                        (trace("R3", np.ones(10), start_s=-3.0), 80.0)]
+    create_record_section(traces_with_dist, str(tmp_path / "section.pdf"), page_previews=str(tmp_path / "pages"))
+    assert (tmp_path / "section.pdf").stat().st_size > 0
+    assert (tmp_path / "pages" / "section_0001.png").exists()
+    assert "Record section of 2 traces" in capsys.readouterr().out
+
+    create_record_section([(trace("R1", []), 20.0)], str(tmp_path / "empty.pdf"))
+    assert not (tmp_path / "empty.pdf").exists()
@@ -0,0 +1,62 @@
+# tests/test_result_cache.py
+from component import result_cache
+
+def write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+def test_key_changes_with_streaming_mode(tmp_path):
+    write(tmp_path / "AM.R1.mseed", "samples")
+    params = {"epicenter": [28.2, 84.4, 5.0], "streaming": False}
+    assert result_cache.analysis_key(str(tmp_path), params) == result_cache.analysis_key(str(tmp_path), dict(params))
+    assert result_cache.analysis_key(str(tmp_path), params) != result_cache.analysis_key(str(tmp_path), {**params, "streaming": True})
+
+def test_hit_restores_outputs_and_result_events(tmp_path):
+    cache_dir, run = tmp_path / "cache", tmp_path / "run"
+    run.mkdir()
+    write(run / "velocity.pdf", "pdf")
+    (run / "pages").mkdir()
+    write(run / "pages" / "velocity_0001.png", "png")
+    events = [["trace", {"trace_id": "AM.R1.00.EHZ", "p_pick": None}],
+              ["page", {"page": 1, "traces": ["AM.R1.00.EHZ"], "preview": "velocity_0001.png"}]]
+    result_cache.store("key", {"velocity.pdf": str(run / "velocity.pdf")}, str(cache_dir),
+                       directories={"pages": str(run / "pages")}, events=events)
+
+    restored = tmp_path / "restored"
+    restored.mkdir()
+    assert result_cache.lookup("key", {"velocity.pdf": str(restored / "velocity.pdf")}, str(cache_dir),
+                               directories={"pages": str(restored / "pages")})
+    assert (restored / "pages" / "velocity_0001.png").read_text() == "png"
+    assert result_cache.read_events("key", str(cache_dir)) == events
+    assert result_cache.read_events("missing", str(cache_dir)) == []
+
+def test_storing_a_key_again_keeps_the_entry_and_adds_missing_products(tmp_path):
+    cache_dir, run = tmp_path / "cache", tmp_path / "run"
+    run.mkdir()
+    write(run / "velocity.pdf", "pdf")
+    write(run / "spectra.pdf", "spectra")
+    result_cache.store("key", {"velocity.pdf": str(run / "velocity.pdf")}, str(cache_dir))
+    cached = cache_dir / "key" / "velocity.pdf"
+    inode = cached.stat().st_ino
+
+    # A lookup copying from the entry meanwhile keeps its files
+    result_cache.store("key", {"velocity.pdf": str(run / "velocity.pdf"), "spectra.pdf": str(run / "spectra.pdf")},
+                       str(cache_dir))
+    assert cached.stat().st_ino == inode
+    assert sorted(path.name for path in cache_dir.iterdir()) == ["key"]
+    restored = tmp_path / "restored"
+    restored.mkdir()
+    assert result_cache.lookup("key", {"spectra.pdf": str(restored / "spectra.pdf")}, str(cache_dir))
+    assert (restored / "spectra.pdf").read_text() == "spectra"
+
+def test_entry_evicted_during_a_lookup_is_a_miss(tmp_path, monkeypatch):
+    cache_dir, run = tmp_path / "cache", tmp_path / "run"
+    run.mkdir()
+    write(run / "velocity.pdf", "pdf")
+    result_cache.store("key", {"velocity.pdf": str(run / "velocity.pdf")}, str(cache_dir))
+
+    def evicted(source, destination):
+        raise FileNotFoundError(source)
+
+    monkeypatch.setattr(result_cache.shutil, "copyfile", evicted)
+    assert not result_cache.lookup("key", {"velocity.pdf": str(tmp_path / "velocity.pdf")}, str(cache_dir))
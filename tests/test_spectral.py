@@ -0,0 +1,34 @@
+# tests/test_spectral.py
+import numpy as np
+import pytest
+from obspy import Trace
+from scipy.signal import welch
+from component.preprocessing import preprocess_traces
+from component.spectral import _segment_length, compute_spectra, create_spectral_plots
+
+def batch_of(lengths, sampling_rate=100.0, seed=0):
+    rng = np.random.default_rng(seed)
+    traces = [(Trace(rng.normal(0, 1000, n).astype(np.int32),
+                     header={"network": "AM", "station": f"R{i}", "channel": "EHZ", "sampling_rate": sampling_rate}),
+               float(i)) for i, n in enumerate(lengths)]
+    return preprocess_traces(traces, 1e9)
+
+def test_psds_match_scipy_welch():
+    batch = batch_of([30000, 12000])
+    spectra = compute_spectra(batch)
+    nperseg = _segment_length(20.0, 100.0)
+    for i, (tr, _) in enumerate(batch):
+        freqs, psd = welch(tr.data, fs=100.0, window='hann', nperseg=nperseg, noverlap=nperseg // 2)
+        np.testing.assert_allclose(spectra["psd_freqs"], freqs)
+        np.testing.assert_allclose(spectra["psd_db"][i], 10 * np.log10(psd), atol=1e-3)
+
+@pytest.mark.parametrize("npts", [200, 300])
+def test_traces_shorter_than_a_segment_still_get_a_spectral_pdf(tmp_path, npts):
+    # 200 samples fit no spectrogram segment; 300 fit exactly one column
+    spectra = compute_spectra(batch_of([npts]))
+    assert len(spectra["spectrogram_times"]) == (0 if npts == 200 else 1)
+    assert np.isnan(spectra["psd_db"]).all()
+    output_pdf = tmp_path / "spectra.pdf"
+    create_spectral_plots(spectra, str(output_pdf), page_previews=str(tmp_path / "pages"))
+    assert output_pdf.stat().st_size > 0
+    assert sorted(path.name for path in (tmp_path / "pages").glob("*.png")) == ["spectra_0001.png", "spectra_0002.png"]
@@ -0,0 +1,33 @@
+# tests/test_station_selection.py
+import os
+import subprocess
+import sys
+from component.map_creation import MAP_GRID_DEG, map_extent
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..', 'backend_serve')
+
+def test_backend_modules_import_on_their_own():
+    # Each module must set up its own imports, whatever was imported before it
+    for module in ('download_handler', 'streaming'):
+        result = subprocess.run([sys.executable, '-c', f'import {module}'], cwd=BACKEND_DIR, capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+
+def test_map_extent_covers_epicenter_and_stations_on_the_grid():
+    stations = {"AM.A": {"lat": -33.9, "lon": 151.2}, "AM.B": {"lat": -31.95, "lon": 115.86}}
+    lon_min, lon_max, lat_min, lat_max = extent = map_extent(stations, -35.3, 149.1)
+    assert lon_min < 115.86 and lon_max > 151.2 and lat_min < -35.3 and lat_max > -31.95
+    assert all(abs(value / MAP_GRID_DEG - round(value / MAP_GRID_DEG)) < 1e-9 for value in extent)
+
+def test_map_extent_of_a_lone_epicenter_has_the_minimum_span():
+    lon_min, lon_max, lat_min, lat_max = map_extent({}, 89.9, 0.0)
+    assert lon_max - lon_min >= 2.0 and lat_max <= 90.0 and lat_max - lat_min >= 2.0
+
+def test_prepared_base_maps_are_the_ones_events_use(monkeypatch):
+    from component import map_creation
+    stations = {"AM.A": {"lat": 28.0, "lon": 84.0, "dist_km": 30.0}, "AM.B": {"lat": 27.2, "lon": 85.3, "dist_km": 120.0}}
+    monkeypatch.setattr(map_creation, "fetch_station_metadata", lambda lat, lon, radius, count: stations)
+    rendered = []
+    monkeypatch.setattr(map_creation, "get_base_map", lambda extent, features: rendered.append(extent))
+    extents = map_creation.prepare_base_maps(map_creation.warm_epicenters("28.2292,84.3985; 28.25,84.41"))
+    # Nearby epicenters snap to the same background, which is the extent an event there is drawn with
+    assert rendered == extents == [map_extent(stations, 28.2292, 84.3985)]
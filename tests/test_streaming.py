@@ -0,0 +1,74 @@
+# tests/test_streaming.py
+import time
+from argparse import Namespace
+import numpy as np
+import pytest
+from obspy import Trace, UTCDateTime
+import seedlink_stub
+import streaming
+from streaming import StationBuffer, StreamingIngestor
+
+START = UTCDateTime(2025, 1, 1)
+
+def packet(start, values, sampling_rate=10.0):
+    return Trace(np.asarray(values, dtype=np.int32),
+                 header={"network": "AM", "station": "R1", "location": "00", "channel": "EHZ",
+                         "sampling_rate": sampling_rate, "starttime": start})
+
+def test_ring_buffer_wraps_around_and_keeps_the_newest_samples():
+    buffer = StationBuffer("AM.R1.00.EHZ", 10.0, capacity_s=2.0)  # 20 samples
+    for i in range(7):
+        buffer.append(packet(START + i * 0.7, np.arange(i * 7, i * 7 + 7)))
+    assert buffer.filled == 20 and buffer.head == 49 % 20
+    assert buffer.end_time == START + 4.9
+    tr = buffer.window(START, START + 10)
+    assert tr.stats.starttime == START + 2.9
+    np.testing.assert_array_equal(tr.data, np.arange(29, 49))
+    # A window inside the buffer that crosses the physical end of the array
+    np.testing.assert_array_equal(buffer.window(START + 3.5, START + 4.2).data, np.arange(35, 43))
+
+def test_packet_longer_than_the_buffer_keeps_its_tail():
+    buffer = StationBuffer("AM.R1.00.EHZ", 10.0, capacity_s=2.0)
+    buffer.append(packet(START, np.arange(5)))
+    buffer.append(packet(START + 0.5, np.arange(100, 150)))
+    assert buffer.filled == 20 and buffer.samples == 55
+    np.testing.assert_array_equal(buffer.window(START, START + 10).data, np.arange(130, 150))
+    assert buffer.window(START, START + 2.9) is None
+
+def test_overlaps_are_dropped_and_gaps_masked():
+    buffer = StationBuffer("AM.R1.00.EHZ", 10.0, capacity_s=10.0)
+    buffer.append(packet(START, np.arange(10)))
+    buffer.append(packet(START + 0.5, np.arange(5, 15)))  # Repeats samples 5..9
+    buffer.append(packet(START + 2.0, np.arange(20, 25)))  # Leaves out samples 15..19
+    assert buffer.dropped_samples == 5 and buffer.gap_samples == 5
+    tr = buffer.window(START, START + 3)
+    np.testing.assert_array_equal(tr.data.mask, [False] * 15 + [True] * 5 + [False] * 5)
+    np.testing.assert_array_equal(tr.data.compressed(), np.r_[np.arange(15), np.arange(20, 25)])
+    # A gap longer than the buffer starts it afresh
+    buffer.append(packet(START + 60, [1, 2, 3]))
+    assert buffer.filled == 3 and buffer.start_time == START + 60
+
+@pytest.fixture
+def seedlink_server():
+    options = Namespace(host="localhost", port=0, channel="EHZ", sampling_rate=20.0, packet_s=0.5)
+    server = seedlink_stub.serve(options)
+    yield f"localhost:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def test_ingestor_buffers_the_stub_stream_and_restarts_for_new_stations(seedlink_server, tmp_path):
+    try:
+        ingestor = streaming.start_ingestor(server=seedlink_server, stations=["R1", "R2"], buffer_minutes=1)
+        assert streaming.start_ingestor(server=seedlink_server, stations=["R2", "R1"], buffer_minutes=1) is ingestor
+        endtime = UTCDateTime() + 1
+        assert ingestor.wait_for(endtime, timeout=20)
+        assert {buffer.trace_id for buffer in ingestor.buffers.values()} == {"AM.R1.00.EHZ", "AM.R2.00.EHZ"}
+        summary = ingestor.snapshot(endtime - 2, endtime, str(tmp_path), "Live", wait_timeout=0)
+        assert summary["succeeded"] == ["R1", "R2"]
+
+        restarted = streaming.start_ingestor(server=seedlink_server, stations=["R3"], buffer_minutes=1)
+        assert restarted is not ingestor and not ingestor.running and restarted.running
+        assert restarted.wait_for(UTCDateTime() + 1, timeout=20)
+        assert set(restarted.buffers) == {"AM.R3.00.EHZ"}
+    finally:
+        streaming.stop_ingestor()
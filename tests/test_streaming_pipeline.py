@@ -0,0 +1,63 @@
+# tests/test_streaming_pipeline.py
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pandas as pd
+from obspy import UTCDateTime
+from component.data_processing import ingest_seismic_data
+from component.detection import detect_peaks, write_station_peaks
+from component.inventory import WGS84
+from component.plot_creation import create_velocity_plots
+from component.preprocessing import preprocess_traces
+from component.streaming_pipeline import plan_traces, render_streaming
+from component.waveform_store import WaveformStore
+from component.waveform_tiles import WaveformTiles
+from synthetic import DEFAULT_ORIGIN_TIME, synthetic_network, write_event
+
+EPI_LAT, EPI_LON, GAIN = 28.2292, 84.3985, 1e9
+NROWS, NCOLS, FIGSIZE = 3, 1, (8.27, 5.0)
+
+def synthetic_event(folder, n_stations=7, channels=3):
+    stations = synthetic_network(n_stations, EPI_LAT, EPI_LON, max_radius_km=150.0)
+    write_event(str(folder), stations, EPI_LAT, EPI_LON, 5.0, window_s=60.0, channels=channels)
+    metadata = {}
+    for station in stations:
+        _, _, dist_m = WGS84.inv(EPI_LON, EPI_LAT, station["lon"], station["lat"])
+        metadata[station["station_code"]] = {**station, "dist_km": dist_m / 1000}
+    return metadata
+
+def test_streaming_matches_the_batch_pipeline(tmp_path):
+    metadata = synthetic_event(tmp_path / "event")
+    # A station left out of the selection is skipped by both pipelines
+    del metadata["AM.S0003"]
+    origin_time = UTCDateTime(DEFAULT_ORIGIN_TIME)
+
+    plan, used_stations, file_stats = plan_traces(str(tmp_path / "event"), metadata)
+    assert [entry["id"] for entry in plan] == [f"{code}.00.EHZ" for code in sorted(metadata, key=lambda code: metadata[code]["dist_km"])]
+    assert set(used_stations) == set(metadata) and len(file_stats) == 7
+    streamed_pages, streamed_rows = [], []
+    totals = render_streaming(plan, metadata, GAIN, str(tmp_path / "streamed.pdf"), str(tmp_path / "streamed_peaks.csv"),
+                              NROWS, NCOLS, FIGSIZE, origin_time, page_callback=streamed_pages.append,
+                              trace_callback=streamed_rows.append, waveform_tiles=str(tmp_path / "tiles"),
+                              waveform_store=str(tmp_path / "waveforms"))
+    assert totals["traces"] == 6
+
+    traces_with_dist, _, _ = ingest_seismic_data(str(tmp_path / "event"), metadata, max_workers=1)
+    batch = preprocess_traces(traces_with_dist, GAIN)
+    write_station_peaks(detect_peaks(batch, origin_time), str(tmp_path / "batch_peaks.csv"))
+    batch_pages = []
+    create_velocity_plots(batch.traces_with_dist, metadata, str(tmp_path / "batch.pdf"), GAIN, NROWS * NCOLS, NROWS, NCOLS,
+                          FIGSIZE, 5.0, preprocessed=True, render_workers=1, page_callback=batch_pages.append)
+
+    assert [page["traces"] for page in streamed_pages] == [page["traces"] for page in batch_pages]
+    streamed_peaks = pd.read_csv(tmp_path / "streamed_peaks.csv")
+    pd.testing.assert_frame_equal(streamed_peaks, pd.read_csv(tmp_path / "batch_peaks.csv"))
+    assert list(streamed_peaks["trace_id"]) == [row["trace_id"] for row in streamed_rows]
+
+    # The store and tiles written one trace at a time hold the batch's samples, nearest first
+    store = WaveformStore(str(tmp_path / "waveforms"))
+    assert store.ids == [entry["id"] for entry in plan if entry["station_code"] in used_stations]
+    for tr, _ in batch:
+        np.testing.assert_allclose(store.data(store.position(tr.id)), tr.data, rtol=1e-5, atol=1e-6)
+    view = WaveformTiles(str(tmp_path / "tiles"))
+    assert view.ids == store.ids and view.level_bins(0)[0] == store.npts[0]
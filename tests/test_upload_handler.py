@@ -0,0 +1,59 @@
+# tests/test_upload_handler.py
+import io
+import os
+import numpy as np
+import pytest
+from obspy import Stream, Trace, UTCDateTime
+import upload_handler
+from upload_handler import ChunkedUploads, UploadError
+
+def mseed_bytes(seed=0, npts=3000):
+    trace = Trace(np.random.default_rng(seed).integers(-1000, 1000, npts).astype(np.int32),
+                  header={"network": "AM", "station": "R0001", "location": "00", "channel": "EHZ",
+                          "sampling_rate": 100.0, "starttime": UTCDateTime(2025, 6, 29, 18, 14)})
+    buffer = io.BytesIO()
+    Stream([trace]).write(buffer, format="MSEED", reclen=512, encoding="INT32")
+    return buffer.getvalue()
+
+def upload(uploads, data, last_modified=1, chunk=1000):
+    state = uploads.create("Event_5.0", "R0001.mseed", len(data), last_modified)
+    while not state['complete']:
+        state = uploads.append(state['upload_id'], state['offset'], io.BytesIO(data[state['offset']:state['offset'] + chunk]))
+    return state
+
+def test_upload_in_chunks_moves_the_file_into_place_and_releases_its_lock(tmp_path):
+    uploads = ChunkedUploads(str(tmp_path))
+    data = mseed_bytes()
+    state = upload(uploads, data)
+    assert (tmp_path / "Event_5.0" / "R0001.mseed").read_bytes() == data
+    assert state['offset'] == len(data)
+    assert upload_handler._locks == {}
+
+def test_same_name_and_size_with_another_modification_time_is_a_new_upload(tmp_path):
+    uploads = ChunkedUploads(str(tmp_path))
+    first, second = mseed_bytes(0), mseed_bytes(1)
+    assert len(first) == len(second)
+    upload(uploads, first, last_modified=1)
+    state = uploads.create("Event_5.0", "R0001.mseed", len(second), 2)
+    assert not state['complete'] and state['offset'] == 0
+    upload(uploads, second, last_modified=2)
+    assert (tmp_path / "Event_5.0" / "R0001.mseed").read_bytes() == second
+
+def test_completed_upload_restarts_when_its_file_was_deleted(tmp_path):
+    uploads = ChunkedUploads(str(tmp_path))
+    data = mseed_bytes()
+    upload(uploads, data)
+    assert uploads.create("Event_5.0", "R0001.mseed", len(data), 1)['complete']
+    os.remove(tmp_path / "Event_5.0" / "R0001.mseed")
+    state = uploads.create("Event_5.0", "R0001.mseed", len(data), 1)
+    assert not state['complete'] and state['offset'] == 0
+    upload(uploads, data)
+    assert (tmp_path / "Event_5.0" / "R0001.mseed").read_bytes() == data
+
+def test_non_mseed_bytes_are_rejected(tmp_path):
+    uploads = ChunkedUploads(str(tmp_path))
+    state = uploads.create("Event_5.0", "R0001.mseed", 4096, 1)
+    with pytest.raises(UploadError) as error:
+        uploads.append(state['upload_id'], 0, io.BytesIO(b"x" * 4096))
+    assert error.value.status == 422
+    assert upload_handler._locks == {}
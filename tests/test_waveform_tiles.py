@@ -0,0 +1,54 @@
+# tests/test_waveform_tiles.py
+import os
+import numpy as np
+from obspy import Trace, UTCDateTime
+from component import waveform_tiles as tiles
+from component.preprocessing import preprocess_traces
+from component.waveform_store import WaveformStore, WaveformStoreWriter, write_waveform_store
+
+START = UTCDateTime(2025, 1, 1)
+
+def batch_of(lengths, seed=0):
+    rng = np.random.default_rng(seed)
+    traces = [(Trace(rng.integers(-5000, 5000, n).astype(np.int32),
+                     header={"network": "AM", "station": f"R{i}", "channel": "EHZ", "sampling_rate": 100.0,
+                             "starttime": START}), float(len(lengths) - i))
+              for i, n in enumerate(lengths)]
+    return preprocess_traces(traces, 1e9)
+
+def test_level_0_is_served_from_the_waveform_store(tmp_path):
+    batch = batch_of([5000, 300, 20000])
+    store_dir, tiles_dir = str(tmp_path / "waveforms"), str(tmp_path / "tiles")
+    write_waveform_store(batch, store_dir, 1e9)
+    tiles.write_waveform_tiles(sorted(batch.traces_with_dist, key=lambda x: x[1]), tiles_dir, batch.units, store_dir)
+
+    view = tiles.WaveformTiles(tiles_dir)
+    store = WaveformStore(store_dir)
+    assert view.ids == store.ids == ["AM.R2..EHZ", "AM.R1..EHZ", "AM.R0..EHZ"]
+    # Only the min/max pairs above level 0 are written to the pyramid
+    pairs = sum(count for levels in view.levels for _, count in levels)
+    assert os.path.getsize(os.path.join(tiles_dir, tiles.PYRAMID_FILE)) == pairs * 2 * 4
+    assert view.level_bins(1) == [300]
+
+    i = view.position("AM.R2..EHZ")
+    data = np.asarray(store.data(i))
+    first_time, mins, maxs = view.tile(i, 0, START + 1, START + 2)
+    assert first_time == START + 1
+    np.testing.assert_array_equal(mins, data[100:201])
+    assert np.shares_memory(mins, view.store.samples)
+    _, mins, maxs = view.tile(i, 1)
+    np.testing.assert_array_equal(mins, data.reshape(-1, 4).min(axis=1))
+    np.testing.assert_array_equal(maxs, data.reshape(-1, 4).max(axis=1))
+    assert view.level_bins(i) == [20000, 5000, 1250, 313]
+    assert view.level_for(i, START, START + 200, 1000) == 2
+
+def test_store_written_one_trace_at_a_time_loads_as_npy(tmp_path):
+    batch = batch_of([40, 0, 7])
+    with WaveformStoreWriter(str(tmp_path / "waveforms"), batch.units, 1e9) as writer:
+        for tr, dist_km in batch:
+            writer.add(tr, dist_km)
+    store = WaveformStore(str(tmp_path / "waveforms"))
+    assert store.samples.shape == (47,) and store.samples.dtype == np.float32
+    for i, (tr, _) in enumerate(batch):
+        np.testing.assert_allclose(store.data(i), tr.data, rtol=1e-6)
+    assert not os.path.exists(str(tmp_path / "waveforms") + f".{os.getpid()}.tmp")